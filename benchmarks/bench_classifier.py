@@ -0,0 +1,89 @@
+"""Benchmark the promotion classifier against the labeled corpus.
+
+Reports precision/recall on benchmarks/promo_corpus.jsonl and classification
+throughput, next to the old single-regex check.
+
+    python benchmarks/bench_classifier.py [--posts 10000] [--rules promo_rules.json]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from promo_classifier import PROMO_RULES_PATH, PromoClassifier
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "promo_corpus.jsonl")
+
+# The pattern facebook_scraper used before the classifier existed
+LEGACY_PATTERN = re.compile(r'\b\d+%\s*(?:off|discount)\b|\b\d+%\b', re.IGNORECASE)
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def precision_recall(predictions, labels):
+    tp = sum(1 for p, l in zip(predictions, labels) if p and l)
+    fp = sum(1 for p, l in zip(predictions, labels) if p and not l)
+    fn = sum(1 for p, l in zip(predictions, labels) if not p and l)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return precision, recall
+
+
+def throughput(fn, texts):
+    start = time.perf_counter()
+    fn(texts)
+    elapsed = time.perf_counter() - start
+    return len(texts) / elapsed if elapsed else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10000, help="texts to score for throughput")
+    parser.add_argument("--rules", default=PROMO_RULES_PATH, help="rules file to benchmark")
+    parser.add_argument("--show-errors", action="store_true", help="print misclassified corpus texts")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    texts = [row['text'] for row in corpus]
+    labels = [bool(row['label']) for row in corpus]
+
+    start = time.perf_counter()
+    classifier = PromoClassifier.from_file(args.rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    results = [classifier.classify(text) for text in texts]
+    predictions = [result.is_promotion for result in results]
+    legacy_predictions = [bool(LEGACY_PATTERN.search(text)) for text in texts]
+
+    precision, recall = precision_recall(predictions, labels)
+    legacy_precision, legacy_recall = precision_recall(legacy_predictions, labels)
+
+    print(f"Corpus: {len(corpus)} texts ({sum(labels)} promotions)")
+    print(f"Rules compiled in {compile_ms:.2f} ms")
+    print(f"{'':<14}{'precision':>10}{'recall':>10}")
+    print(f"{'classifier':<14}{precision:>10.2f}{recall:>10.2f}")
+    print(f"{'legacy regex':<14}{legacy_precision:>10.2f}{legacy_recall:>10.2f}")
+
+    if args.show_errors:
+        for text, label, result in zip(texts, labels, results):
+            if result.is_promotion != label:
+                kind = "missed" if label else "false positive"
+                print(f"  [{kind}] score={result.score:.2f} {text}")
+
+    sample = (texts * (args.posts // len(texts) + 1))[:args.posts]
+    single = throughput(lambda batch: [classifier.classify(text) for text in batch], sample)
+    legacy = throughput(lambda batch: [LEGACY_PATTERN.search(text.lower()) for text in batch], sample)
+    print(f"\nThroughput over {len(sample)} texts:")
+    print(f"  classifier:   {single:>12,.0f} posts/sec")
+    print(f"  legacy regex: {legacy:>12,.0f} posts/sec (match only, no spans or scoring)")
+
+
+if __name__ == "__main__":
+    main()
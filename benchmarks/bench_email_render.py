@@ -0,0 +1,157 @@
+"""Benchmark email_templates against the old f-string email builder.
+
+Renders the promotion alert for synthetic batches of promotions and reports
+render time and payload size (HTML, plain text, and the full MIME message).
+The old builder neither escaped post text nor produced a plain-text part, so
+it is also timed with escaping added ("legacy+esc") for a closer comparison.
+The new renderer is slower than both, because it also builds the plain-text
+part. MIME sizes are for the message as each version sends it: the new one
+goes through notifier, which uses quoted-printable rather than base64.
+
+    python benchmarks/bench_email_render.py [--sizes 1,10,100,1000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_templates
+from email_templates import LatestPost, Promotion
+from notifier import Notification
+
+PAGE_URL = "https://www.facebook.com/AllTrails"
+NOW = datetime(2024, 6, 15, 12, 0)
+MATCHES = ["50% off", "$10 off", "promo code", "bogo", "sale"]
+SNIPPETS = [
+    "Get outside this weekend & save on AllTrails+ — limited time only!",
+    "Use code <TRAILS> at checkout for 50% off your first year.",
+    "Our biggest sale of the season starts now. Don't miss it.",
+    "New trails added near you: 1,200 miles of fresh routes to explore.",
+]
+
+
+def synthetic_promotions(count, seed=0):
+    rng = random.Random(seed)
+    promotions = []
+    for i in range(count):
+        text = "\n".join(rng.choice(SNIPPETS) for _ in range(rng.randint(1, 4)))
+        promotions.append({
+            'match': rng.choice(MATCHES),
+            'date': f"2024-06-{rng.randint(8, 15):02d} {rng.randint(0, 23):02d}:00:00",
+            'text': text,
+            'permalink': f"{PAGE_URL}/posts/{1000 + i}",
+        })
+    return promotions
+
+
+def legacy_render(promotions, latest_post, url=PAGE_URL, escape_fields=False):
+    """The HTML facebook_scraper.notify_promotions built before email_templates."""
+    if escape_fields:
+        latest_post = {key: escape(value) for key, value in latest_post.items()}
+        promotions = [{key: escape(value) for key, value in promo.items()} for promo in promotions]
+        url = escape(url, quote=True)
+    latest_post_section = f"""
+        <div style="margin: 20px 0; padding: 15px; border: 1px solid #e0e0e0; border-radius: 8px; background-color: #f9f9f9;">
+            <h3>Latest Post from AllTrails</h3>
+            <p><strong>Posted:</strong> {latest_post['time']}</p>
+            <div style="white-space: pre-line; background-color: white; padding: 12px; border-radius: 6px; border: 1px solid #e0e0e0; margin: 10px 0;">
+                {latest_post['text']}
+            </div>
+            <p><a href="{url}" style="color: #1a73e8; text-decoration: none;">View on Facebook →</a></p>
+        </div>
+        """
+    subject = f"🎉 AllTrails Promotion Found! - {NOW.strftime('%Y-%m-%d')}"
+    html_content = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #1a73e8;">🎉 AllTrails Promotion Found!</h2>
+                <p>We found the following promotions on the AllTrails Facebook page:</p>
+                {latest_post_section}
+                <h3>🎯 Promotions Found:</h3>
+        """
+    for i, promo in enumerate(promotions, 1):
+        html_content += f"""
+            <div style="margin-bottom: 20px; padding: 15px; border: 1px solid #e0e0e0; border-radius: 8px; background-color: #fff8e1;">
+                <h3 style="color: #e65100;">🎁 Promotion {i} - {promo['match'].upper()}</h3>
+                <p><strong>Posted:</strong> {promo['date']}</p>
+                <div style="white-space: pre-line; background-color: white; padding: 12px; border-radius: 6px; border: 1px solid #e0e0e0;">
+                    {promo['text']}
+                </div>
+                <p><a href="{url}" style="color: #1a73e8; text-decoration: none; font-weight: bold;">View on Facebook →</a></p>
+            </div>
+            """
+    html_content += f"""
+                <div style="margin-top: 30px; padding: 15px; background-color: #f5f5f5; border-radius: 8px; text-align: center;">
+                    <p>Check the <a href="{url}" style="color: #1a73e8; text-decoration: none; font-weight: bold;">AllTrails Facebook page</a> for more details.</p>
+                    <p style="color: #666; font-size: 0.9em;">Happy trails! 🚶‍♂️🌲</p>
+                </div>
+            </body>
+        </html>
+        """
+    return subject, html_content, None
+
+
+def new_render(promotions, latest_post, url=PAGE_URL):
+    """What notify_promotions does now, including building the structured inputs."""
+    latest = LatestPost(latest_post['time'], latest_post['text'])
+    items = [Promotion(p['match'], p['date'], p['text'], p.get('permalink')) for p in promotions]
+    return email_templates.render_promotions(items, latest, url, NOW)
+
+
+def mime_size(subject, html, text):
+    """Size of the message as sent: through notifier for the new renderer, as the old send_email built it otherwise."""
+    if text:
+        msg = MIMEMultipart('alternative')
+        parts = Notification(subject, html, is_html=True, text=text).parts()
+    else:
+        msg = MIMEMultipart()
+        parts = [MIMEText(html, 'html')]
+    msg['Subject'] = subject
+    for part in parts:
+        msg.attach(part)
+    return len(msg.as_bytes())
+
+
+def time_render(render, promotions, latest_post, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(promotions, latest_post)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,100,1000", help="comma-separated promotion counts")
+    parser.add_argument("--repeat", type=int, default=20, help="renders per size; the best time is kept")
+    args = parser.parse_args()
+
+    latest_post = {'time': "2024-06-15 09:00:00", 'text': SNIPPETS[0]}
+    print(f"{'promos':>7} | {'impl':<10} | {'render ms':>10} | {'html KB':>9} | {'text KB':>8} | {'MIME KB':>9}")
+    print("-" * 69)
+    for size in (int(s) for s in args.sizes.split(",")):
+        promotions = synthetic_promotions(size)
+        implementations = (
+            ("legacy", legacy_render),
+            ("legacy+esc", lambda promos, latest: legacy_render(promos, latest, escape_fields=True)),
+            ("new", new_render),
+        )
+        for label, render in implementations:
+            elapsed = time_render(render, promotions, latest_post, args.repeat)
+            subject, html, text = render(promotions, latest_post)
+            text_kb = len(text.encode()) / 1024 if text else 0
+            print(f"{size:>7} | {label:<10} | {elapsed * 1000:>10.3f} | {len(html.encode()) / 1024:>9.1f} | "
+                  f"{text_kb:>8.1f} | {mime_size(subject, html, text) / 1024:>9.1f}")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark fb_time.parse_facebook_time against the old parser.
+
+Uses the recorded time strings in benchmarks/fb_time_samples.jsonl, whose
+expected values are relative to REFERENCE_TIME. Reports accuracy and parse
+throughput for both implementations.
+
+    python benchmarks/bench_fb_time.py [--iterations 200000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil.parser import parse as parse_date
+from dateutil.relativedelta import relativedelta
+
+import fb_time
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fb_time_samples.jsonl")
+REFERENCE_TIME = datetime(2024, 6, 15, 12, 0)
+
+
+class _PinnedDatetime(datetime):
+    """datetime whose now() is REFERENCE_TIME, so the old parser can be scored."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return REFERENCE_TIME
+
+
+def legacy_parse_facebook_time(time_str):
+    """The parser facebook_scraper used before fb_time, with its clock pinned."""
+    if not time_str:
+        return None
+
+    now = _PinnedDatetime.now()
+    time_str = time_str.lower()
+
+    try:
+        if 'hr' in time_str or 'hour' in time_str:
+            hours = int(re.search(r'\d+', time_str).group())
+            return now - timedelta(hours=hours)
+        elif 'min' in time_str:
+            minutes = int(re.search(r'\d+', time_str).group())
+            return now - timedelta(minutes=minutes)
+        elif 'yesterday' in time_str:
+            return now - timedelta(days=1)
+        elif 'day' in time_str:
+            days = int(re.search(r'\d+', time_str).group())
+            return now - timedelta(days=days)
+        elif 'week' in time_str:
+            weeks = int(re.search(r'\d+', time_str).group())
+            return now - timedelta(weeks=weeks)
+        elif 'month' in time_str:
+            months = int(re.search(r'\d+', time_str).group())
+            return now - relativedelta(months=months)
+        elif 'year' in time_str:
+            years = int(re.search(r'\d+', time_str).group())
+            return now - relativedelta(years=years)
+        else:
+            return parse_date(time_str, fuzzy=True, default=REFERENCE_TIME.replace(hour=0, minute=0))
+    except Exception:
+        return None
+
+
+def load_samples(path=SAMPLES_PATH):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        row['expected'] = datetime.fromisoformat(row['expected']) if row['expected'] else None
+    return rows
+
+
+def accuracy(parse, samples):
+    correct = 0
+    wrong = []
+    for row in samples:
+        result = parse(row['text'])
+        if result == row['expected']:
+            correct += 1
+        else:
+            wrong.append((row['text'], result, row['expected']))
+    return correct / len(samples), wrong
+
+
+def throughput(parse, texts, iterations):
+    stream = (texts * (iterations // len(texts) + 1))[:iterations]
+    start = time.perf_counter()
+    for text in stream:
+        parse(text)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000, help="strings to parse per implementation")
+    parser.add_argument("--show-errors", action="store_true", help="print strings each parser got wrong")
+    args = parser.parse_args()
+
+    samples = load_samples()
+    texts = [row['text'] for row in samples]
+
+    def new_parse(text):
+        return fb_time.parse_facebook_time(text, REFERENCE_TIME)
+
+    new_accuracy, new_wrong = accuracy(new_parse, samples)
+    legacy_accuracy, legacy_wrong = accuracy(legacy_parse_facebook_time, samples)
+    print(f"Samples: {len(samples)} recorded time strings (reference {REFERENCE_TIME})")
+    print(f"  fb_time accuracy: {new_accuracy:.0%}")
+    print(f"  legacy accuracy:  {legacy_accuracy:.0%}")
+    if args.show_errors:
+        for label, wrong in (("fb_time", new_wrong), ("legacy", legacy_wrong)):
+            for text, got, expected in wrong:
+                print(f"  [{label}] {text!r}: got {got}, expected {expected}")
+
+    # Legacy is slow, so give it a smaller share of the iterations
+    legacy_rate = throughput(legacy_parse_facebook_time, texts, max(len(texts), args.iterations // 20))
+    fb_time.tokenize.cache_clear()
+    new_rate = throughput(new_parse, texts, args.iterations)
+    print(f"\nThroughput:")
+    print(f"  fb_time: {new_rate:>12,.0f} strings/sec  (cache: {fb_time.tokenize.cache_info()})")
+    print(f"  legacy:  {legacy_rate:>12,.0f} strings/sec")
+    print(f"  speedup: {new_rate / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
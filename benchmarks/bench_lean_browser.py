@@ -0,0 +1,103 @@
+"""Compare Chrome's full and lean launch profiles on the same page.
+
+For each profile, starts a fresh Chrome through setup_driver(), loads the page
+and waits for the first post, then reports time-to-posts, what the page load
+transferred (Resource Timing, so a lower bound for cross-origin assets) and
+the RSS of the Chrome processes. By default the page is the recorded fixture,
+whose images, video and fonts are synthesized by the replay server; pass
+--url to measure a live page instead.
+
+    python benchmarks/bench_lean_browser.py [--iterations 3] [--url https://www.facebook.com/AllTrails]
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_replay import FIXTURES, descendant_pids, fixture_server, status_kb
+
+
+def chrome_memory_mb():
+    """(current, peak) RSS in MB summed over this process's browser children."""
+    pids = descendant_pids(os.getpid())
+    current = sum(status_kb(pid, "VmRSS") for pid in pids)
+    peak = sum(status_kb(pid, "VmHWM") for pid in pids)
+    return round(current / 1024, 1), round(peak / 1024, 1)
+
+
+def measure(url, lean, selector):
+    import facebook_scraper
+    from lean_browser import page_weight
+    from waits import load_page, wait_for_selector
+
+    start = time.perf_counter()
+    driver = facebook_scraper.setup_driver(lean=lean)
+    started = time.perf_counter()
+    try:
+        load_page(driver, url)
+        loaded = time.perf_counter()
+        wait_for_selector(driver, selector)
+        ready = time.perf_counter()
+        weight = page_weight(driver) or {}
+        rss, peak = chrome_memory_mb()
+    finally:
+        driver.quit()
+    return {
+        'driver_start_ms': round((started - start) * 1000, 1),
+        'driver_get_ms': round((loaded - started) * 1000, 1),
+        'posts_ready_ms': round((ready - started) * 1000, 1),
+        'requests': weight.get('requests'),
+        'kb_transferred': round(weight.get('bytes', 0) / 1024, 1),
+        'dom_content_loaded_ms': weight.get('dom_content_loaded_ms'),
+        'load_ms': weight.get('load_ms'),
+        'chrome_rss_mb': rss,
+        'chrome_peak_rss_mb': peak,
+    }
+
+
+def summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(statistics.median(values), 1) if values else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3, help="Chrome launches per profile")
+    parser.add_argument("--url", help="page to load instead of the local fixture")
+    parser.add_argument("--selector", default="div[role='article']", help="element that means posts are ready")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = contextlib.nullcontext(None) if args.url else fixture_server()
+    results = {}
+    with server as base_url:
+        url = args.url or f"{base_url}/{FIXTURES['facebook'][0]}"
+        print(f"Loading {url}")
+        for label, lean in (("full", False), ("lean", True)):
+            runs = [measure(url, lean, args.selector) for _ in range(args.iterations)]
+            results[label] = summarize(runs)
+
+    keys = list(results['full'])
+    print(f"\n{'metric':<24} | {'full':>10} | {'lean':>10} | {'change':>8}")
+    print("-" * 62)
+    for key in keys:
+        full, lean = results['full'][key], results['lean'][key]
+        change = f"{(lean - full) / full * 100:+.0f}%" if full and lean is not None else "-"
+        print(f"{key:<24} | {full if full is not None else '-':>10} | {lean if lean is not None else '-':>10} | {change:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'url': url, 'iterations': args.iterations, 'profiles': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark the price history store at a million readings.
+
+Fills a fresh SQLite file with synthetic readings (hourly prices with slow
+drift and occasional sales) spread over many sources and plans, then times the
+queries the alerting uses: latest reading, 90-day range and summary, 90-day
+low, 30-day trailing median, drop from median and first time below a price.
+
+    python benchmarks/bench_price_history.py [--rows 1000000] [--sources 20] [--plans 2]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_history import PriceHistory
+
+
+def synthetic_readings(sources, plans, per_series, end, seed=7):
+    """Yield (source, plan, observed_at, price) hourly up to `end`, per series."""
+    rng = random.Random(seed)
+    start = end - timedelta(hours=per_series)
+    for s in range(sources):
+        for p in range(plans):
+            source, plan = f"source-{s:03d}", f"plan-{p}"
+            base = rng.uniform(20, 80)
+            price = base
+            for hour in range(per_series):
+                # Mean-reverting walk, with a 20-40% sale roughly every few months
+                price += rng.gauss(0, 0.05) + (base - price) * 0.01
+                sale = rng.uniform(0.6, 0.8) if hour % 2000 < 48 and (hour // 2000) % 3 == 0 else 1.0
+                yield source, plan, start + timedelta(hours=hour), round(price * sale, 2)
+
+
+def timed(fn, repeat):
+    """Median and p95 latency in ms over `repeat` calls, plus the last result."""
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {'median_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3)}, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="total readings to insert")
+    parser.add_argument("--sources", type=int, default=20)
+    parser.add_argument("--plans", type=int, default=2, help="plans per source")
+    parser.add_argument("--batch", type=int, default=50_000, help="readings per insert transaction")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per query")
+    parser.add_argument("--path", help="database file (default: a temporary file, deleted afterwards)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    series = args.sources * args.plans
+    per_series = args.rows // series
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    tmpdir = None if args.path else tempfile.TemporaryDirectory()
+    path = args.path or os.path.join(tmpdir.name, "prices.db")
+    history = PriceHistory(path)
+
+    print(f"Inserting {per_series * series:,} readings ({series} series, "
+          f"{per_series / 24 / 365:.1f} years hourly each) into {path}")
+    start = time.perf_counter()
+    batch, inserted = [], 0
+    for reading in synthetic_readings(args.sources, args.plans, per_series, end):
+        batch.append(reading)
+        if len(batch) >= args.batch:
+            inserted += history.record_many(batch)
+            batch = []
+    if batch:
+        inserted += history.record_many(batch)
+    insert_s = time.perf_counter() - start
+    history._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size = os.path.getsize(path)
+    print(f"  {inserted / insert_s:,.0f} rows/s, {size / 1024 / 1024:.1f} MB on disk "
+          f"({size / inserted:.1f} bytes/row)\n")
+
+    rng = random.Random(1)
+    pick = lambda: (f"source-{rng.randrange(args.sources):03d}", f"plan-{rng.randrange(args.plans)}")
+    since_90 = end - timedelta(days=90)
+
+    def append():
+        source, plan = pick()
+        history.record(source, 42.0, plan, end + timedelta(seconds=rng.randrange(1, 10 ** 6)))
+
+    queries = {
+        'latest': lambda: history.latest(*pick()),
+        'record (one reading)': append,
+        'readings 90d': lambda: len(history.readings(*pick(), since=since_90, until=end)),
+        'summary 90d': lambda: history.summary(*pick(), since=since_90, until=end),
+        'summary all time': lambda: history.summary(*pick()),
+        'min_price 90d': lambda: history.min_price(*pick(), days=90, now=end),
+        'trailing_median 30d': lambda: history.trailing_median(*pick(), days=30, now=end),
+        'drop_from_median 30d': lambda: history.drop_from_median(30.0, *pick(), days=30, now=end),
+        'first_below 25': lambda: history.first_below(pick()[0], 25.0, plan="plan-0"),
+    }
+    results = {'rows': inserted, 'series': series, 'insert_rows_per_s': round(inserted / insert_s),
+               'bytes_per_row': round(size / inserted, 1), 'queries': {}}
+    print(f"{'query':<24} | {'median ms':>10} | {'p95 ms':>9}")
+    print("-" * 49)
+    for name, fn in queries.items():
+        stats, _ = timed(fn, args.repeat)
+        results['queries'][name] = stats
+        print(f"{name:<24} | {stats['median_ms']:>10.3f} | {stats['p95_ms']:>9.3f}")
+
+    history.close()
+    if tmpdir:
+        tmpdir.cleanup()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
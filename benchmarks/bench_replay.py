@@ -0,0 +1,388 @@
+"""Replay benchmark: run the scrapers against recorded pages, offline.
+
+Serves the HTML snapshots in benchmarks/fixtures/ from a local HTTP server and
+drives the real code paths against them: the requests-based static tier
+(scrape_facebook, check_membership_price) and, when Chrome is available, the
+browser tier (setup_driver, extract_posts). For each stage
+it reports wall time, WebDriver commands, peak RSS and posts/sec, and writes
+the results to JSON so runs from different versions can be compared.
+
+    python benchmarks/bench_replay.py [--iterations 5] [--no-browser]
+    python benchmarks/bench_replay.py --compare benchmarks/results/replay-<old>.json
+    python benchmarks/bench_replay.py --record      # refresh fixtures from the live sites
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+FIXTURES = {
+    'facebook': ("facebook_page.html", "https://www.facebook.com/AllTrails", "div[role='article']"),
+    'membership': ("membership_page.html", "https://www.alltrails.com/membership", "div.price"),
+}
+
+
+# Synthetic bodies for the fixtures' images, video and fonts, sized like Facebook's
+ASSET_SIZES = {'.jpg': 120_000, '.png': 8_000, '.mp4': 1_500_000, '.woff2': 60_000}
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        size = ASSET_SIZES.get(os.path.splitext(path)[1])
+        if not path.startswith("/assets/") or size is None:
+            return super().do_GET()
+        self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self.wfile.write(b"\0" * size)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def fixture_server(directory=FIXTURES_DIR):
+    """Serve `directory` on an ephemeral localhost port; yields the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def descendant_pids(pid):
+    """PIDs of every live process below `pid` (chromedriver, Chrome), Linux only."""
+    children = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def status_kb(pid, field="VmHWM"):
+    """A memory field (in KB) from /proc/<pid>/status, or 0 if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def peak_rss_mb():
+    """Peak RSS of this process plus the peaks of its live child processes."""
+    total_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    total_kb += sum(status_kb(pid) for pid in descendant_pids(os.getpid()))
+    return round(total_kb / 1024, 1)
+
+
+class CommandCounter:
+    """Count WebDriver commands by wrapping the driver's single dispatch point."""
+
+    def __init__(self, driver=None):
+        self.count = 0
+        if driver is not None:
+            self.attach(driver)
+
+    def attach(self, driver):
+        execute = driver.execute
+
+        def counted(driver_command, params=None):
+            self.count += 1
+            return execute(driver_command, params)
+
+        driver.execute = counted
+
+
+class Recorder:
+    """Collect per-stage samples across iterations."""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.samples = {}
+        self.notes = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, commands=None):
+        """Time one stage. The body may set `metrics['posts']` for throughput."""
+        metrics = {'posts': 0}
+        before = commands.count if commands else 0
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with output:
+            yield metrics
+        elapsed = time.perf_counter() - start
+        sample = self.samples.setdefault(name, {'wall': [], 'commands': [], 'posts': [], 'peak_rss_mb': 0.0})
+        sample['wall'].append(elapsed)
+        sample['commands'].append((commands.count if commands else 0) - before)
+        sample['posts'].append(metrics['posts'])
+        sample['peak_rss_mb'] = max(sample['peak_rss_mb'], peak_rss_mb())
+
+    def summary(self):
+        stages = {}
+        for name, sample in self.samples.items():
+            wall = sample['wall']
+            median = statistics.median(wall)
+            posts = statistics.median(sample['posts'])
+            stages[name] = {
+                'runs': len(wall),
+                'wall_ms': {
+                    'min': round(min(wall) * 1000, 3),
+                    'median': round(median * 1000, 3),
+                    'mean': round(statistics.fmean(wall) * 1000, 3),
+                    'max': round(max(wall) * 1000, 3),
+                },
+                'webdriver_commands': round(statistics.median(sample['commands'])),
+                'posts': posts,
+                'posts_per_sec': round(posts / median, 1) if posts and median else None,
+                'peak_rss_mb': sample['peak_rss_mb'],
+            }
+        return stages
+
+
+def run_static(recorder, base_url, iterations):
+    """The requests path: fetch, parse, classify, notify, then the full public calls."""
+    import facebook_scraper
+    import webtracker
+    from fetch_engine import FetchEngine
+    from page_state import UNCHANGED, PageStateStore
+
+    fb_url = f"{base_url}/{FIXTURES['facebook'][0]}"
+    price_url = f"{base_url}/{FIXTURES['membership'][0]}"
+    for _ in range(iterations):
+        # A fresh engine each time so every iteration pays for a full 200 response
+        engine = FetchEngine()
+        with recorder.stage("static.fetch"):
+            html, _, _, _ = engine.fetcher.get(fb_url)
+        with recorder.stage("static.parse") as m:
+            posts = facebook_scraper._posts_from_html(html, page_url=fb_url)
+            m['posts'] = len(posts)
+        with recorder.stage("classification") as m:
+            found, promotions, latest = facebook_scraper._summarize_posts(posts, fb_url, datetime.now())
+            m['posts'] = len(posts)
+        with recorder.stage("notify") as m:
+            notify(facebook_scraper, found, promotions, latest, fb_url)
+            m['posts'] = len(promotions)
+        with recorder.stage("scrape_facebook") as m:
+            found, promotions, latest = facebook_scraper.scrape_facebook(fb_url)
+            m['posts'] = len(posts)
+        with recorder.stage("check_membership_price"):
+            price = webtracker.check_membership_price(price_url)
+
+        # Change detection: the second check of an unchanged page stops after the fingerprint
+        pages = PageStateStore(":memory:")
+        engine = FetchEngine(pages=pages)
+        scrape = lambda html: facebook_scraper._summarize_if_changed(
+            facebook_scraper._posts_from_html(html, page_url=fb_url), fb_url, pages=pages)
+        for stage in ("scrape_facebook.changed", "scrape_facebook.unchanged"):
+            with recorder.stage(stage) as m:
+                result = engine.check(fb_url, scrape)
+                m['posts'] = len(posts)
+            # What notify_promotions() does once the email is out
+            pages.commit(fb_url)
+        unchanged = result.value is UNCHANGED
+    recorder.notes['static'] = {'promotions_found': len(promotions), 'membership_price': price,
+                                'unchanged_detected': unchanged}
+
+
+def notify(facebook_scraper, found, promotions, latest, url):
+    """Deliver through the notifier when --smtp is set, otherwise render and build the message."""
+    if os.environ.get("REPLAY_SMTP"):
+        facebook_scraper.notify_promotions(found, promotions, latest, url)
+        return
+    from email_templates import LatestPost, Promotion, render_no_promotions, render_promotions
+    from notifier import Notification, get_notifier
+
+    latest_post = LatestPost(latest['time'], latest['text']) if latest else None
+    if found:
+        items = [Promotion(p['match'], p['date'], p['text'], p.get('permalink')) for p in promotions]
+        email = render_promotions(items, latest_post, url, datetime.now())
+    else:
+        email = render_no_promotions(latest_post, url, datetime.now())
+    notification = Notification(email.subject, email.html, True, "bench@localhost", text=email.text)
+    get_notifier()._build_message([notification]).as_bytes()
+
+
+def run_browser(recorder, base_url, iterations):
+    """The Selenium path, one fresh Chrome per iteration like an unpooled check."""
+    import facebook_scraper
+    import webtracker
+    from waits import WaitBudget, load_page
+
+    fb_url = f"{base_url}/{FIXTURES['facebook'][0]}"
+    price_url = f"{base_url}/{FIXTURES['membership'][0]}"
+    for _ in range(iterations):
+        commands = CommandCounter()
+        with recorder.stage("browser.driver_start", commands):
+            driver = facebook_scraper.setup_driver()
+            commands.attach(driver)
+        try:
+            budget = WaitBudget()
+            with recorder.stage("browser.page_load", commands):
+                load_page(driver, fb_url, budget)
+            # Expansion and extraction share one round-trip, so they're timed together
+            with recorder.stage("browser.expand_and_extract", commands) as m:
+                posts = facebook_scraper.extract_posts(driver, budget=budget)
+                m['posts'] = len(posts)
+            with recorder.stage("classification.browser") as m:
+                facebook_scraper._summarize_posts(posts, fb_url, datetime.now())
+                m['posts'] = len(posts)
+            with recorder.stage("browser.membership_price", commands):
+                load_page(driver, price_url, budget)
+                webtracker.parse_price(driver.page_source)
+        finally:
+            with recorder.stage("browser.quit", commands):
+                driver.quit()
+    recorder.notes['browser'] = {'posts_extracted': len(posts),
+                                 'expanded': sum(1 for post in posts if post.get('expanded'))}
+
+
+def git_version():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    return {'commit': git("rev-parse", "--short", "HEAD") or None, 'dirty': bool(git("status", "--porcelain", "--", "*.py"))}
+
+
+def print_table(stages):
+    print(f"{'stage':<28} | {'median ms':>10} | {'min ms':>9} | {'cmds':>5} | {'posts/s':>9} | {'peak RSS MB':>11}")
+    print("-" * 87)
+    for name, s in stages.items():
+        rate = f"{s['posts_per_sec']:,.1f}" if s['posts_per_sec'] else "-"
+        print(f"{name:<28} | {s['wall_ms']['median']:>10.2f} | {s['wall_ms']['min']:>9.2f} | "
+              f"{s['webdriver_commands']:>5} | {rate:>9} | {s['peak_rss_mb']:>11.1f}")
+
+
+def print_comparison(stages, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['version'].get('commit')}):")
+    for name, s in stages.items():
+        old = baseline['stages'].get(name)
+        if not old:
+            continue
+        before, after = old['wall_ms']['median'], s['wall_ms']['median']
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {name:<28} {before:>10.2f} -> {after:>10.2f} ms  ({change:+.1f}%)  "
+              f"cmds {old['webdriver_commands']} -> {s['webdriver_commands']}")
+
+
+def record_fixtures():
+    """Save rendered snapshots of the live pages over the fixtures."""
+    from fetch_engine import browser_page_source
+
+    for name, (filename, url, selector) in FIXTURES.items():
+        html = browser_page_source(url, wait_selector=selector)
+        with open(os.path.join(FIXTURES_DIR, filename), "w") as f:
+            f.write(html)
+        print(f"Recorded {name}: {url} -> {filename} ({len(html):,} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5, help="runs of each stage")
+    parser.add_argument("--no-browser", action="store_true", help="skip the Selenium stages")
+    parser.add_argument("--smtp", metavar="HOST:PORT", help="deliver the notify stage to this SMTP server")
+    parser.add_argument("--output", help="results file (default benchmarks/results/replay-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results file to diff against")
+    parser.add_argument("--record", action="store_true", help="re-record fixtures from the live sites and exit")
+    parser.add_argument("--verbose", action="store_true", help="show the scrapers' own output")
+    args = parser.parse_args()
+
+    # Every run should classify every post, use its own Chrome and never email for real
+    os.environ["USE_POST_STORE"] = "0"
+    os.environ["CHANGE_DETECTION"] = "0"
+    os.environ["USE_DRIVER_POOL"] = "0"
+    os.environ["NOTIFY_ASYNC"] = "0"
+    if args.smtp:
+        host, _, port = args.smtp.partition(":")
+        os.environ.update(SMTP_SERVER=host, SMTP_PORT=port or "25", SMTP_STARTTLS="0", REPLAY_SMTP="1")
+        os.environ.setdefault("EMAIL_USERNAME", "bench@localhost")
+        os.environ.setdefault("EMAIL_PASSWORD", "bench")
+
+    if args.record:
+        record_fixtures()
+        return
+
+    recorder = Recorder(verbose=args.verbose)
+    skipped = {}
+    with fixture_server() as base_url:
+        print(f"Serving {FIXTURES_DIR} at {base_url}")
+        run_static(recorder, base_url, args.iterations)
+        if args.no_browser:
+            skipped['browser'] = "--no-browser"
+        else:
+            try:
+                run_browser(recorder, base_url, args.iterations)
+            except Exception as e:
+                skipped['browser'] = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                print(f"Browser stages skipped: {skipped['browser']}")
+
+    stages = recorder.summary()
+    results = {
+        'benchmark': "replay",
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'stages': stages,
+        'notes': recorder.notes,
+        'skipped': skipped,
+    }
+    print()
+    print_table(stages)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"replay-{results['version']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        print_comparison(stages, args.compare)
+
+
+if __name__ == "__main__":
+    main()
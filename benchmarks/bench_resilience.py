@@ -0,0 +1,214 @@
+"""Fault-injection benchmark for circuit breakers and retry budgets.
+
+Serves the recorded membership page from a local server that can be switched
+into a failure mode (slow responses, 503s, 429 throttling, connection resets,
+or a 200 without the price markup). One source is checked back to back
+through FetchEngine while the server goes healthy -> outage -> healthy, once
+with RESILIENCE off and once with it on. The browser tier is simulated: it
+costs `--browser-cost` seconds plus, when the price never shows up, the rest
+of its wait budget, which is what a real Chrome check burns on a broken page.
+
+Reports busy seconds, seconds wasted on failed checks, checks that failed fast
+on an open circuit, error emails that would have gone out, and how long after
+the outage ended the first successful check came. Exits non-zero if, with
+resilience on, the breaker never opened, never let a probe through to
+recover, sent more than one error email per outage, or wasted as much time as
+running without it.
+
+    python benchmarks/bench_resilience.py [--modes timeout,503,429,reset,no_markup] [--outage 8]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_replay import FIXTURES, FIXTURES_DIR
+
+MODES = ("timeout", "503", "429", "reset", "no_markup")
+
+
+class FaultServer(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+    mode = "ok"
+    delay = 1.0
+
+    def handle_error(self, request, client_address):
+        # Clients give up on slow responses mid-write; that's the point
+        pass
+
+
+class _FaultHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        mode = self.server.mode
+        if mode == "timeout":
+            time.sleep(self.server.delay)
+        elif mode in ("503", "429"):
+            self.send_response(int(mode))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        elif mode == "reset":
+            self.close_connection = True
+            self.connection.close()
+            return
+        elif mode == "no_markup":
+            body = b"<html><body><h1>We'll be right back</h1></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def fault_server(delay):
+    import threading
+
+    server = FaultServer(("127.0.0.1", 0), partial(_FaultHandler, directory=FIXTURES_DIR))
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}/{FIXTURES['membership'][0]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def simulated_browser(cost, wait, timeout):
+    """A browser_check that costs what Chrome would, without needing Chrome."""
+    import requests
+
+    import webtracker
+    from waits import SelectorTimeout, WaitBudget
+
+    def browser_check(url):
+        budget = WaitBudget(total=wait)
+        time.sleep(cost)
+        response = requests.get(url, timeout=timeout)
+        price = webtracker.parse_price(response.text) if response.ok else None
+        if price is None:
+            # Chrome renders whatever came back and waits out the budget for div.price
+            time.sleep(budget.remaining())
+            raise SelectorTimeout("'div.price' did not appear")
+        return price
+
+    return browser_check
+
+
+def scenario(server, url, mode, enabled, args):
+    """Healthy, then `mode` for args.outage seconds, then healthy again."""
+    import webtracker
+    from fetch_engine import FetchEngine, StaticFetcher
+    from resilience import CircuitOpen, Resilience
+
+    resilience = Resilience(enabled=enabled)
+    engine = FetchEngine(StaticFetcher(timeout=args.static_timeout), resilience=resilience)
+    browser_check = simulated_browser(args.browser_cost, args.browser_wait, args.static_timeout)
+    outage_start = time.monotonic() + args.healthy
+    outage_end = outage_start + args.outage
+    end = outage_end + args.recovery
+    stats = {'checks': 0, 'failed': 0, 'fail_fast': 0, 'busy_s': 0.0, 'wasted_s': 0.0,
+             'error_emails': 0, 'recovery_s': None}
+
+    while (now := time.monotonic()) < end:
+        server.mode = mode if outage_start <= now < outage_end else "ok"
+        started = time.monotonic()
+        try:
+            engine.check(url, webtracker.parse_price, browser_check, source="bench")
+            if now >= outage_end and stats['recovery_s'] is None:
+                stats['recovery_s'] = round(time.monotonic() - outage_end, 2)
+        except CircuitOpen:
+            stats['fail_fast'] += 1
+        except Exception:
+            stats['failed'] += 1
+            stats['wasted_s'] += time.monotonic() - started
+            stats['error_emails'] += resilience.take_alert("bench")
+        stats['checks'] += 1
+        stats['busy_s'] += time.monotonic() - started
+        time.sleep(max(0.0, args.cadence - (time.monotonic() - started)))
+
+    engine.fetcher.session.close()
+    stats['busy_s'] = round(stats['busy_s'], 2)
+    stats['wasted_s'] = round(stats['wasted_s'], 2)
+    return stats
+
+
+def problems(results):
+    """What the resilience-on runs got wrong, as readable lines (empty when all is well)."""
+    found = []
+    for mode, runs in results.items():
+        on, off = runs['on'], runs['off']
+        if not on['fail_fast']:
+            found.append(f"{mode}: the breaker never opened (no check failed fast)")
+        if on['recovery_s'] is None:
+            found.append(f"{mode}: no check succeeded after the outage (the half-open probe never got through)")
+        if on['error_emails'] != 1:
+            found.append(f"{mode}: {on['error_emails']} error emails for one outage")
+        if on['wasted_s'] >= off['wasted_s']:
+            found.append(f"{mode}: wasted {on['wasted_s']}s with resilience on vs {off['wasted_s']}s off")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--healthy", type=float, default=1.0, help="seconds healthy before the outage")
+    parser.add_argument("--outage", type=float, default=8.0, help="seconds of failures")
+    parser.add_argument("--recovery", type=float, default=6.0, help="seconds healthy after the outage")
+    parser.add_argument("--cadence", type=float, default=0.2, help="seconds between check starts")
+    parser.add_argument("--static-timeout", type=float, default=0.5)
+    parser.add_argument("--browser-cost", type=float, default=0.3, help="seconds to start and render a page")
+    parser.add_argument("--browser-wait", type=float, default=2.0, help="browser wait budget, seconds")
+    parser.add_argument("--verbose", action="store_true", help="show the checks' own output")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Shrink the breaker's timescale to fit the scenario; nothing is persisted or emailed
+    os.environ.update(CHANGE_DETECTION="0", USE_PRICE_HISTORY="0", BREAKER_COOLDOWN="1",
+                      BREAKER_MAX_COOLDOWN="4", RETRY_BASE_DELAY="0.1", PROBE_WAIT_BUDGET="0.5")
+
+    results = {}
+    with fault_server(delay=args.static_timeout * 2) as (server, url):
+        for mode in args.modes.split(","):
+            results[mode] = {}
+            for label, enabled in (("off", False), ("on", True)):
+                output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with output:
+                    results[mode][label] = scenario(server, url, mode, enabled, args)
+
+    print(f"{args.healthy:.0f}s healthy, {args.outage:.0f}s outage, {args.recovery:.0f}s healthy; "
+          f"a check every {args.cadence}s at most\n")
+    keys = ['checks', 'failed', 'fail_fast', 'busy_s', 'wasted_s', 'error_emails', 'recovery_s']
+    print(f"{'mode':<10} | {'resilience':<10} | " + " | ".join(f"{key:>10}" for key in keys))
+    print("-" * (26 + 13 * len(keys)))
+    for mode, runs in results.items():
+        for label, stats in runs.items():
+            print(f"{mode:<10} | {label:<10} | " + " | ".join(f"{stats[key]!s:>10}" for key in keys))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    found = problems(results)
+    for problem in found:
+        print(f"FAIL {problem}")
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
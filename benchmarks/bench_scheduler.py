@@ -0,0 +1,116 @@
+"""Run hundreds of schedules in one process against the local fixtures.
+
+Each source checks the recorded membership page on its own interval, and a
+fraction point at a missing page to exercise backoff. Reports completed checks,
+how late checks started relative to their due time, peak RSS and thread count.
+It then restarts the scheduler on the same state file to show that schedules
+resume instead of all firing at once.
+
+    python benchmarks/bench_scheduler.py [--sources 300] [--duration 20] [--failing 0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_replay import FIXTURES, fixture_server
+
+
+def build_sources(base_url, count, failing, min_interval, max_interval, seed=3):
+    from monitor import PriceSource
+
+    class BenchSource(PriceSource):
+        def browser_check(self, url):
+            raise RuntimeError("no browser in this benchmark")
+
+    rng = random.Random(seed)
+    good = f"{base_url}/{FIXTURES['membership'][0]}"
+    return [
+        BenchSource(f"bench-{i:04d}", f"{base_url}/missing.html" if rng.random() < failing else good,
+                    min_interval=0, interval=rng.uniform(min_interval, max_interval))
+        for i in range(count)
+    ]
+
+
+def run(sources, state_path, duration):
+    from monitor import Monitor
+    from scheduler import ScheduleState, Scheduler
+
+    monitor = Monitor(sources)
+    scheduler = Scheduler(monitor, ScheduleState(state_path))
+    threads = [0]
+
+    def sample_threads():
+        while not done.is_set():
+            threads[0] = max(threads[0], threading.active_count())
+            time.sleep(0.2)
+
+    done = threading.Event()
+    threading.Thread(target=sample_threads, daemon=True).start()
+    start = time.perf_counter()
+    try:
+        scheduler.run(until=time.time() + duration)
+    finally:
+        done.set()
+        monitor.shutdown()
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    stats.update(checks_per_s=round(stats['runs'] / elapsed, 1), peak_threads=threads[0])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--failing", type=float, default=0.1, help="fraction of sources that always fail")
+    parser.add_argument("--min-interval", type=float, default=2.0, help="shortest source interval, seconds")
+    parser.add_argument("--max-interval", type=float, default=6.0, help="longest source interval, seconds")
+    parser.add_argument("--verbose", action="store_true", help="show the scheduler's own output")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    # Parse and alert logic run for real; nothing is persisted outside tmpdir or emailed
+    os.environ.update(CHANGE_DETECTION="0", USE_PRICE_HISTORY="0", NOTIFY_ASYNC="0",
+                      BACKOFF_BASE="1", STARTUP_SPREAD="2", HTTP_CONCURRENCY="50",
+                      PRICE_HISTORY_PATH=os.path.join(tmpdir.name, "prices.db"))
+    state_path = os.path.join(tmpdir.name, "schedule.db")
+
+    results = {}
+    with fixture_server() as base_url:
+        sources = build_sources(base_url, args.sources, args.failing, args.min_interval, args.max_interval)
+        for label in ("first run", "after restart"):
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                results[label] = run(sources, state_path, args.duration)
+    results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    tmpdir.cleanup()
+
+    print(f"{args.sources} sources, intervals {args.min_interval}-{args.max_interval}s, "
+          f"{args.failing:.0%} failing, {args.duration:.0f}s per run")
+    keys = ['overdue_at_start', 'runs', 'failed_runs', 'checks_per_s',
+            'lateness_p50', 'lateness_p95', 'lateness_max', 'peak_threads']
+    print(f"\n{'metric':<16} | {'first run':>10} | {'after restart':>13}")
+    print("-" * 46)
+    for key in keys:
+        print(f"{key:<16} | {results['first run'][key]!s:>10} | {results['after restart'][key]!s:>13}")
+    print(f"\nPeak RSS: {results['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
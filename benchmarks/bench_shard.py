@@ -0,0 +1,173 @@
+"""Scaling benchmark for sharded checks: 1 to 8 worker processes on the offline fixtures.
+
+Builds a large source list of recorded Facebook pages and membership pages,
+all served by the local fixture server, and checks every source once with
+ShardedMonitor at each worker count. The checks run the real fetch, parse,
+classify and email-render code; nothing is sent and no browser is started.
+The single-process Monitor is run on the same list as a baseline. Reports
+wall time, checks/s, speedup over one worker, time to the first result
+(worker start-up), throughput after that and how evenly the work was spread.
+The fixture server runs in its own process so it doesn't share the checks' GIL.
+
+    python benchmarks/bench_shard.py [--sources 400] [--workers 1,2,4,8] [--concurrency 4]
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before anything reads them, here and in the worker processes; nothing is persisted or emailed
+os.environ.update(CHANGE_DETECTION="0", USE_POST_STORE="0", USE_PRICE_HISTORY="0",
+                  NOTIFY_ASYNC="0", HTTP_CONCURRENCY="50")
+
+from bench_replay import FIXTURES, fixture_server, notify
+from monitor import FacebookSource, PriceSource
+
+
+# Module level so worker processes can unpickle them
+class BenchFacebookSource(FacebookSource):
+    def browser_check(self, url):
+        raise RuntimeError("no browser in this benchmark")
+
+    def handle(self, value):
+        import facebook_scraper
+        notify(facebook_scraper, *value, self.url)
+
+
+class BenchPriceSource(PriceSource):
+    def browser_check(self, url):
+        raise RuntimeError("no browser in this benchmark")
+
+
+def build_sources(base_url, count, price_share):
+    facebook = f"{base_url}/{FIXTURES['facebook'][0]}"
+    membership = f"{base_url}/{FIXTURES['membership'][0]}"
+    every = max(1, round(1 / price_share)) if price_share else 0
+    return [
+        BenchPriceSource(f"price-{i:04d}", membership, target_price=None, min_interval=0)
+        if every and i % every == 0 else
+        BenchFacebookSource(f"facebook-{i:04d}", facebook, min_interval=0)
+        for i in range(count)
+    ]
+
+
+def _serve(conn):
+    with fixture_server() as base_url:
+        conn.send(base_url)
+        conn.recv()
+
+
+@contextlib.contextmanager
+def fixture_process():
+    """fixture_server() in its own process, so serving doesn't compete with the checks for the GIL."""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(child,), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        parent.send(None)
+        process.join(timeout=5)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence this process and the worker processes it starts (they share fd 1)."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def run_sharded(sources, workers, concurrency, start_method):
+    from shard import ShardedMonitor
+
+    monitor = ShardedMonitor(sources, workers=workers, concurrency=concurrency, start_method=start_method)
+    start = time.perf_counter()
+    first, results = None, []
+    for result in monitor.iter_results():
+        first = first or time.perf_counter() - start
+        results.append(result)
+    elapsed = time.perf_counter() - start
+    per_worker = Counter(result['worker'] for result in results)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'checks_per_s': round(len(results) / elapsed, 1),
+        'first_result_s': round(first, 2),
+        # Throughput once every worker is up
+        'steady_per_s': round((len(results) - 1) / max(elapsed - first, 1e-9), 1),
+        'errors': sum(1 for result in results if result['error']),
+        'min_per_worker': min(per_worker.values()),
+        'max_per_worker': max(per_worker.values()),
+    }
+
+
+def run_single(sources):
+    from monitor import Monitor
+
+    monitor = Monitor(sources, browser_workers=1)
+    start = time.perf_counter()
+    try:
+        results = monitor.run()
+    finally:
+        monitor.shutdown()
+    elapsed = time.perf_counter() - start
+    return {'elapsed_s': round(elapsed, 2), 'checks_per_s': round(len(results) / elapsed, 1),
+            'errors': sum(1 for result in results if result['error'])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", type=int, default=400)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=4, help="checks in flight per worker")
+    parser.add_argument("--start-method", default="spawn", choices=("spawn", "fork", "forkserver"))
+    parser.add_argument("--price-share", type=float, default=0.25, help="fraction of membership-page sources")
+    parser.add_argument("--verbose", action="store_true", help="show the checks' own output")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {'cpu_count': os.cpu_count(), 'sources': args.sources, 'runs': {}}
+    with fixture_process() as base_url:
+        sources = build_sources(base_url, args.sources, args.price_share)
+        with contextlib.nullcontext() if args.verbose else quiet():
+            results['single_process'] = run_single(sources)
+            for workers in (int(w) for w in args.workers.split(",")):
+                results['runs'][workers] = run_sharded(sources, workers, args.concurrency, args.start_method)
+    results['peak_worker_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+    print(f"{args.sources} sources on {os.cpu_count()} CPU(s), {args.concurrency} checks in flight per worker, "
+          f"{args.start_method} start")
+    single = results['single_process']
+    print(f"Single-process Monitor: {single['elapsed_s']}s, {single['checks_per_s']} checks/s\n")
+    base = results['runs'][min(results['runs'])]['elapsed_s']
+    keys = ['elapsed_s', 'checks_per_s', 'first_result_s', 'steady_per_s', 'errors', 'min_per_worker', 'max_per_worker']
+    print(f"{'workers':>7} | " + " | ".join(f"{key:>14}" for key in keys) + f" | {'speedup':>7}")
+    print("-" * (10 + 17 * len(keys) + 10))
+    for workers, run in results['runs'].items():
+        run['speedup'] = round(base / run['elapsed_s'], 2)
+        print(f"{workers:>7} | " + " | ".join(f"{run[key]!s:>14}" for key in keys) + f" | {run['speedup']:>7}")
+    print(f"\nPeak worker RSS: {results['peak_worker_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
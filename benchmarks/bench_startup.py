@@ -0,0 +1,134 @@
+"""Benchmark import time and cold start of the web server.
+
+Import time: each module is imported in a fresh interpreter with
+`-X importtime`, and the heaviest dependencies are listed. Cold start:
+`python main.py` is started on a free port and timed until /healthz first
+answers. Then the first scraper-backed route (/tiers) is timed, and so is the
+background prewarm.
+
+    python benchmarks/bench_startup.py [--runs 5] [--prewarm imports] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["main", "facebook_scraper", "monitor", "webtracker", "fetch_engine"]
+
+
+def import_profile(module):
+    """Return ({module: cumulative_us}, total_wall_s) for one fresh import."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:"):
+            continue
+        _, cumul, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if cumul.isdigit():
+            cumulative[name] = max(cumulative.get(name, 0), int(cumul))
+    return cumulative, wall
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url, timeout=2):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def cold_start(prewarm, timeout=60):
+    """Start main.py and time its first responses. Returns a dict of seconds."""
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), PREWARM=prewarm, PYTHONUNBUFFERED="1")
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if get(f"{base}/healthz", timeout=0.5)[0] == 200:
+                    result['first_response_s'] = time.perf_counter() - start
+                    break
+            except OSError:
+                time.sleep(0.01)
+        else:
+            raise RuntimeError(f"main.py did not answer within {timeout}s")
+
+        if prewarm != "0":
+            while time.perf_counter() < deadline:
+                _, body = get(f"{base}/metrics")
+                if b'stage="prewarm"' in body:
+                    result['prewarmed_s'] = time.perf_counter() - start
+                    break
+                time.sleep(0.01)
+
+        before = time.perf_counter()
+        get(f"{base}/tiers", timeout=timeout)
+        result['first_scraper_route_s'] = time.perf_counter() - before
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--prewarm", default="imports", choices=["0", "imports", "browser"],
+                        help="PREWARM mode for the cold-start runs")
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list for main")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {'imports_ms': {}, 'cold_start_ms': {}, 'prewarm': args.prewarm}
+    print(f"{'module':<20} | {'import ms':>10} | {'process ms':>10}")
+    print("-" * 47)
+    heaviest = {}
+    for module in MODULES:
+        samples = [import_profile(module) for _ in range(args.runs)]
+        import_ms = statistics.median(profile[module] for profile, _ in samples) / 1000
+        wall_ms = statistics.median(wall for _, wall in samples) * 1000
+        results['imports_ms'][module] = round(import_ms, 1)
+        print(f"{module:<20} | {import_ms:>10.1f} | {wall_ms:>10.1f}")
+        if module == "main":
+            heaviest = samples[0][0]
+
+    print(f"\nHeaviest imports under main:")
+    heaviest.pop("main", None)
+    for name, us in sorted(heaviest.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {us / 1000:>8.1f} ms")
+
+    runs = [cold_start(args.prewarm) for _ in range(args.runs)]
+    print(f"\nCold start (PREWARM={args.prewarm}, median of {args.runs}):")
+    for key in runs[0]:
+        value = statistics.median(run[key] for run in runs) * 1000
+        results['cold_start_ms'][key] = round(value, 1)
+        print(f"  {key:<24} {value:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,8 @@ gcloud run deploy $SERVICE_NAME \
   --platform managed \
   --region $REGION \
   --memory=1Gi \
+  --cpu-boost \
+  --no-cpu-throttling \
   --no-allow-unauthenticated
 
 # Get service URL
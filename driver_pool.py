@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import metrics
+
+# Pool configuration (override via environment variables)
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "1"))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "25"))
+DRIVER_ACQUIRE_TIMEOUT = float(os.getenv("DRIVER_ACQUIRE_TIMEOUT", "120"))
+DRIVER_PROFILE_DIR = os.getenv("DRIVER_PROFILE_DIR") or os.path.join(
+    tempfile.gettempdir(), "alltrails-chrome-profiles"
+)
+# Cap on each profile's disk cache. On Cloud Run /tmp is in memory, so this counts against the memory limit
+DRIVER_DISK_CACHE_MB = int(os.getenv("DRIVER_DISK_CACHE_MB", "16"))
+
+
+class PooledDriver:
+    """A WebDriver owned by the pool, plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, driver, slot, profile_dir):
+        self.driver = driver
+        self.slot = slot
+        self.profile_dir = profile_dir
+        self.uses = 0
+        self.created_at = datetime.now()
+
+
+class DriverPool:
+    """Keep a small number of Chrome sessions warm between scrapes.
+
+    Each slot gets its own Chrome profile directory so cookies and cache
+    survive recycling. Drivers are health-checked on checkout and replaced
+    after `max_uses` checkouts or whenever they stop responding.
+    """
+
+    def __init__(self, factory, size=DRIVER_POOL_SIZE, max_uses=DRIVER_MAX_USES,
+                 acquire_timeout=DRIVER_ACQUIRE_TIMEOUT, profile_root=DRIVER_PROFILE_DIR):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.acquire_timeout = acquire_timeout
+        self.profile_root = profile_root
+        self._idle = []
+        self._free_slots = list(range(self.size))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    def _profile_dir(self, slot):
+        if not self.profile_root:
+            return None
+        path = os.path.join(self.profile_root, f"slot-{slot}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def is_healthy(pooled):
+        """Return True if the browser behind the driver still answers commands."""
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            metrics.log("driver_quit_failed", level="warning", slot=pooled.slot, error=e)
+
+    def _create(self, slot):
+        profile_dir = self._profile_dir(slot)
+        start = time.perf_counter()
+        driver = self.factory(profile_dir=profile_dir)
+        metrics.log("driver_started", slot=slot, elapsed_s=round(time.perf_counter() - start, 2))
+        return PooledDriver(driver, slot, profile_dir)
+
+    def acquire(self):
+        """Check out a driver, returning (pooled_driver, was_warm)."""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool has been shut down")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._free_slots:
+                    slot = self._free_slots.pop(0)
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No Chrome driver available after {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+
+        # Health checks and cold starts happen outside the lock
+        if pooled is not None:
+            if self.is_healthy(pooled):
+                pooled.uses += 1
+                with self._cond:
+                    self.warm_hits += 1
+                return pooled, True
+            metrics.log("driver_unhealthy", level="warning", slot=pooled.slot)
+            self._quit(pooled)
+            with self._cond:
+                self.crashed += 1
+            slot = pooled.slot
+
+        try:
+            pooled = self._create(slot)
+        except Exception:
+            self._give_back_slot(slot)
+            raise
+        pooled.uses += 1
+        with self._cond:
+            self.cold_starts += 1
+        return pooled, False
+
+    def _give_back_slot(self, slot):
+        with self._cond:
+            self._free_slots.append(slot)
+            self._cond.notify()
+
+    def release(self, pooled, discard=False):
+        """Return a driver to the pool, or retire it if it's worn out or broken."""
+        if not discard and pooled.uses >= self.max_uses:
+            metrics.log("driver_recycled", slot=pooled.slot, uses=pooled.uses)
+            with self._cond:
+                self.recycled += 1
+            discard = True
+        if not discard:
+            try:
+                # Drop the heavy page but keep the session (and its cookies) alive
+                pooled.driver.get("about:blank")
+            except Exception:
+                with self._cond:
+                    self.crashed += 1
+                discard = True
+
+        if discard or self._closed:
+            self._quit(pooled)
+            self._give_back_slot(pooled.slot)
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self):
+        """Context manager yielding a WebDriver from the pool."""
+        pooled, warm = self.acquire()
+        metrics.log("driver_checkout", slot=pooled.slot, warm=warm, use=pooled.uses)
+        discard = False
+        try:
+            yield pooled.driver
+        except Exception:
+            discard = not self.is_healthy(pooled)
+            if discard:
+                with self._cond:
+                    self.crashed += 1
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            total = self.warm_hits + self.cold_starts
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self.size - len(self._idle) - len(self._free_slots),
+                'warm_hits': self.warm_hits,
+                'cold_starts': self.cold_starts,
+                'warm_ratio': (self.warm_hits / total) if total else 0.0,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+            }
+
+    def shutdown(self, remove_profiles=False):
+        """Quit every idle driver. Checked-out drivers are quit when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+            self._give_back_slot(pooled.slot)
+        if remove_profiles and self.profile_root:
+            shutil.rmtree(self.profile_root, ignore_errors=True)
@@ -0,0 +1,132 @@
+from collections import namedtuple
+from html import escape
+
+# Structured inputs for the templates
+Promotion = namedtuple("Promotion", "match posted text permalink")
+LatestPost = namedtuple("LatestPost", "posted text")
+RenderedEmail = namedtuple("RenderedEmail", "subject html text")
+
+# Styles stay inline: several webmail clients drop <style> blocks from <head>.
+# They're compact and written once here, so the markup carries no indentation.
+_BODY = "font-family:Arial,sans-serif;line-height:1.6;color:#333;max-width:800px;margin:0 auto;padding:20px"
+_CARD = "margin:20px 0;padding:15px;border:1px solid #e0e0e0;border-radius:8px;background-color:"
+_POST = "white-space:pre-line;background-color:#fff;padding:12px;border-radius:6px;border:1px solid #e0e0e0"
+_LINK = "color:#1a73e8;text-decoration:none"
+_HEAD = f'<html><head><meta charset="utf-8"></head><body style="{_BODY}">'
+_TAIL = "</body></html>"
+_TITLE = '<h2 style="color:#1a73e8">'
+_FOOTER = '<div style="margin-top:30px;padding:15px;background-color:#f5f5f5;border-radius:8px;text-align:center">'
+_MUTED = '<p style="color:#666;font-size:.9em">'
+
+# Per-item templates. Positional %-formatting is the cheapest way to fill a
+# fixed layout in CPython, which matters when one alert carries many posts.
+# Arguments: posted, text, url (already escaped)
+_LATEST_HTML = (
+    f'<div style="{_CARD}#f9f9f9"><h3>Latest Post from AllTrails</h3>'
+    f'<p><strong>Posted:</strong> %s</p><div style="{_POST}">%s</div>'
+    f'<p><a href="%s" style="{_LINK}">View on Facebook →</a></p></div>'
+)
+_LATEST_MISSING_HTML = "<p>Could not retrieve the latest post. Please check the Facebook page directly.</p>"
+# Arguments: index, match, posted, text, url (escaped for the HTML version)
+_PROMO_HTML = (
+    f'<div style="{_CARD}#fff8e1"><h3 style="color:#e65100">🎁 Promotion %d - %s</h3>'
+    f'<p><strong>Posted:</strong> %s</p><div style="{_POST}">%s</div>'
+    f'<p><a href="%s" style="{_LINK}"><strong>View on Facebook →</strong></a></p></div>'
+)
+_PROMO_TEXT = "Promotion %d - %s\nPosted: %s\n%s\n%s\n"
+
+
+# Page frames around the latest post and promotion list. Arguments: url (escaped)
+_FOUND_INTRO_HTML = (
+    f'{_TITLE}🎉 AllTrails Promotion Found!</h2>'
+    '<p>We found the following promotions on the AllTrails Facebook page:</p>'
+)
+_FOUND_OUTRO_HTML = (
+    f'{_FOOTER}<p>Check the <a href="%s" style="{_LINK}"><strong>AllTrails Facebook page</strong></a>'
+    f' for more details.</p>{_MUTED}Happy trails! 🚶‍♂️🌲</p></div>'
+)
+_FOUND_INTRO_TEXT = "AllTrails Promotion Found!\n\nWe found the following promotions on the AllTrails Facebook page:\n\n"
+_FOUND_OUTRO_TEXT = "\nCheck the AllTrails Facebook page for more details: %s\nHappy trails!\n"
+_NONE_INTRO_HTML = (
+    f'{_TITLE}🔍 AllTrails Update</h2>'
+    "<p>No promotions were found on the AllTrails Facebook page today. Here's their latest post:</p>"
+)
+_NONE_OUTRO_HTML = (
+    f'{_FOOTER}<p>Check the <a href="%s" style="{_LINK}"><strong>AllTrails Facebook page</strong></a>'
+    f" for updates.</p>{_MUTED}We'll keep checking for you! 🚶‍♂️🌲</p></div>"
+)
+_NONE_INTRO_TEXT = "AllTrails Update\n\nNo promotions were found on the AllTrails Facebook page today. Here's their latest post:\n\n"
+_NONE_OUTRO_TEXT = "\nCheck the AllTrails Facebook page for updates: %s\n"
+
+
+def _escape_all(values, quote=False):
+    """escape() each value, in one call over the whole list rather than one per value."""
+    joined = "\0".join(values)
+    if joined.count("\0") != len(values) - 1:
+        # A value carries the separator itself
+        return [escape(value, quote) for value in values]
+    return escape(joined, quote).split("\0")
+
+
+def _latest_parts(latest_post, page_url):
+    if latest_post is None:
+        return _LATEST_MISSING_HTML, "Could not retrieve the latest post.\n"
+    html = _LATEST_HTML % (escape(latest_post.posted, False), escape(latest_post.text, False),
+                           escape(page_url, quote=True))
+    text = f"Latest post ({latest_post.posted}):\n{latest_post.text}\n"
+    return html, text
+
+
+def render_promotions(promotions, latest_post, page_url, date):
+    """Render the promotion alert as (subject, html, text) in one pass."""
+    url = escape(page_url, quote=True)
+    latest_html, latest_text = _latest_parts(latest_post, page_url)
+    labels = [promo.match.upper() for promo in promotions]
+    posted = [promo.posted for promo in promotions]
+    texts = [promo.text for promo in promotions]
+    links = [promo.permalink or page_url for promo in promotions]
+    count = len(promotions)
+    # Element text only needs &, < and > escaped; quotes matter inside the href
+    escaped = _escape_all(labels + posted + texts)
+    html = "".join((
+        _HEAD, _FOUND_INTRO_HTML, latest_html, "<h3>🎯 Promotions Found:</h3>",
+        *map(_PROMO_HTML.__mod__, zip(range(1, count + 1), escaped[:count], escaped[count:2 * count],
+                                      escaped[2 * count:], _escape_all(links, quote=True))),
+        _FOUND_OUTRO_HTML % url, _TAIL,
+    ))
+    text = "\n".join((
+        _FOUND_INTRO_TEXT, latest_text, "\nPromotions Found:\n\n",
+        *map(_PROMO_TEXT.__mod__, zip(range(1, count + 1), labels, posted, texts, links)),
+        _FOUND_OUTRO_TEXT % page_url,
+    ))
+    subject = f"🎉 AllTrails Promotion Found! - {date:%Y-%m-%d}"
+    return RenderedEmail(subject, html, text)
+
+
+def render_no_promotions(latest_post, page_url, date):
+    """Render the daily 'nothing found' update."""
+    latest_html, latest_text = _latest_parts(latest_post, page_url)
+    subject = f"AllTrails Update - No Promotions Found - {date:%Y-%m-%d}"
+    html = "".join((_HEAD, _NONE_INTRO_HTML, latest_html, _NONE_OUTRO_HTML % escape(page_url, quote=True), _TAIL))
+    return RenderedEmail(subject, html, "".join((_NONE_INTRO_TEXT, latest_text, _NONE_OUTRO_TEXT % page_url)))
+
+
+def render_price_alert(price, url, sent_at, reason=None):
+    """Render the membership sale alert. `reason` says why it fired (target or drop)."""
+    subject = f"🚨 AllTrails Membership Sale Alert! Now ${price}/year"
+    link = escape(url, quote=True)
+    html = (
+        f"{_HEAD}{_TITLE}AllTrails Membership Sale Alert! 🎉</h2>"
+        f"<p>The AllTrails annual membership is now <strong>${price}/year</strong>!</p>"
+        + (f"<p>That's {escape(reason)}.</p>" if reason else "") +
+        "<p>Hurry, this deal might not last long!</p>"
+        f'<p><a href="{link}" style="{_LINK}">Click here to check it out</a></p>'
+        f"<p>This alert was sent at: {sent_at:%Y-%m-%d %H:%M:%S}</p>{_TAIL}"
+    )
+    text = (
+        f"The AllTrails annual membership is now ${price}/year!\n"
+        + (f"That's {reason}.\n" if reason else "") +
+        f"Hurry, this deal might not last long!\n{url}\n\n"
+        f"This alert was sent at: {sent_at:%Y-%m-%d %H:%M:%S}\n"
+    )
+    return RenderedEmail(subject, html, text)
@@ -1,31 +1,31 @@
+import atexit
 import os
 import re
-import smtplib
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
-import schedule
-from dateutil.parser import parse as parse_date
-from dateutil.relativedelta import relativedelta
-
-# Facebook URL to scrape
-FACEBOOK_URL = "https://www.facebook.com/alltrails"
+from urllib.parse import urljoin
+from driver_pool import DRIVER_DISK_CACHE_MB, DriverPool
+from email_templates import LatestPost, Promotion, render_no_promotions, render_promotions
+from fb_time import parse_facebook_time
+from fetch_engine import get_fetch_engine
+from html_parse import ARTICLES, POST_MESSAGE, make_soup
+from lean_browser import LEAN_BROWSER, block_resources, configure_options, page_weight
+import metrics
+from notifier import get_notifier
+from page_state import UNCHANGED, commit_page, fingerprint, get_page_state
+from post_store import get_post_store, post_key
+from promo_classifier import get_classifier
+from resilience import CircuitOpen, get_resilience
+from page_scripts import EXTRACT_POSTS_JS, SCROLL_BATCH_JS
+from waits import EXPAND_TIMEOUT, WaitBudget, load_page, wait_for_selector
 
 # Load environment variables from .env file
 load_dotenv(override=True)
 
 # Email configuration
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
 SMTP_USERNAME = os.getenv("EMAIL_USERNAME") or os.getenv("EMAIL_SENDER")
 SMTP_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
@@ -40,344 +40,499 @@ if not SMTP_USERNAME or not SMTP_PASSWORD:
 # Facebook page URL
 FACEBOOK_URL = "https://www.facebook.com/AllTrails"
 
-def setup_driver():
-    """Set up and return a Chrome WebDriver."""
+MAX_POSTS_TO_CHECK = 5  # Only check the first 5 most recent posts
+
+# Reaction, comment and share counts, left out of a page's fingerprint
+VOLATILE_LINE = re.compile(r"^[\d.,]+[KM]?\s+(reactions?|comments?|shares?)$", re.IGNORECASE)
+
+# "top" checks the first MAX_POSTS_TO_CHECK posts; "deep" scrolls back to the
+# cutoff date (or the first already-seen post), streaming posts as it goes
+SCROLL_MODE = os.getenv("SCROLL_MODE", "top")
+DEEP_SCROLL_MAX_POSTS = int(os.getenv("DEEP_SCROLL_MAX_POSTS", "500"))
+DEEP_SCROLL_DAYS = int(os.getenv("DEEP_SCROLL_DAYS", "7"))
+PRUNE_SEEN_POSTS = os.getenv("PRUNE_SEEN_POSTS", "1") != "0"
+SCROLL_LOAD_TIMEOUT = float(os.getenv("SCROLL_LOAD_TIMEOUT", "5"))
+
+# Remember processed posts so each run only classifies and alerts on new ones
+USE_POST_STORE = os.getenv("USE_POST_STORE", "1") != "0"
+
+# chromedriver resolved at image build time; without it Selenium looks one up at runtime
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
+
+# Keep Chrome sessions warm between scrapes (set USE_DRIVER_POOL=0 to disable)
+USE_DRIVER_POOL = os.getenv("USE_DRIVER_POOL", "1") != "0"
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+def setup_driver(profile_dir=None, lean=LEAN_BROWSER):
+    """Set up and return a Chrome WebDriver.
+    
+    With `lean` (the default, see lean_browser.py) images, media, fonts and
+    trackers are blocked and driver.get() returns at DOMContentLoaded.
+    """
+    # Selenium is imported on first use so the web server starts without it
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    
     try:
         chrome_options = Options()
         chrome_options.add_argument("--headless")  # Run in headless mode
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
+        configure_options(chrome_options, lean)
+        if profile_dir:
+            # Reuse cookies/cache across recycled drivers
+            chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+            # Chrome reads 0 as "default size", so the smallest cap is one byte
+            chrome_options.add_argument(f"--disk-cache-size={max(1, DRIVER_DISK_CACHE_MB * 1024 * 1024)}")
         
-        # Try to use system Chrome first, fallback to ChromeDriverManager
-        try:
-            driver = webdriver.Chrome(options=chrome_options)
-        except Exception as e:
-            print("Using ChromeDriverManager as fallback...")
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
+        # Use the prebuilt chromedriver, then system Chrome, then fall back to ChromeDriverManager
+        with metrics.span("setup_driver", log=True):
+            if CHROMEDRIVER_PATH and os.path.exists(CHROMEDRIVER_PATH):
+                driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=chrome_options)
+            else:
+                try:
+                    driver = webdriver.Chrome(options=chrome_options)
+                except Exception as e:
+                    from webdriver_manager.chrome import ChromeDriverManager
+                    metrics.log("chromedriver_manager_fallback")
+                    service = Service(ChromeDriverManager().install())
+                    driver = webdriver.Chrome(service=service, options=chrome_options)
+            if lean:
+                block_resources(driver)
             
-        return driver
+        return metrics.instrument_driver(driver)
     except Exception as e:
-        print(f"Error setting up Chrome WebDriver: {str(e)}")
+        metrics.log("driver_setup_failed", level="error", error=e)
         raise
 
-def parse_facebook_time(time_str):
-    """Parse Facebook's relative time strings into datetime objects."""
-    if not time_str:
-        return None
-        
-    now = datetime.now()
-    time_str = time_str.lower()
+def configure_driver_pool(**options):
+    """Create the process-wide driver pool with explicit DriverPool options (size, profile_root, ...).
     
-    try:
-        # Handle various time formats
-        if 'hr' in time_str or 'hour' in time_str:
-            hours = int(re.search(r'\d+', time_str).group())
-            return now - timedelta(hours=hours)
-        elif 'min' in time_str:
-            minutes = int(re.search(r'\d+', time_str).group())
-            return now - timedelta(minutes=minutes)
-        elif 'yesterday' in time_str:
-            return now - timedelta(days=1)
-        elif 'day' in time_str:
-            days = int(re.search(r'\d+', time_str).group())
-            return now - timedelta(days=days)
-        elif 'week' in time_str:
-            weeks = int(re.search(r'\d+', time_str).group())
-            return now - timedelta(weeks=weeks)
-        elif 'month' in time_str:
-            months = int(re.search(r'\d+', time_str).group())
-            return now - relativedelta(months=months)
-        elif 'year' in time_str:
-            years = int(re.search(r'\d+', time_str).group())
-            return now - relativedelta(years=years)
-        else:
-            # Try to parse as absolute date
-            return parse_date(time_str, fuzzy=True)
-    except Exception as e:
-        print(f"Could not parse time: {time_str}, error: {str(e)}")
-        return None
+    Must run before the first browser check; the pool's defaults are read from
+    the environment when driver_pool is imported.
+    """
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is not None:
+            raise RuntimeError("The driver pool has already been created")
+        _driver_pool = DriverPool(setup_driver, **options)
+        atexit.register(_driver_pool.shutdown)
+    return _driver_pool
+
+def get_driver_pool():
+    """Return the process-wide driver pool, creating it on first use."""
+    global _driver_pool
+    if _driver_pool is None:
+        # Browser threads can arrive here together; only one may create the pool
+        with _driver_pool_lock:
+            if _driver_pool is None:
+                _driver_pool = DriverPool(setup_driver)
+                atexit.register(_driver_pool.shutdown)
+    return _driver_pool
+
+def shutdown_driver_pool():
+    """Quit the process-wide pool's Chromes now rather than at exit, if the pool was created."""
+    if _driver_pool is not None:
+        _driver_pool.shutdown()
 
-def get_latest_post(driver):
-    """Get the most recent post's text and timestamp."""
+@contextmanager
+def browser_session():
+    """Yield a WebDriver, from the warm pool when enabled."""
+    if USE_DRIVER_POOL:
+        with get_driver_pool().driver() as driver:
+            yield driver
+        return
+    driver = setup_driver()
     try:
-        # Wait for the first post to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='article']"))
+        yield driver
+    finally:
+        driver.quit()
+
+def _posts_from_html(html, limit=MAX_POSTS_TO_CHECK, page_url=FACEBOOK_URL):
+    """Pull post text and time text out of static page HTML."""
+    soup = make_soup(html, ARTICLES)
+    posts = []
+    # Top-level articles only; comments are articles nested inside their post
+    for article in soup.find_all("div", attrs={'role': "article"}, recursive=False, limit=limit):
+        time_link = article.select_one("a[href*='/posts/']")
+        message = article.select_one(POST_MESSAGE)
+        posts.append({
+            'text': article.get_text("\n", strip=True),
+            'message': message.get_text("\n", strip=True) if message else None,
+            'time': time_link.get_text(strip=True) if time_link else None,
+            'permalink': urljoin(page_url, time_link.get('href', '')).split('?')[0] if time_link else None,
+        })
+    return posts
+
+def extract_posts(driver, limit=MAX_POSTS_TO_CHECK, budget=None):
+    """Expand and read the first `limit` posts with a single WebDriver call."""
+    expand_timeout = budget.timeout_for(EXPAND_TIMEOUT) if budget else EXPAND_TIMEOUT
+    driver.set_script_timeout(expand_timeout + 10)
+    with metrics.span("expand_and_extract"):
+        posts = driver.execute_async_script(EXTRACT_POSTS_JS, limit, int(expand_timeout * 1000))
+    expanded = sum(1 for post in posts if post.get('expanded'))
+    metrics.log("posts_extracted", posts=len(posts), expanded=expanded)
+    return posts
+
+class PostStream:
+    """Yield posts newest-first while scrolling down the feed.
+    
+    Stops at the cutoff date, the first already-seen post, `max_posts`, the
+    end of the feed, or when the wait budget runs out. The first post is exempt
+    from the date and seen checks because it is often a pinned post.
+    """
+    
+    def __init__(self, driver, cutoff_date, store=None, max_posts=DEEP_SCROLL_MAX_POSTS,
+                 budget=None, prune=PRUNE_SEEN_POSTS, now=None):
+        self.driver = driver
+        self.cutoff_date = cutoff_date
+        self.now = now or datetime.now()
+        self.store = store
+        self.max_posts = max_posts
+        self.budget = budget
+        self.prune = prune
+        self.count = 0
+        self.batches = 0
+        self.pruned = 0
+        self.stop_reason = None
+        self.elapsed = 0.0
+        # Whether the last batch waited less than SCROLL_LOAD_TIMEOUT for new posts
+        self.load_cut_short = False
+    
+    def _next_batch(self):
+        expand_timeout = EXPAND_TIMEOUT
+        load_timeout = SCROLL_LOAD_TIMEOUT
+        if self.budget:
+            expand_timeout = self.budget.timeout_for(expand_timeout)
+            load_timeout = self.budget.timeout_for(load_timeout)
+        self.load_cut_short = load_timeout < SCROLL_LOAD_TIMEOUT
+        self.driver.set_script_timeout(expand_timeout + load_timeout + 10)
+        batch = self.driver.execute_async_script(
+            SCROLL_BATCH_JS, int(expand_timeout * 1000), int(load_timeout * 1000), self.prune
         )
-        
-        # Get the first post
-        first_post = driver.find_element(By.CSS_SELECTOR, "div[role='article']")
-        
-        # Get post text
-        post_text = first_post.text
-        
-        # Try to get the post time
-        post_time = "Time not available"
-        post_datetime = None
+        self.batches += 1
+        self.pruned += batch['pruned']
+        return batch
+    
+    def _should_stop(self, post):
+        if self.count == 0:
+            return None
+        if self.store and self.store.known([post_key(post)]):
+            return "reached a known post"
+        post_datetime = parse_facebook_time(post['time'], self.now)
+        if post_datetime and post_datetime < self.cutoff_date:
+            return "reached the cutoff date"
+        return None
+    
+    def __iter__(self):
+        start = time.perf_counter()
         try:
-            time_element = first_post.find_element(By.CSS_SELECTOR, "a[href*='/posts/']")
-            post_time = time_element.text
-            post_datetime = parse_facebook_time(post_time)
-        except Exception as e:
-            print(f"Error getting post time: {str(e)}")
-            
+            while True:
+                if self.budget and self.budget.remaining() <= 0:
+                    self.stop_reason = "wait budget exhausted"
+                    return
+                batch = self._next_batch()
+                if batch['end']:
+                    # No new posts within a clamped wait says nothing about the feed
+                    if self.load_cut_short:
+                        self.stop_reason = "wait budget exhausted"
+                    else:
+                        self.stop_reason = "reached the end of the feed"
+                    return
+                for post in batch['posts']:
+                    self.stop_reason = self._should_stop(post)
+                    if self.stop_reason:
+                        return
+                    self.count += 1
+                    yield post
+                    if self.count >= self.max_posts:
+                        self.stop_reason = "reached max posts"
+                        return
+        finally:
+            self.elapsed = time.perf_counter() - start
+    
+    def stats(self):
+        """Throughput numbers for the last iteration."""
         return {
-            'text': post_text[:500] + ('' if len(post_text) <= 500 else '...'),
-            'time': post_time,
-            'datetime': post_datetime,
-            'full_text': post_text
+            'posts': self.count,
+            'batches': self.batches,
+            'pruned': self.pruned,
+            'elapsed': round(self.elapsed, 3),
+            'posts_per_sec': round(self.count / self.elapsed, 2) if self.elapsed else 0.0,
+            'stop_reason': self.stop_reason,
         }
-    except Exception as e:
-        print(f"Error getting latest post: {str(e)}")
+
+def _summarize_posts(posts, page_url=FACEBOOK_URL, now=None):
+    """Classify extracted posts, returning (promotion_found, details, latest_post).
+    
+    `posts` can be any iterable, including a PostStream, so deep scrolls are
+    processed one post at a time instead of being held in memory.
+    """
+    store = get_post_store() if USE_POST_STORE else None
+    classifier = get_classifier()
+    # One reference time for every post in this scrape
+    now = now or datetime.now()
+    latest_post = None
+    promotion_details = []
+    processed = 0
+    already_seen = 0
+    classified = 0
+    with metrics.span("summarize_posts", log=True):
+        for i, post in enumerate(posts, 1):
+            processed = i
+            if latest_post is None:
+                latest_post = {
+                    'text': post['text'][:500] + ('' if len(post['text']) <= 500 else '...'),
+                    'time': post['time'] or "Time not available",
+                    'datetime': parse_facebook_time(post['time'], now),
+                    'full_text': post['text']
+                }
+            if not post['time']:
+                continue
+            key = post_key(post)
+            if store and store.settled([key]):
+                metrics.log("post_skipped", level="debug", index=i)
+                already_seen += 1
+                continue
+            with metrics.span("parse_time"):
+                post_datetime = parse_facebook_time(post['time'], now)
+            
+            # If we can't parse the date, assume it's recent
+            if not post_datetime:
+                metrics.log("post_time_unparsed", level="warning", index=i, time=post['time'])
+                post_datetime = now
+            
+            # Full post dumps are expensive on long posts, so only at LOG_LEVEL=debug
+            if metrics.debug_enabled():
+                metrics.log("post", level="debug", index=i, time=post['time'], text=post['text'])
+            
+            # Check for promotions (rules live in promo_rules.json)
+            with metrics.span("classify"):
+                classification = classifier.classify(post['text'])
+            classified += 1
+            match = classification.label if classification.is_promotion else None
+            if match:
+                promotion_details.append({
+                    'date': post['time'],
+                    'datetime': post_datetime,
+                    'text': post['text'][:200] + ('' if len(post['text']) <= 200 else '...'),
+                    'match': match,
+                    'score': classification.score,
+                    'permalink': post.get('permalink'),
+                    'key': key
+                })
+                metrics.log("promotion_found", match=match, score=round(classification.score, 2))
+            elif metrics.debug_enabled():
+                metrics.log("no_promotion", level="debug", index=i)
+            
+            if store:
+                store.record(post, post_datetime, match, page_url)
+        
+        if store:
+            promotion_details.extend(_unalerted_promotions(store, page_url, now, promotion_details))
+    
+    metrics.count("posts_processed_total", classified)
+    metrics.count("posts_skipped_total", already_seen)
+    metrics.count("promotions_found_total", len(promotion_details))
+    metrics.log("posts_checked", posts=processed, already_seen=already_seen,
+                promotions=len(promotion_details))
+    return bool(promotion_details), promotion_details, latest_post
+
+def _unalerted_promotions(store, page_url, now, offered):
+    """Stored promotions from the last DEEP_SCROLL_DAYS whose alert never went out."""
+    offered_keys = {promo['key'] for promo in offered}
+    retry = []
+    for row in store.unalerted(page_url, since=now - timedelta(days=DEEP_SCROLL_DAYS)):
+        if row['post_key'] in offered_keys:
+            continue
+        text = row['text'] or ''
+        retry.append({
+            'date': row['time_text'],
+            'datetime': datetime.fromisoformat(row['posted_at']) if row['posted_at'] else None,
+            'text': text[:200] + ('' if len(text) <= 200 else '...'),
+            'match': row['match'],
+            'score': None,
+            'permalink': row['permalink'],
+            'key': row['post_key'],
+        })
+    if retry:
+        metrics.log("promotions_reoffered", count=len(retry))
+    return retry
+
+def _post_body(post):
+    """The part of a post that only changes when it's edited: no timestamp, counters or comments."""
+    if post.get('message'):
+        return post['message']
+    # No message node found: drop the lines that change on every load
+    return "\n".join(line for line in post['text'].splitlines()
+                     if line.strip() != post.get('time') and not VOLATILE_LINE.match(line.strip()))
+
+def _summarize_if_changed(posts, page_url=FACEBOOK_URL, now=None, pages=None):
+    """Like _summarize_posts, but returns UNCHANGED if the top posts match the last check.
+    
+    The new fingerprint is only staged; notify_promotions() commits it once the email is out.
+    """
+    pages = pages or get_page_state()
+    if pages is None:
+        return _summarize_posts(posts, page_url, now)
+    digest = fingerprint(f"{post.get('permalink')}\n{_post_body(post)}" for post in posts)
+    if not pages.changed(page_url, digest):
+        metrics.log("posts_unchanged", url=page_url, posts=len(posts))
+        return UNCHANGED
+    result = _summarize_posts(posts, page_url, now)
+    pages.stage(page_url, digest)
+    return result
+
+def _scrape_static(html, page_url=FACEBOOK_URL):
+    """Scan posts in server-rendered HTML. Returns None if the HTML has no posts."""
+    posts = _posts_from_html(html, page_url=page_url)
+    if not posts:
         return None
+    return _summarize_if_changed(posts, page_url)
+
+def _scrape_with_browser(url):
+    """Fall back to a full Selenium scrape."""
+    with browser_session() as driver:
+        return _scrape_page(driver, url)
 
-def scrape_facebook():
-    """Scrape AllTrails Facebook page for discount promotions from the last 7 days."""
-    driver = None
+def _report_page_weight(driver):
+    """Log and count what the page load actually transferred."""
+    weight = page_weight(driver)
+    if not weight:
+        return
+    metrics.count("fetch_bytes_total", weight['bytes'], tier="browser")
+    metrics.count("browser_requests_total", weight['requests'])
+    metrics.log("page_weight", requests=weight['requests'], kb=round(weight['bytes'] / 1024),
+                dom_content_loaded_ms=weight['dom_content_loaded_ms'], load_ms=weight['load_ms'])
+
+def _scrape_page(driver, url=FACEBOOK_URL):
+    """Load the Facebook page in an existing driver and scan its recent posts."""
+    budget = WaitBudget()
     try:
-        print(f"[{datetime.now()}] Starting Facebook scrape...")
-        driver = setup_driver()
-        driver.get(FACEBOOK_URL)
-        
-        # Get the latest post first
-        latest_post = get_latest_post(driver)
+        with budget.step("page_load"):
+            load_page(driver, url, budget)
+        _report_page_weight(driver)
         
         # Wait for posts to load
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='article']"))
-        )
+        with budget.step("wait_for_posts"):
+            wait_for_selector(driver, "div[role='article']", budget=budget)
         
         # Calculate the cutoff date (7 days ago)
-        cutoff_date = datetime.now() - timedelta(days=7)
-        print(f"Looking for posts since: {cutoff_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        now = datetime.now()
+        cutoff_date = now - timedelta(days=DEEP_SCROLL_DAYS)
+        metrics.log("deep_scroll_cutoff", since=cutoff_date.strftime('%Y-%m-%d %H:%M:%S'))
         
-        # Look for discount patterns (e.g., 50%, 20% off, etc.)
-        discount_pattern = re.compile(r'\b\d+%\s*(?:off|discount)\b|\b\d+%\b', re.IGNORECASE)
-        promotion_found = False
-        promotion_details = []
-        processed_posts = 0
-        max_posts_to_check = 5  # Only check the first 5 most recent posts
-        
-        # Keep loading more posts until we find one older than 7 days or reach max posts
-        while processed_posts <= max_posts_to_check:
-            # Get all visible posts
-            posts = driver.find_elements(By.CSS_SELECTOR, "div[role='article']")
-            
-            # Process new posts
-            for i in range(processed_posts, len(posts)):
-                if processed_posts >= max_posts_to_check:
-                    break
-                    
-                try:
-                    post = posts[i]
-                    processed_posts += 1
-                    
-                    # Get post time
-                    try:
-                        time_elements = post.find_elements(By.CSS_SELECTOR, "a[href*='/posts/']")
-                        if not time_elements:
-                            continue
-                            
-                        post_time_text = time_elements[0].text
-                        post_datetime = parse_facebook_time(post_time_text)
-                        
-                        # If we can't parse the date, assume it's recent
-                        if not post_datetime:
-                            print(f"Could not parse time for post {processed_posts}, assuming recent")
-                            post_datetime = datetime.now()
-                            # We're only checking the first 5 most recent posts
-                            # regardless of date since Facebook shows most recent first
-                            pass
-                        
-                        # Print post text for debugging
-                        print(f"\n--- Post {processed_posts + 1} ---")
-                        print(f"Time: {post_time_text}")
-                        print("Content (before expansion):")
-                        print(post.text)
-                        
-                        # Expand "See more" links if present
-                        try:
-                            # Try multiple selectors for "See more" links
-                            see_more_selectors = [
-                                ".//span[contains(text(), 'See more')]",
-                                ".//div[contains(text(), 'See more')]",
-                                ".//a[contains(text(), 'See more')]",
-                                ".//span[contains(text(), '…')]",
-                                ".//div[@role='button' and contains(text(), 'See more')]",
-                                ".//span[@class and contains(text(), 'See more')]"
-                            ]
-                            
-                            for selector in see_more_selectors:
-                                try:
-                                    see_more_link = post.find_element(By.XPATH, selector)
-                                    driver.execute_script("arguments[0].click();", see_more_link)
-                                    time.sleep(1)  # Wait for content to expand
-                                    print("Content (after expansion):")
-                                    print(post.text)
-                                    break
-                                except:
-                                    continue
-                            else:
-                                print("No 'See more' link found or couldn't expand")
-                        except Exception as e:
-                            print(f"Error expanding 'See more': {str(e)}")
-                        print("-" * 40)
-                        
-                        # Check for promotions
-                        post_text = post.text.lower()
-                        if match := discount_pattern.search(post_text):
-                            promotion_found = True
-                            promotion_text = post.text[:200] + ('' if len(post.text) <= 200 else '...')
-                            promotion_details.append({
-                                'date': post_time_text,
-                                'datetime': post_datetime,
-                                'text': promotion_text,
-                                'match': match.group()
-                            })
-                            print(f"✅ Found promotion: {match.group()}")
-                        else:
-                            print("No promotion found in this post")
-                            
-                    except Exception as e:
-                        print(f"Error processing post {processed_posts}: {str(e)}")
-                        continue
-                        
-                except Exception as e:
-                    print(f"Error getting post {processed_posts}: {str(e)}")
-                    continue
-            
-            # Only process the initially loaded posts
-            if processed_posts >= max_posts_to_check or processed_posts >= len(posts):
-                break  # Stop if we've processed the maximum number of posts or all visible posts
-            
-        print(f"Checked {processed_posts} posts (max limit reached)")
-        return promotion_found, promotion_details, latest_post
+        if SCROLL_MODE == "deep":
+            store = get_post_store() if USE_POST_STORE else None
+            stream = PostStream(driver, cutoff_date, store=store, budget=budget, now=now)
+            with budget.step("deep_scroll"):
+                result = _summarize_posts(stream, url, now)
+            metrics.log("deep_scroll", **stream.stats())
+            return result
         
-    except Exception as e:
-        print(f"Error during scraping: {str(e)}")
-        return False, [], None
+        with budget.step("expand_and_extract"):
+            posts = extract_posts(driver, budget=budget)
     finally:
-        if driver:
-            driver.quit()
-
-def send_email(subject, body=None, is_html=False):
-    """Send an email notification."""
-    if not SMTP_USERNAME or not SMTP_PASSWORD:
-        print("Email credentials not found in environment variables.")
-        return False
+        budget.report()
     
+    if not posts:
+        return False, [], None
+    return _summarize_if_changed(posts, url, now)
+
+def scrape_facebook(url=FACEBOOK_URL):
+    """Scrape a Facebook page for discount promotions from the last 7 days.
+    
+    Returns (promotion_found, promotions, latest_post), or UNCHANGED when the
+    newest posts are the same as at the last check. Errors are raised (a
+    failed scrape is not the same as finding no promotions); CircuitOpen means
+    the check was skipped while the page is failing.
+    """
     try:
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USERNAME
-        msg['To'] = SMTP_USERNAME  # Send to the same email address
-        msg['Subject'] = subject
-        
-        if body:
-            if is_html:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-        
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-        
-        print(f"Email sent: {subject}")
-        return True
+        metrics.log("scrape_started", url=url)
+        with metrics.span("scrape_facebook", log=True):
+            result = get_fetch_engine().check(url, lambda html: _scrape_static(html, url), _scrape_with_browser)
+        metrics.log("facebook_checked", url=url, tier=result.tier, unchanged=not result.changed)
+        return result.value
     except Exception as e:
-        print(f"Failed to send email: {str(e)}")
-        return False
+        metrics.log("scrape_failed", level="error", url=url, error=e)
+        raise
+    finally:
+        if USE_DRIVER_POOL:
+            metrics.log("driver_pool", **get_driver_pool().stats())
+
+def send_email(subject, body=None, is_html=False, on_sent=None, text=None):
+    """Queue an email notification; delivery happens in the background."""
+    # Send to the same email address
+    with metrics.span("send_email"):
+        return get_notifier().enqueue(subject, body, is_html=is_html, to=SMTP_USERNAME, on_sent=on_sent, text=text)
 
-def check_for_promotions():
-    """Check for promotions and send email notifications."""
-    print(f"\n[{datetime.now()}] Checking for AllTrails promotions...")
+def check_for_promotions(url=FACEBOOK_URL):
+    """Check for promotions and send email notifications. Returns a summary dict."""
+    metrics.log("promotion_check_started", url=url)
     
     try:
-        promotion_found, promotions, latest_post = scrape_facebook()
-        
-        # Create base HTML content with latest post info
-        if latest_post:
-            latest_post_section = f"""
-            <div style="margin: 20px 0; padding: 15px; border: 1px solid #e0e0e0; border-radius: 8px; background-color: #f9f9f9;">
-                <h3>Latest Post from AllTrails</h3>
-                <p><strong>Posted:</strong> {latest_post['time']}</p>
-                <div style="white-space: pre-line; background-color: white; padding: 12px; border-radius: 6px; border: 1px solid #e0e0e0; margin: 10px 0;">
-                    {latest_post['text']}
-                </div>
-                <p><a href="{FACEBOOK_URL}" style="color: #1a73e8; text-decoration: none;">View on Facebook →</a></p>
-            </div>
-            """
-        else:
-            latest_post_section = "<p>Could not retrieve the latest post. Please check the Facebook page directly.</p>"
-        
-        if promotion_found:
-            # Create HTML email content
-            subject = f"🎉 AllTrails Promotion Found! - {datetime.now().strftime('%Y-%m-%d')}"
-            
-            # Build HTML content
-            html_content = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #1a73e8;">🎉 AllTrails Promotion Found!</h2>
-                    <p>We found the following promotions on the AllTrails Facebook page:</p>
-                    {latest_post_section}
-                    <h3>🎯 Promotions Found:</h3>
-            """
-            
-            for i, promo in enumerate(promotions, 1):
-                html_content += f"""
-                <div style="margin-bottom: 20px; padding: 15px; border: 1px solid #e0e0e0; border-radius: 8px; background-color: #fff8e1;">
-                    <h3 style="color: #e65100;">🎁 Promotion {i} - {promo['match'].upper()}</h3>
-                    <p><strong>Posted:</strong> {promo['date']}</p>
-                    <div style="white-space: pre-line; background-color: white; padding: 12px; border-radius: 6px; border: 1px solid #e0e0e0;">
-                        {promo['text']}
-                    </div>
-                    <p><a href="{FACEBOOK_URL}" style="color: #1a73e8; text-decoration: none; font-weight: bold;">View on Facebook →</a></p>
-                </div>
-                """
-            
-            html_content += """
-                    <div style="margin-top: 30px; padding: 15px; background-color: #f5f5f5; border-radius: 8px; text-align: center;">
-                        <p>Check the <a href="https://www.facebook.com/AllTrails" style="color: #1a73e8; text-decoration: none; font-weight: bold;">AllTrails Facebook page</a> for more details.</p>
-                        <p style="color: #666; font-size: 0.9em;">Happy trails! 🚶‍♂️🌲</p>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            send_email(subject, html_content, is_html=True)
-        else:
-            subject = f"AllTrails Update - No Promotions Found - {datetime.now().strftime('%Y-%m-%d')}"
-            
-            # Create HTML content for no promotions found
-            html_content = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #1a73e8;">🔍 AllTrails Update</h2>
-                    <p>No promotions were found on the AllTrails Facebook page today. Here's their latest post:</p>
-                    {latest_post_section}
-                    <div style="margin-top: 30px; padding: 15px; background-color: #f5f5f5; border-radius: 8px; text-align: center;">
-                        <p>Check the <a href="https://www.facebook.com/AllTrails" style="color: #1a73e8; text-decoration: none; font-weight: bold;">AllTrails Facebook page</a> for updates.</p>
-                        <p style="color: #666; font-size: 0.9em;">We'll keep checking for you! 🚶‍♂️🌲</p>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            send_email(subject, html_content, is_html=True)
-            print("No promotions found.")
-            
+        scraped = scrape_facebook(url)
+        if scraped is UNCHANGED:
+            metrics.log("promotion_check_unchanged", url=url)
+            return {'url': url, 'unchanged': True}
+        promotion_found, promotions, latest_post = scraped
+        notify_promotions(promotion_found, promotions, latest_post, url)
+        return {
+            'url': url,
+            'promotion_found': promotion_found,
+            'promotions': [
+                {'match': promo['match'], 'posted': promo['date'], 'permalink': promo.get('permalink')}
+                for promo in promotions
+            ],
+            'latest_post_time': latest_post['time'] if latest_post else None,
+        }
+    except CircuitOpen as e:
+        # Already reported when the outage started
+        metrics.log("circuit_open", source=url, error=e)
+        return {'url': url, 'error': str(e), 'circuit_open': True}
     except Exception as e:
         error_subject = "Error Checking AllTrails Promotions"
         error_body = f"An error occurred while checking for AllTrails promotions:\n\n{str(e)}"
         if 'latest_post' in locals() and latest_post:
             error_body += f"\n\nLatest post info that was retrieved before the error:\nTime: {latest_post.get('time', 'N/A')}\n\n{latest_post.get('text', 'No post text')}"
-        send_email(error_subject, error_body)
-        print(f"Error: {str(e)}")
+        # Scrape failures are emailed once per outage; failures after a scrape every time
+        if 'latest_post' in locals() or get_resilience().take_alert(url):
+            send_email(error_subject, error_body)
+        metrics.log("promotion_check_failed", level="error", url=url, error=e)
+        return {'url': url, 'error': str(e)}
+
+def notify_promotions(promotion_found, promotions, latest_post, url=FACEBOOK_URL):
+    """Email the results of a scrape.
+    
+    The page's new state is saved (and promotions marked alerted) once the
+    email is sent, so a failed send is retried at the next check.
+    """
+    latest = LatestPost(latest_post['time'], latest_post['text']) if latest_post else None
+    today = datetime.now()
+    
+    if promotion_found:
+        items = [
+            Promotion(promo['match'], promo['date'], promo['text'], promo.get('permalink'))
+            for promo in promotions
+        ]
+        email = render_promotions(items, latest, url, today)
+        keys = [promo['key'] for promo in promotions]
+        
+        def on_sent():
+            if USE_POST_STORE:
+                get_post_store().mark_alerted(keys)
+            commit_page(url)
+    else:
+        email = render_no_promotions(latest, url, today)
+        on_sent = lambda: commit_page(url)
+        metrics.log("no_promotions", url=url)
+    
+    if not send_email(email.subject, email.html, is_html=True, on_sent=on_sent, text=email.text):
+        # Email isn't configured; there's nothing to retry
+        commit_page(url)
 
 
 def main():
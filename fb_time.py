@@ -0,0 +1,140 @@
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from dateutil.relativedelta import relativedelta
+
+# How many distinct time strings to remember
+TIME_CACHE_SIZE = int(os.getenv("TIME_CACHE_SIZE", "4096"))
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+_UNITS = {
+    's': 'seconds', 'sec': 'seconds', 'second': 'seconds',
+    'm': 'minutes', 'min': 'minutes', 'minute': 'minutes',
+    'h': 'hours', 'hr': 'hours', 'hour': 'hours',
+    'd': 'days', 'day': 'days',
+    'w': 'weeks', 'wk': 'weeks', 'week': 'weeks',
+    'mo': 'months', 'month': 'months',
+    'y': 'years', 'yr': 'years', 'year': 'years',
+}
+
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_WEEKDAY = r"(?:mon|tue(?:s)?|wed(?:nes)?|thu(?:rs?)?|fri|sat(?:ur)?|sun)(?:day)?"
+
+# Every Facebook timestamp form, with an optional "at 4:15 PM" suffix, in one regex
+_TOKENIZER = re.compile(
+    r"^(?:"
+    r"(?P<now>just\s+now|now)"
+    r"|(?P<count>\d+|an?|one)\s*(?P<unit>months?|mos?|minutes?|mins?|m|seconds?|secs?|s|hours?|hrs?|h"
+    r"|days?|d|weeks?|wks?|w|years?|yrs?|y)(?:\s+ago)?"
+    r"|(?P<yesterday>yesterday)"
+    r"|(?P<today>today)"
+    rf"|(?P<weekday>{_WEEKDAY})"
+    rf"|(?P<month>{_MONTH})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<year>\d{{4}}))?"
+    rf"|(?P<day2>\d{{1,2}})\s+(?P<month2>{_MONTH})\.?(?:,?\s+(?P<year2>\d{{4}}))?"
+    r"|(?P<iso>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})"
+    r")"
+    r"(?:,?\s+(?:at\s+)?(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?(?:\s*(?P<ampm>[ap])\.?m\.?)?)?$"
+)
+_CLEANUP = re.compile(r"\s+")
+
+
+def _clock(match):
+    """Return (hour, minute) from the optional time suffix, or None."""
+    if match.group('hour') is None:
+        return None
+    hour = int(match.group('hour'))
+    if match.group('ampm'):
+        hour = hour % 12 + (12 if match.group('ampm') == 'p' else 0)
+    return hour, int(match.group('minute') or 0)
+
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def tokenize(time_str):
+    """Turn a raw time string into a reference-time-independent spec.
+
+    Specs are cached, so each distinct string is only matched once; turning
+    a spec into a datetime is cheap arithmetic against the scrape's `now`.
+    """
+    text = _CLEANUP.sub(' ', time_str).strip(' ·').lower()
+    match = _TOKENIZER.match(text)
+    if not match:
+        return None
+    clock = _clock(match)
+    if match.group('now'):
+        return ('delta', 'seconds', 0)
+    if match.group('count'):
+        count = match.group('count')
+        count = int(count) if count.isdigit() else 1
+        unit = match.group('unit').rstrip('s') or 's'
+        return ('delta', _UNITS[unit], count)
+    if match.group('yesterday'):
+        return ('days_ago', 1, clock)
+    if match.group('today'):
+        return ('days_ago', 0, clock)
+    if match.group('weekday'):
+        return ('weekday', _WEEKDAYS[match.group('weekday')[:3]], clock)
+    if match.group('month'):
+        year = match.group('year')
+        return ('date', int(year) if year else None, _MONTHS[match.group('month')[:3]],
+                int(match.group('day')), clock)
+    if match.group('month2'):
+        year = match.group('year2')
+        return ('date', int(year) if year else None, _MONTHS[match.group('month2')[:3]],
+                int(match.group('day2')), clock)
+    return ('date', int(match.group('iso')), int(match.group('iso_month')),
+            int(match.group('iso_day')), clock)
+
+
+def _at(day, clock):
+    if clock is None:
+        return day
+    return day.replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+
+
+def resolve(spec, now):
+    """Turn a spec from tokenize() into a datetime relative to `now`."""
+    kind = spec[0]
+    if kind == 'delta':
+        _, unit, count = spec
+        if unit in ('months', 'years'):
+            return now - relativedelta(**{unit: count})
+        return now - timedelta(**{unit: count})
+    if kind == 'days_ago':
+        return _at(now - timedelta(days=spec[1]), spec[2])
+    if kind == 'weekday':
+        # Most recent such weekday; Facebook uses these for the past week
+        days_back = (now.weekday() - spec[1]) % 7 or 7
+        return _at(now - timedelta(days=days_back), spec[2])
+    _, year, month, day, clock = spec
+    try:
+        result = _at(datetime(year or now.year, month, day), clock)
+    except ValueError:
+        return None
+    if year is None and result > now:
+        # "March 3" in January means last year's March
+        try:
+            result = result.replace(year=result.year - 1)
+        except ValueError:
+            # "February 29" early in a leap year; last year had no such day
+            return None
+    return result
+
+
+def parse_facebook_time(time_str, now=None):
+    """Parse Facebook's relative or absolute time strings into datetime objects.
+
+    Pass the same `now` for every post in a scrape so they share one reference
+    time. Returns None for strings that aren't timestamps.
+    """
+    if not time_str:
+        return None
+    spec = tokenize(time_str)
+    if spec is None:
+        return None
+    return resolve(spec, now or datetime.now())
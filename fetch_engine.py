@@ -0,0 +1,368 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from page_state import UNCHANGED, get_page_state
+from resilience import BLOCKED, NETWORK, TIMEOUT, classify_error, get_resilience
+
+# Static fetch configuration
+STATIC_TIMEOUT = float(os.getenv("STATIC_FETCH_TIMEOUT", "15"))
+STATIC_POOL_SIZE = int(os.getenv("STATIC_POOL_SIZE", "10"))
+USER_AGENT = (
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml',
+    'Accept-Encoding': 'gzip, deflate',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+TIER_STATIC = "static"
+TIER_BROWSER = "browser"
+
+
+class FetchResult:
+    """Outcome of one check, including which tier ended up serving it."""
+
+    def __init__(self, url, tier, value, elapsed, status=None, from_cache=False, nbytes=0):
+        self.url = url
+        self.tier = tier
+        self.value = value
+        self.elapsed = elapsed
+        self.status = status
+        self.from_cache = from_cache
+        self.nbytes = nbytes
+
+    @property
+    def changed(self):
+        return self.value is not UNCHANGED
+
+    def __repr__(self):
+        return f"FetchResult(url={self.url!r}, tier={self.tier!r}, elapsed={self.elapsed:.2f}s)"
+
+
+def _conditional_headers(cached, validators):
+    """If-None-Match/If-Modified-Since from the cached response, else from stored validators."""
+    etag, last_modified = cached[:2] if cached else (validators or (None, None))
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def not_modified(fetcher, url, status, validators):
+    """True if a 304 confirms the page is byte-identical to the last processed response."""
+    # The fetcher's own validators may be newer than the stored ones (a response
+    # whose parse failed), in which case the 304 says nothing about the stored state
+    return status == 304 and bool(validators) and fetcher.last_validators(url) in (validators, (None, None))
+
+
+class StaticFetcher:
+    """Pooled keep-alive HTTP client with conditional GET support."""
+
+    def __init__(self, timeout=STATIC_TIMEOUT, pool_size=STATIC_POOL_SIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        # url -> (etag, last_modified, body)
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, validators=None):
+        """Fetch a page, returning (html, status, from_cache, nbytes).
+
+        `validators` is an (etag, last_modified) pair saved by an earlier
+        process; a 304 answer to it has no body, so html comes back None.
+        """
+        with self._lock:
+            cached = self._validators.get(url)
+        headers = _conditional_headers(cached, validators)
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        # Bytes read off the socket; len(response.content) is the decompressed size
+        nbytes = response.raw.tell()
+        if response.status_code == 304 and (cached or validators):
+            return cached[2] if cached else None, 304, True, nbytes
+        response.raise_for_status()
+
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            # requests falls back to ISO-8859-1 for text/html, which garbles UTF-8 pages
+            response.encoding = 'utf-8'
+        html = response.text
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            if etag or last_modified:
+                self._validators[url] = (etag, last_modified, html)
+            else:
+                self._validators.pop(url, None)
+        return html, response.status_code, False, nbytes
+
+    def last_validators(self, url):
+        """(etag, last_modified) from the last full response for `url`."""
+        with self._lock:
+            cached = self._validators.get(url)
+        return cached[:2] if cached else (None, None)
+
+
+class AsyncStaticFetcher:
+    """asyncio counterpart of StaticFetcher, for checking many sources at once."""
+
+    def __init__(self, timeout=STATIC_TIMEOUT, pool_size=STATIC_POOL_SIZE):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        # url -> (etag, last_modified, body)
+        self._validators = {}
+
+    def _get_session(self):
+        # aiohttp is only needed by the monitor, so don't pay for it at import time
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=DEFAULT_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        return self._session
+
+    async def get(self, url, validators=None):
+        """Fetch a page, returning (html, status, from_cache, nbytes); see StaticFetcher.get."""
+        cached = self._validators.get(url)
+        headers = _conditional_headers(cached, validators)
+
+        async with self._get_session().get(url, headers=headers) as response:
+            body = await response.read()
+            # aiohttp decompresses as it reads, so take the size on the wire from the headers
+            nbytes = response.content_length if response.content_length is not None else len(body)
+            if response.status == 304 and (cached or validators):
+                return cached[2] if cached else None, 304, True, nbytes
+            response.raise_for_status()
+            # get_encoding() sniffs the whole body when there's no charset; assume UTF-8 instead
+            html = body.decode(response.charset or 'utf-8', errors='replace')
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+
+        if etag or last_modified:
+            self._validators[url] = (etag, last_modified, html)
+        else:
+            self._validators.pop(url, None)
+        return html, response.status, False, nbytes
+
+    def last_validators(self, url):
+        cached = self._validators.get(url)
+        return cached[:2] if cached else (None, None)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class FetchEngine:
+    """Try a cheap static fetch first and only fall back to a browser when needed.
+
+    `check()` takes a `parse_static(html)` callable that returns a parsed value,
+    or None when the static HTML doesn't contain what we need, and a
+    `browser_check(url)` callable that does the full Selenium work. Either may
+    return UNCHANGED when the page's region matches the last processed check.
+
+    With a page state store, validators from the last processed response are
+    kept across restarts; a 304 for them ends the check as UNCHANGED without
+    parsing anything. New validators are only staged: the caller commits them
+    (page_state.commit_page) with the fingerprint once it has handled the value.
+
+    Each check runs under its source's circuit breaker (see resilience.py):
+    while the breaker is open check() raises CircuitOpen at once, transient
+    static fetch errors are retried within the retry budget, and a static
+    fetch that got a 5xx, or could not connect or timed out fails the check
+    instead of starting Chrome. A blocked one (401/403/429) still falls back
+    to the browser, and only fails the check if the browser is blocked too.
+    """
+
+    def __init__(self, fetcher=None, pages=None, resilience=None):
+        self.fetcher = fetcher or StaticFetcher()
+        self.pages = pages if pages is not None else get_page_state()
+        self.resilience = resilience or get_resilience()
+        self.tier_counts = {TIER_STATIC: 0, TIER_BROWSER: 0}
+        self.unchanged = 0
+        self._lock = threading.Lock()
+
+    def _record(self, tier, value=None):
+        with self._lock:
+            self.tier_counts[tier] += 1
+            if value is UNCHANGED:
+                self.unchanged += 1
+        metrics.count("checks_total", tier=tier)
+        if value is UNCHANGED:
+            metrics.count("unchanged_total", tier=tier)
+
+    def check(self, url, parse_static, browser_check=None, source=None):
+        """Run one check; `source` names its breaker and retry budget (default: the URL)."""
+        name = source or url
+        with self.resilience.guard(name):
+            return self._check(url, parse_static, browser_check, name)
+
+    async def check_async(self, url, parse_static, browser_check=None, source=None, fetcher=None,
+                          http_slot=None, parse_executor=None, browser_executor=None):
+        """check() for the event loop, used by the monitor.
+
+        `fetcher` is an AsyncStaticFetcher and `http_slot` an optional async
+        context manager held around the static fetch (rate limits, semaphores).
+        Parsing and the browser check run on the given executors.
+        """
+        name = source or url
+        with self.resilience.guard(name):
+            return await self._check_async(url, parse_static, browser_check, name, fetcher, http_slot,
+                                           parse_executor, browser_executor)
+
+    def _check(self, url, parse_static, browser_check, name):
+        start = time.perf_counter()
+        status, from_cache, nbytes = None, False, 0
+        try:
+            with metrics.span("static_fetch"):
+                validators = self._validators(url)
+                html, status, from_cache, nbytes = self.resilience.call(
+                    name, "static_fetch", self.fetcher.get, url, validators)
+            metrics.count("fetch_bytes_total", nbytes, tier=TIER_STATIC)
+            if not_modified(self.fetcher, url, status, validators):
+                value = UNCHANGED
+            else:
+                with metrics.span("parse_static"):
+                    value = parse_static(html)
+            if value is not None:
+                return self._static_result(url, self.fetcher, value, start, status, from_cache, nbytes)
+            metrics.log("static_incomplete", url=url)
+        except requests.RequestException as e:
+            if self._static_failure_ends_check(url, e, browser_check):
+                raise
+
+        if browser_check is None:
+            return FetchResult(url, TIER_STATIC, None, time.perf_counter() - start,
+                               status=status, from_cache=from_cache, nbytes=nbytes)
+
+        metrics.log("browser_fallback", url=url)
+        # Browser checks are expensive, so only connection errors get one retry
+        value = self.resilience.call(name, TIER_BROWSER, browser_check, url, retries=1, retry_on=(NETWORK,))
+        return self._browser_result(url, value, start)
+
+    async def _check_async(self, url, parse_static, browser_check, name, fetcher, http_slot,
+                           parse_executor, browser_executor):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        status, from_cache, nbytes = None, False, 0
+        try:
+            validators = self._validators(url)
+            async with http_slot or contextlib.nullcontext():
+                html, status, from_cache, nbytes = await self.resilience.call_async(
+                    name, "static_fetch", fetcher.get, url, validators)
+            metrics.count("fetch_bytes_total", nbytes, tier=TIER_STATIC)
+            if not_modified(fetcher, url, status, validators):
+                value = UNCHANGED
+            else:
+                # Parsing is CPU work; keep it off the event loop
+                value = await loop.run_in_executor(parse_executor, parse_static, html)
+            if value is not None:
+                return self._static_result(url, fetcher, value, start, status, from_cache, nbytes)
+            metrics.log("static_incomplete", url=url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if self._static_failure_ends_check(url, e, browser_check):
+                raise
+
+        if browser_check is None:
+            return FetchResult(url, TIER_STATIC, None, time.perf_counter() - start,
+                               status=status, from_cache=from_cache, nbytes=nbytes)
+
+        metrics.log("browser_fallback", url=url)
+        # Copy the context so a half-open probe's smaller wait budget reaches the worker thread
+        check = functools.partial(self.resilience.call, name, TIER_BROWSER, browser_check, url,
+                                  retries=1, retry_on=(NETWORK,))
+        value = await loop.run_in_executor(browser_executor, contextvars.copy_context().run, check)
+        return self._browser_result(url, value, start)
+
+    def _validators(self, url):
+        return self.pages.validators(url) if self.pages else None
+
+    def _static_failure_ends_check(self, url, error, browser_check):
+        """True if a failed static fetch should fail the check instead of falling back to the browser."""
+        kind = classify_error(error)
+        if self.resilience.enabled and kind in (NETWORK, TIMEOUT):
+            # Down or too slow even after retries: Chrome would fail the same way, so don't start it
+            metrics.log("static_fetch_failed", level="warning", url=url, kind=kind, browser=False, error=error)
+            return True
+        if self.resilience.enabled and kind == BLOCKED and browser_check is None:
+            metrics.log("static_fetch_failed", level="warning", url=url, kind=kind, browser=False, error=error)
+            return True
+        # A blocked request often gets through in a real browser; the breaker
+        # only counts it if the browser is blocked too
+        metrics.log("static_fetch_failed", level="warning", url=url, kind=kind, browser=True, error=error)
+        return False
+
+    def _static_result(self, url, fetcher, value, start, status, from_cache, nbytes):
+        self._record(TIER_STATIC, value)
+        if self.pages and not from_cache:
+            self.pages.stage(url, validators=fetcher.last_validators(url))
+        if self.pages and value is UNCHANGED:
+            # Nothing to act on
+            self.pages.commit(url)
+        result = FetchResult(url, TIER_STATIC, value, time.perf_counter() - start,
+                             status=status, from_cache=from_cache, nbytes=nbytes)
+        metrics.log("served", url=url, tier=TIER_STATIC, elapsed_s=round(result.elapsed, 3),
+                    unchanged=not result.changed)
+        return result
+
+    def _browser_result(self, url, value, start):
+        self._record(TIER_BROWSER, value)
+        if self.pages and value is UNCHANGED:
+            self.pages.commit(url)
+        result = FetchResult(url, TIER_BROWSER, value, time.perf_counter() - start)
+        metrics.log("served", url=url, tier=TIER_BROWSER, elapsed_s=round(result.elapsed, 3),
+                    unchanged=not result.changed)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self.tier_counts, unchanged=self.unchanged)
+
+
+def browser_page_source(url, wait_selector=None, timeout=20):
+    """Load a URL in a pooled browser and return the rendered HTML."""
+    # Imported lazily so static-only callers never load Selenium
+    from waits import WaitBudget, load_page, wait_for_selector
+    import facebook_scraper
+
+    budget = WaitBudget()
+    with facebook_scraper.browser_session() as driver:
+        load_page(driver, url, budget)
+        if wait_selector:
+            wait_for_selector(driver, wait_selector, timeout, budget)
+        return driver.page_source
+
+
+_engine = None
+
+
+def get_fetch_engine():
+    """Return the process-wide fetch engine."""
+    global _engine
+    if _engine is None:
+        _engine = FetchEngine()
+    return _engine
@@ -0,0 +1,27 @@
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# BeautifulSoup backend for static HTML: lxml when installed (several times
+# faster than the pure-Python html.parser), overridable with HTML_PARSER
+try:
+    import lxml  # noqa: F401
+    _DEFAULT_PARSER = "lxml"
+except ImportError:
+    _DEFAULT_PARSER = "html.parser"
+HTML_PARSER = os.getenv("HTML_PARSER", _DEFAULT_PARSER)
+
+# Only the elements the checks read; everything else is skipped while parsing
+ARTICLES = SoupStrainer("div", attrs={'role': "article"})
+PRICE = SoupStrainer("div", attrs={'class': "price"})
+# A post's own text, without its header, reaction counts or comments
+POST_MESSAGE = "[data-ad-preview='message'], [data-ad-comet-preview='message']"
+
+
+def make_soup(html, only=None):
+    """Parse `html`, keeping just the elements matched by the `only` strainer.
+
+    Matched elements become top-level nodes of the returned soup, so
+    `soup.find_all(..., recursive=False)` skips matches nested inside others.
+    """
+    return BeautifulSoup(html, HTML_PARSER, parse_only=only)
@@ -0,0 +1,139 @@
+import os
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+
+# Job execution configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+MAX_BROWSER_JOBS = int(os.getenv("MAX_BROWSER_JOBS", "1"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """A background run of some check, tracked by ID."""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat(timespec='seconds') if value else None
+
+        return {
+            'id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'created_at': iso(self.created_at),
+            'started_at': iso(self.started_at),
+            'finished_at': iso(self.finished_at),
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobRunner:
+    """Run checks in the background with single-flight semantics.
+
+    Submitting a key that already has a queued or running job returns that
+    job instead of starting another, so overlapping triggers (e.g. Cloud
+    Scheduler retries) share one run. Browser jobs also share a global cap so
+    only `max_browser_jobs` Chromes are ever busy at once.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_browser_jobs=MAX_BROWSER_JOBS, history=JOB_HISTORY):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self.browser_slots = threading.BoundedSemaphore(max(1, max_browser_jobs))
+        self.history = history
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, browser=True, **kwargs):
+        """Start `fn` in the background. Returns (job, created)."""
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                metrics.log("job_deduplicated", job=existing.id, key=key, status=existing.status)
+                return existing, False
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._trim()
+        self.executor.submit(self._run, job, fn, args, kwargs, browser)
+        metrics.log("job_queued", job=job.id, key=key)
+        return job, True
+
+    def _run(self, job, fn, args, kwargs, browser):
+        if browser:
+            self.browser_slots.acquire()
+        try:
+            job.status = RUNNING
+            job.started_at = datetime.now()
+            job.result = fn(*args, **kwargs)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            metrics.log("job_failed", level="error", job=job.id, key=job.key, error=e)
+            traceback.print_exc()
+        finally:
+            if browser:
+                self.browser_slots.release()
+            job.finished_at = datetime.now()
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+            job.done.set()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Return the process-wide job runner."""
+    global _runner
+    if _runner is None:
+        # Concurrent first requests must share one runner, or dedup and the browser cap split in two
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner()
+    return _runner
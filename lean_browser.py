@@ -0,0 +1,94 @@
+import os
+
+import metrics
+
+# Lean browsing: skip everything the scraper never reads (set LEAN_BROWSER=0 to disable)
+LEAN_BROWSER = os.getenv("LEAN_BROWSER", "1") != "0"
+LEAN_WINDOW_SIZE = os.getenv("LEAN_WINDOW_SIZE", "1280,800")
+FULL_WINDOW_SIZE = "1920,1080"
+# "eager" returns from driver.get() at DOMContentLoaded instead of waiting for
+# every subresource; our waits then block on the posts themselves
+LEAN_PAGE_LOAD_STRATEGY = os.getenv("LEAN_PAGE_LOAD_STRATEGY", "eager")
+
+# URL patterns Chrome refuses to fetch (CDP Network.setBlockedURLs, '*' wildcards).
+# Media files, fonts, and ad/tracking endpoints. Images are also switched off
+# through content settings, which catches extension-less CDN URLs.
+DEFAULT_BLOCKED_URLS = (
+    "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*",
+    "*.mp4*", "*.m4a*", "*.m4v*", "*.webm*", "*.mp3*", "*.m3u8*", "*.mpd*",
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    "*video*.fbcdn.net*",
+    "*facebook.com/tr?*", "*facebook.com/tr/*", "*facebook.com/ajax/bz*", "*facebook.com/ajax/bnzai*",
+    "*connect.facebook.net*", "*doubleclick.net*", "*googletagmanager.com*",
+    "*google-analytics.com*", "*googlesyndication.com*", "*adservice.google.*",
+    "*scorecardresearch.com*", "*hotjar.com*", "*segment.io*", "*segment.com*",
+)
+_extra = [pattern.strip() for pattern in os.getenv("LEAN_BLOCK_URLS", "").split(",") if pattern.strip()]
+BLOCKED_URLS = DEFAULT_BLOCKED_URLS + tuple(_extra)
+
+LEAN_ARGUMENTS = (
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required",
+    "--mute-audio",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+)
+LEAN_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+    'profile.default_content_setting_values.media_stream': 2,
+}
+
+# Bytes and timings for the current page, from the Resource Timing API.
+# Blocked requests never start, so they don't show up here.
+PAGE_WEIGHT_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = nav ? nav.transferSize : 0;
+for (const r of resources) bytes += r.transferSize || 0;
+return {
+    requests: resources.length + (nav ? 1 : 0),
+    bytes: bytes,
+    dom_content_loaded_ms: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+    load_ms: nav && nav.loadEventEnd ? Math.round(nav.loadEventEnd) : null
+};
+"""
+
+
+def configure_options(chrome_options, lean=LEAN_BROWSER):
+    """Add the lean (or full) launch settings to a ChromeOptions object."""
+    if not lean:
+        chrome_options.add_argument(f"--window-size={FULL_WINDOW_SIZE}")
+        return chrome_options
+    chrome_options.add_argument(f"--window-size={LEAN_WINDOW_SIZE}")
+    for argument in LEAN_ARGUMENTS:
+        chrome_options.add_argument(argument)
+    chrome_options.add_experimental_option("prefs", LEAN_PREFS)
+    chrome_options.page_load_strategy = LEAN_PAGE_LOAD_STRATEGY
+    return chrome_options
+
+
+def block_resources(driver, patterns=BLOCKED_URLS):
+    """Tell Chrome to refuse requests matching `patterns` for this session."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {'urls': list(patterns)})
+        return True
+    except Exception as e:
+        # Non-Chromium drivers have no CDP; the launch flags still apply
+        metrics.log("request_blocking_failed", level="warning", error=e)
+        return False
+
+
+def page_weight(driver):
+    """Return {requests, bytes, dom_content_loaded_ms, load_ms} for the loaded page."""
+    try:
+        return driver.execute_script(PAGE_WEIGHT_JS)
+    except Exception as e:
+        metrics.log("page_weight_failed", level="warning", error=e)
+        return None
@@ -1,14 +1,151 @@
-from flask import Flask
+from flask import Flask, Response, jsonify, request
 import os
-import facebook_scraper  # rename this to your real script file
+import signal
+import socket
+import threading
+import time
+import metrics
+from jobs import get_job_runner
+
+# The scraper modules (Selenium, bs4, requests, aiohttp) are imported on first
+# use, so the server can answer health checks before they finish loading.
+# After the server is listening, PREWARM loads them in the background:
+# "imports" loads the modules, "browser" also starts a pooled Chrome, "0" does neither.
+PREWARM = os.getenv("PREWARM", "imports")
+# Cloud Run kills the container 10 s after SIGTERM; queued alerts get most of that
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "8"))
 
 app = Flask(__name__)
 
+def check_promotions_job():
+    import facebook_scraper  # rename this to your real script file
+    result = facebook_scraper.check_for_promotions()   # call your scraping function
+    if result.get('error'):
+        raise RuntimeError(result['error'])
+    return result
+
+def run_monitor_job():
+    from monitor import get_monitor
+    return get_monitor().run()
+
+def accepted(job, created):
+    # 202 with the job to poll; overlapping triggers get the in-flight job back
+    body = job.to_dict()
+    body['deduplicated'] = not created
+    response = jsonify(body)
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202
+
 @app.route("/")
 def run():
-    facebook_scraper.check_for_promotions()   # call your scraping function
-    return "OK", 200
+    return accepted(*get_job_runner().submit("check_for_promotions", check_promotions_job))
+
+@app.route("/monitor")
+def run_monitor():
+    # Check every configured source concurrently
+    return accepted(*get_job_runner().submit("monitor", run_monitor_job))
+
+@app.route("/healthz")
+def healthz():
+    # Answers as soon as Flask is up; doesn't touch the scraper
+    return jsonify({'status': "ok"}), 200
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route("/jobs")
+def list_jobs():
+    return jsonify([job.to_dict() for job in get_job_runner().list()]), 200
+
+@app.route("/pool")
+def pool_stats():
+    # Warm vs cold driver usage for this instance
+    import facebook_scraper
+    return jsonify(facebook_scraper.get_driver_pool().stats()), 200
+
+@app.route("/tiers")
+def tier_stats():
+    # How many checks were served by plain HTTP versus the browser
+    from fetch_engine import get_fetch_engine
+    return jsonify(get_fetch_engine().stats()), 200
+
+@app.route("/breakers")
+def breaker_stats():
+    # Circuit breaker state per source (open ones show when they'll be probed again)
+    from resilience import get_resilience
+    return jsonify(get_resilience().stats()), 200
+
+@app.route("/history")
+def history():
+    # Recently seen posts; pass ?promotions=1 for promotions only
+    from post_store import get_post_store
+    promotions_only = request.args.get("promotions") == "1"
+    limit = request.args.get("limit", 100, type=int)
+    return jsonify(get_post_store().history(promotions_only=promotions_only, limit=limit)), 200
+
+@app.route("/prices")
+def prices():
+    # Latest reading, trailing median and recent low for every tracked price
+    import webtracker
+    from price_history import get_price_history
+    history = get_price_history()
+    days = request.args.get("days", webtracker.LOW_WINDOW_DAYS, type=int)
+    result = []
+    for source, plan in history.sources():
+        latest = history.latest(source, plan)
+        result.append({
+            'source': source,
+            'plan': plan,
+            'latest': latest.price if latest else None,
+            'observed_at': latest.observed_at.isoformat(timespec='seconds') if latest else None,
+            'median': history.trailing_median(source, plan, webtracker.TREND_WINDOW_DAYS),
+            'min': history.min_price(source, plan, days),
+        })
+    return jsonify(result), 200
+
+@app.route("/metrics")
+def prometheus_metrics():
+    # Stage timings and counters in Prometheus text format
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def prewarm(port, mode=PREWARM, timeout=30):
+    """Once the server accepts connections, load the scraper (and maybe Chrome)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    try:
+        with metrics.span("prewarm", log=True, mode=mode):
+            import facebook_scraper
+            import monitor
+            if mode == "browser" and facebook_scraper.USE_DRIVER_POOL:
+                # Start one Chrome and leave it idle in the pool
+                with facebook_scraper.get_driver_pool().driver():
+                    pass
+    except Exception as e:
+        metrics.log("prewarm_failed", level="error", mode=mode, error=e)
+
+def handle_sigterm(signum, frame):
+    """Deliver queued alerts, then exit normally so atexit quits Chrome."""
+    from notifier import stop_notifier
+    metrics.log("shutting_down", signal=signum)
+    stop_notifier(SHUTDOWN_TIMEOUT)
+    raise SystemExit(0)
+
+def start_prewarm(port, mode=PREWARM):
+    if mode in ("imports", "browser"):
+        threading.Thread(target=prewarm, args=(port, mode), name="prewarm", daemon=True).start()
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 8080))
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    # Without a handler SIGTERM ends the process at once and atexit never runs
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    start_prewarm(port)
+    app.run(host="0.0.0.0", port=port)
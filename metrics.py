@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+# Instrumentation configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+
+PREFIX = "alltrails_"
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+_threshold = _LEVELS.get(LOG_LEVEL, 20)
+
+HELP = {
+    'stage_duration_seconds': "Time spent in each instrumented stage",
+    'stage_errors_total': "Instrumented stages that raised",
+    'webdriver_commands_total': "WebDriver commands sent, by command",
+    'posts_processed_total': "Posts classified",
+    'posts_skipped_total': "Posts skipped because they were already seen",
+    'promotions_found_total': "Posts classified as promotions",
+    'checks_total': "Checks served, by fetch tier",
+    'unchanged_total': "Checks skipped because the page region hadn't changed, by tier",
+    'fetch_bytes_total': "Response bytes fetched, by tier",
+    'browser_requests_total': "Requests Chrome made while loading pages",
+    'emails_total': "Notifier events (queued, sent, digests, retries, failed)",
+    'errors_total': "Failed fetch attempts, by error kind and operation",
+    'wasted_seconds_total': "Seconds spent on fetch attempts that failed, by operation",
+    'retries_total': "Fetch attempts retried, by operation",
+    'circuit_transitions_total': "Circuit breaker state changes, by source and new state",
+    'circuit_rejections_total': "Checks skipped because their source's circuit was open",
+    'scheduled_runs_total': "Checks run by the scheduler, by outcome (ok, error)",
+}
+
+
+class Registry:
+    """In-process counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # (name, labels) -> value
+        self._counters = {}
+        # (name, labels) -> [bucket counts..., sum, count]
+        self._histograms = {}
+
+    def inc(self, name, amount=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._histograms.get(key)
+            if row is None:
+                row = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        body = ",".join(
+            f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for k, v in pairs
+        )
+        return "{" + body + "}"
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(row)) for key, row in self._histograms.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+            lines.append(f"{PREFIX}{name}{self._labels(labels)} {value}")
+        for (name, labels), row in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+            cumulative = 0
+            for bound, hits in zip(self.buckets, row):
+                cumulative += hits
+                lines.append(f"{PREFIX}{name}_bucket{self._labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{self._labels(labels, ('le', '+Inf'))} {row[-1]}")
+            lines.append(f"{PREFIX}{name}_sum{self._labels(labels)} {row[-2]:.6f}")
+            lines.append(f"{PREFIX}{name}_count{self._labels(labels)} {row[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def debug_enabled():
+    return _threshold <= _LEVELS['debug']
+
+
+def log(event, level="info", **fields):
+    """Emit one log line, as JSON when LOG_FORMAT=json."""
+    if _LEVELS.get(level, 20) < _threshold:
+        return
+    if LOG_FORMAT == "json":
+        record = {'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                  'level': level, 'event': event}
+        record.update(fields)
+        print(json.dumps(record, default=str), flush=True)
+    else:
+        details = " ".join(f"{key}={value}" for key, value in fields.items())
+        print(f"[{level}] {event} {details}".rstrip())
+
+
+def count(name, amount=1, **labels):
+    """Increment a counter. A no-op when metrics are disabled."""
+    if METRICS_ENABLED:
+        registry.inc(name, amount, tuple(sorted(labels.items())))
+
+
+def observe(stage, seconds, **labels):
+    """Record a duration measured elsewhere under `stage`."""
+    if METRICS_ENABLED:
+        registry.observe('stage_duration_seconds', seconds, tuple(sorted(dict(labels, stage=stage).items())))
+
+
+class _Span:
+    __slots__ = ("stage", "key", "labels", "emit", "start")
+
+    def __init__(self, stage, key, labels, emit):
+        self.stage = stage
+        self.key = key
+        self.labels = labels
+        self.emit = emit
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        registry.observe('stage_duration_seconds', elapsed, self.key)
+        if exc_type is not None:
+            registry.inc('stage_errors_total', 1, self.key)
+        if self.emit or _threshold <= _LEVELS['debug']:
+            log("span", level="info" if self.emit else "debug", stage=self.stage,
+                duration_ms=round(elapsed * 1000, 3), ok=exc_type is None, **self.labels)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage, log=False, **labels):
+    """Time a block as `stage`. Pass log=True to also log it at info level.
+
+    With metrics disabled this returns a shared no-op context manager, so
+    instrumented hot loops cost one function call per span.
+    """
+    if not METRICS_ENABLED:
+        return _NULL_SPAN
+    if labels:
+        key = tuple(sorted(dict(labels, stage=stage).items()))
+    else:
+        key = (('stage', stage),)
+    return _Span(stage, key, labels, log)
+
+
+def instrument_driver(driver):
+    """Count every WebDriver command `driver` sends, by command name."""
+    if not METRICS_ENABLED:
+        return driver
+    execute = driver.execute
+
+    def counted(driver_command, params=None):
+        registry.inc('webdriver_commands_total', 1, (('command', driver_command),))
+        return execute(driver_command, params)
+
+    driver.execute = counted
+    return driver
+
+
+def render():
+    return registry.render()
@@ -0,0 +1,282 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import facebook_scraper
+import metrics
+import webtracker
+from fetch_engine import AsyncStaticFetcher, get_fetch_engine
+from price_history import DEFAULT_PLAN
+from resilience import OPEN, CircuitOpen
+
+# Monitor configuration
+SOURCES_FILE = os.getenv("SOURCES_FILE", "sources.json")
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "20"))
+BROWSER_WORKERS = int(os.getenv("BROWSER_WORKERS", os.getenv("DRIVER_POOL_SIZE", "1")))
+HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", "1.0"))  # seconds between hits to one host
+CHECK_INTERVAL = float(os.getenv("CHECK_INTERVAL", "86400"))  # default seconds between scheduled checks
+
+class Source:
+    """Something we watch. Subclasses say how to read it and what to do with the result."""
+
+    type = None
+    # Subclasses that need Chrome define browser_check(url), which runs on the
+    # browser worker pool. None means static only: a page parse_static can't
+    # read comes back with no value instead of starting a browser.
+    browser_check = None
+
+    def __init__(self, name, url, max_concurrency=1, min_interval=None, interval=None, **options):
+        self.name = name
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.min_interval = HOST_MIN_INTERVAL if min_interval is None else min_interval
+        # How often scheduler.py runs this source
+        self.interval = CHECK_INTERVAL if interval is None else float(interval)
+        self.options = options
+
+    def parse_static(self, html):
+        """Parse static HTML, returning None if the page needs a browser.
+        
+        Returning UNCHANGED (from either check) skips handle() for this run.
+        """
+        return None
+
+    def handle(self, value):
+        """Act on a successful check (send alerts). Runs on a worker thread."""
+
+    def handle_unchanged(self):
+        """Called instead of handle() when the check came back UNCHANGED."""
+
+    def handle_error(self, error):
+        """Act on a failed check. Runs on a worker thread."""
+        metrics.log("check_failed", level="error", source=self.name, error=error)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(name={self.name!r}, url={self.url!r})"
+
+
+class FacebookSource(Source):
+    """A Facebook page scanned for promotion posts."""
+
+    type = "facebook"
+
+    def parse_static(self, html):
+        return facebook_scraper._scrape_static(html, self.url)
+
+    def browser_check(self, url):
+        return facebook_scraper._scrape_with_browser(url)
+
+    def handle(self, value):
+        facebook_scraper.notify_promotions(*value, url=self.url)
+
+    def handle_error(self, error):
+        super().handle_error(error)
+        facebook_scraper.send_email(
+            f"Error Checking {self.name} for Promotions",
+            f"An error occurred while checking {self.url} for promotions:\n\n{error}",
+        )
+
+
+class PriceSource(Source):
+    """A membership/pricing page compared against a target price."""
+
+    type = "price"
+
+    def __init__(self, name, url, target_price=webtracker.TARGET_PRICE, plan=DEFAULT_PLAN, **kwargs):
+        super().__init__(name, url, **kwargs)
+        self.target_price = None if target_price is None else float(target_price)
+        self.plan = plan
+
+    def parse_static(self, html):
+        return webtracker.parse_price_if_changed(html, self.url)
+
+    def browser_check(self, url):
+        return webtracker.fetch_price_with_browser(url)
+
+    def handle(self, price):
+        if price is None:
+            return
+        metrics.log("price", source=self.name, price=price, target=self.target_price)
+        webtracker.handle_price(price, self.url, self.name, self.plan, self.target_price)
+
+    def handle_unchanged(self):
+        webtracker.track_unchanged(self.name, self.plan)
+
+
+SOURCE_TYPES = {}
+
+
+def register_source_type(cls):
+    """Make a Source subclass available to sources files under its `type` name."""
+    SOURCE_TYPES[cls.type] = cls
+    return cls
+
+
+register_source_type(FacebookSource)
+register_source_type(PriceSource)
+
+
+def default_sources():
+    """The original two targets, used when no sources file exists."""
+    return [
+        FacebookSource("alltrails-facebook", facebook_scraper.FACEBOOK_URL),
+        PriceSource(webtracker.PRICE_SOURCE, webtracker.ALLTRAILS_URL),
+    ]
+
+
+def load_sources(path=SOURCES_FILE):
+    """Build sources from a JSON list of {"name", "type", "url", ...options}."""
+    if not os.path.exists(path):
+        metrics.log("default_sources", path=path)
+        return default_sources()
+    with open(path) as f:
+        entries = json.load(f)
+    sources = []
+    for entry in entries:
+        entry = dict(entry)
+        kind = entry.pop("type")
+        if kind not in SOURCE_TYPES:
+            raise ValueError(f"Unknown source type '{kind}' for source {entry.get('name')}")
+        sources.append(SOURCE_TYPES[kind](**entry))
+    return sources
+
+
+class HostRateLimiter:
+    """Space out requests to the same host by at least `min_interval` seconds."""
+
+    def __init__(self):
+        self._next_slot = {}
+
+    async def wait(self, url, min_interval):
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Monitor:
+    """Check many sources concurrently.
+
+    Static fetches run on the event loop; browser checks go to a bounded
+    thread pool so only `browser_workers` Chromes are busy at once. Each
+    source's fetches run under its circuit breaker, and handle_error() only
+    fires once per outage.
+    """
+
+    def __init__(self, sources, http_concurrency=HTTP_CONCURRENCY, browser_workers=BROWSER_WORKERS):
+        self.sources = list(sources)
+        self.http_concurrency = http_concurrency
+        self.browser_pool = ThreadPoolExecutor(max_workers=max(1, browser_workers),
+                                               thread_name_prefix="browser")
+        self.handler_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="handler")
+        self.rate_limiter = HostRateLimiter()
+        # Kept across runs so conditional GET validators carry over
+        self.fetcher = AsyncStaticFetcher(pool_size=http_concurrency)
+        # The process-wide engine, so /tiers counts the monitor's checks too
+        self.engine = get_fetch_engine()
+        self.resilience = self.engine.resilience
+        self._source_limits = {}
+
+    def _source_limit(self, source):
+        if source.name not in self._source_limits:
+            self._source_limits[source.name] = asyncio.Semaphore(source.max_concurrency)
+        return self._source_limits[source.name]
+
+    @contextlib.asynccontextmanager
+    async def _http_slot(self, source, http_limit):
+        """Held around a source's static fetch: its host's rate limit, then a connection slot."""
+        await self.rate_limiter.wait(source.url, source.min_interval)
+        async with http_limit:
+            yield
+
+    async def check_source(self, source, http_limit):
+        """Run one source's check and return a result summary."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = {'source': source.name, 'type': source.type, 'url': source.url,
+                  'tier': None, 'error': None}
+        async with self._source_limit(source):
+            fetched = False
+            try:
+                fetch = await self.engine.check_async(
+                    source.url, source.parse_static, source.browser_check, source.name, fetcher=self.fetcher,
+                    http_slot=self._http_slot(source, http_limit), parse_executor=self.handler_pool,
+                    browser_executor=self.browser_pool)
+                fetched = True
+                result.update(tier=fetch.tier, from_cache=fetch.from_cache, unchanged=not fetch.changed)
+                if fetch.changed:
+                    await loop.run_in_executor(self.handler_pool, source.handle, fetch.value)
+                else:
+                    await loop.run_in_executor(self.handler_pool, source.handle_unchanged)
+            except CircuitOpen as e:
+                # Skipped, not failed again: no alert, and the scheduler waits out the cooldown
+                result['error'] = str(e)
+                result['circuit_open'] = True
+                metrics.log("circuit_open", source=source.name, error=e)
+            except Exception as e:
+                result['error'] = str(e)
+                # Fetch failures are reported once per outage; handler failures every time
+                if fetched or self.resilience.take_alert(source.name):
+                    await loop.run_in_executor(self.handler_pool, source.handle_error, e)
+                else:
+                    metrics.log("check_failed", level="error", source=source.name, error=e, reported=True)
+            if result['error'] and self.resilience.enabled:
+                breaker = self.resilience.breaker(source.name)
+                if breaker.state == OPEN:
+                    result['retry_at'] = breaker.retry_at
+        result['elapsed'] = round(time.perf_counter() - start, 3)
+        metrics.observe("check_source", result['elapsed'], source=source.name)
+        metrics.log("checked", source=source.name, tier=result['tier'], elapsed_s=result['elapsed'],
+                    unchanged=result.get('unchanged', False), error=result['error'])
+        return result
+
+    async def run_once(self):
+        """Check every source once, concurrently."""
+        metrics.log("run_started", sources=len(self.sources))
+        http_limit = asyncio.Semaphore(self.http_concurrency)
+        try:
+            return await asyncio.gather(
+                *(self.check_source(source, http_limit) for source in self.sources)
+            )
+        finally:
+            await self.release()
+
+    async def release(self):
+        """Drop what's tied to the current event loop (HTTP session, semaphores)."""
+        await self.fetcher.close()
+        self._source_limits.clear()
+
+    def run(self):
+        """Blocking wrapper around run_once()."""
+        return asyncio.run(self.run_once())
+
+    def shutdown(self):
+        self.browser_pool.shutdown(wait=True)
+        self.handler_pool.shutdown(wait=True)
+
+
+_monitor = None
+
+
+def get_monitor():
+    """Return the process-wide monitor, loading sources on first use."""
+    global _monitor
+    if _monitor is None:
+        _monitor = Monitor(load_sources())
+    return _monitor
+
+
+def main():
+    print("Starting multi-source check...")
+    results = get_monitor().run()
+    failed = [r for r in results if r['error']]
+    print(f"Checked {len(results)} sources ({len(failed)} failed).")
+
+if __name__ == "__main__":
+    main()
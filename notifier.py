@@ -0,0 +1,362 @@
+import atexit
+import os
+import queue
+import random
+import re
+import smtplib
+import threading
+import time
+from email.charset import QP, Charset
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html import escape
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# SMTP configuration (point SMTP_SERVER/SMTP_PORT at a local stand-in such as
+# `python -m aiosmtpd -n -l localhost:8025` with SMTP_STARTTLS=0 to test)
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SMTP_USERNAME = os.getenv("EMAIL_USERNAME") or os.getenv("EMAIL_SENDER")
+SMTP_PASSWORD = os.getenv("EMAIL_PASSWORD")
+EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER") or SMTP_USERNAME
+
+# Delivery behaviour
+NOTIFY_ASYNC = os.getenv("NOTIFY_ASYNC", "1") != "0"
+NOTIFY_BATCH_WINDOW = float(os.getenv("NOTIFY_BATCH_WINDOW", "2"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "4"))
+NOTIFY_BACKOFF = float(os.getenv("NOTIFY_BACKOFF", "2"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "120"))
+
+# utf-8 bodies as quoted-printable: mostly-ASCII mail grows a few percent instead of base64's third
+_UTF8_QP = Charset('utf-8')
+_UTF8_QP.body_encoding = QP
+
+# The <body> of a full HTML document, so digests can embed several alerts in one
+_BODY_CONTENT = re.compile(r"<body[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+
+# Errors that retrying won't fix
+PERMANENT_ERRORS = (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused,
+                    smtplib.SMTPSenderRefused)
+
+
+def text_part(body, subtype):
+    """A MIME text part in whichever of quoted-printable and base64 is smaller for `body`."""
+    data = body.encode()
+    non_ascii = len(data) - len(body.encode('ascii', 'ignore'))
+    if not non_ascii:
+        return MIMEText(body, subtype)
+    # Bytes quoted-printable spells as =XX
+    escaped = non_ascii + body.count('=')
+    return MIMEText(body, subtype, _UTF8_QP if escaped * 6 < len(data) else 'utf-8')
+
+
+class Notification:
+    """One queued email."""
+
+    def __init__(self, subject, body=None, is_html=False, to=None, digest=True, on_sent=None, text=None):
+        self.subject = subject
+        self.body = body or ""
+        self.is_html = is_html
+        self.text_body = text
+        self.to = to or EMAIL_RECEIVER
+        self.digest = digest
+        self.on_sent = on_sent
+
+    def html(self):
+        """The body as HTML to embed in a digest: a document's <body> contents, or escaped text."""
+        if self.is_html:
+            body = _BODY_CONTENT.search(self.body)
+            return body.group(1) if body else self.body
+        return f'<pre style="white-space: pre-wrap; font-family: inherit;">{escape(self.body)}</pre>'
+
+    def text(self):
+        """Plain-text version of the body, or None for HTML-only mail."""
+        if not self.is_html:
+            return self.body
+        return self.text_body
+
+    def parts(self):
+        """MIME parts for this message, plain text first as multipart/alternative expects."""
+        parts = []
+        text = self.text()
+        if text:
+            parts.append(text_part(text, 'plain'))
+        if self.is_html and self.body:
+            parts.append(text_part(self.body, 'html'))
+        return parts
+
+
+class SMTPConnectionPool:
+    """Reuse a logged-in SMTP connection instead of reconnecting for every message.
+
+    The notifier sends from one thread, so one idle connection is kept; with
+    NOTIFY_ASYNC=0 concurrent senders open their own and close the extras.
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=SMTP_USERNAME,
+                 password=SMTP_PASSWORD, starttls=SMTP_STARTTLS, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self._idle = queue.LifoQueue(maxsize=1)
+        self.connects = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            server.starttls()
+        # starttls() forgets the server's extensions, so don't gate on has_extn('auth');
+        # login() sends its own EHLO and fails loudly if AUTH isn't offered
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connects += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def acquire(self):
+        """Return a live connection, reusing an idle one when it still answers NOOP."""
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used > self.idle_timeout:
+                self._close(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except Exception:
+                pass
+            self._close(server)
+
+    def release(self, server, broken=False):
+        if broken:
+            self._close(server)
+            return
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self._close(server)
+
+    def close_all(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+class Notifier:
+    """Queue emails and deliver them on a background thread.
+
+    Callers return as soon as a message is queued. Messages that arrive within
+    `batch_window` seconds of each other, for the same recipient, are merged into
+    one digest. Failed sends are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, pool=None, sender=SMTP_USERNAME, batch_window=NOTIFY_BATCH_WINDOW,
+                 max_retries=NOTIFY_MAX_RETRIES, backoff=NOTIFY_BACKOFF, run_async=NOTIFY_ASYNC):
+        self.pool = pool or SMTPConnectionPool()
+        self.sender = sender
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.run_async = run_async
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'sent': 0, 'digests': 0, 'retries': 0, 'failed': 0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+        metrics.count("emails_total", amount, event=key)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, subject, body=None, is_html=False, to=None, digest=True, on_sent=None, text=None):
+        """Queue an email. Returns False only if email isn't configured.
+
+        `text` is an optional plain-text alternative for an HTML body.
+        """
+        if not self.sender or not self.pool.username or not self.pool.password:
+            metrics.log("email_not_configured", level="warning")
+            return False
+        notification = Notification(subject, body, is_html, to, digest, on_sent, text)
+        self._count('queued')
+        if not self.run_async:
+            return self._deliver([notification])
+        self._ensure_worker()
+        self._queue.put(notification)
+        metrics.log("email_queued", subject=subject)
+        return True
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.batch_window
+            stop = False
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            try:
+                for group in self._group(batch):
+                    self._deliver(group)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    @staticmethod
+    def _group(batch):
+        """Split a batch into per-recipient digests; non-digest mail goes alone."""
+        groups = {}
+        singles = []
+        for notification in batch:
+            if notification.digest:
+                groups.setdefault(notification.to, []).append(notification)
+            else:
+                singles.append([notification])
+        return list(groups.values()) + singles
+
+    def _build_message(self, notifications):
+        if len(notifications) == 1:
+            only = notifications[0]
+            parts = only.parts()
+            msg = MIMEMultipart('alternative' if len(parts) > 1 else 'mixed')
+            msg['Subject'] = only.subject
+            for part in parts:
+                msg.attach(part)
+        else:
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = f"{len(notifications)} alerts: {notifications[0].subject}"
+            texts = [n.text() for n in notifications]
+            if all(texts):
+                digest_text = "\n\n".join(f"{n.subject}\n\n{text}" for n, text in zip(notifications, texts))
+                msg.attach(text_part(digest_text, 'plain'))
+            sections = "".join(
+                f'<section style="margin-bottom: 30px;"><h2>{escape(n.subject)}</h2>{n.html()}</section><hr>'
+                for n in notifications
+            )
+            msg.attach(text_part(f'<html><head><meta charset="utf-8"></head><body>{sections}</body></html>', 'html'))
+        msg['From'] = self.sender
+        msg['To'] = notifications[0].to
+        return msg
+
+    def _deliver(self, notifications):
+        """Send one (possibly digested) message, retrying transient failures."""
+        msg = self._build_message(notifications)
+        for attempt in range(self.max_retries + 1):
+            server = None
+            try:
+                with metrics.span("smtp_send"):
+                    server = self.pool.acquire()
+                    server.send_message(msg)
+                self.pool.release(server)
+                break
+            except PERMANENT_ERRORS as e:
+                if server:
+                    self.pool.release(server, broken=True)
+                metrics.log("email_failed", level="error", subject=msg['Subject'], error=e)
+                self._count('failed')
+                return False
+            except (smtplib.SMTPException, OSError) as e:
+                if server:
+                    self.pool.release(server, broken=True)
+                if attempt == self.max_retries:
+                    metrics.log("email_failed", level="error", subject=msg['Subject'], attempts=attempt + 1, error=e)
+                    self._count('failed')
+                    return False
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                metrics.log("email_retry", level="warning", subject=msg['Subject'], error=e, delay_s=round(delay, 1))
+                self._count('retries')
+                time.sleep(delay)
+
+        self._count('sent')
+        if len(notifications) > 1:
+            self._count('digests')
+        metrics.log("email_sent", subject=msg['Subject'], digest=len(notifications))
+        for notification in notifications:
+            if notification.on_sent:
+                try:
+                    notification.on_sent()
+                except Exception as e:
+                    metrics.log("email_callback_failed", level="error", error=e)
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been handled."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+
+        def wait():
+            self._queue.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return done.wait(timeout)
+
+    def stop(self, timeout=30):
+        """Deliver what's queued, then stop the worker and close connections."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self.pool.close_all()
+
+
+_notifier = None
+
+
+def get_notifier():
+    """Return the process-wide notifier."""
+    global _notifier
+    if _notifier is None:
+        _notifier = Notifier()
+        atexit.register(_notifier.stop)
+    return _notifier
+
+
+def stop_notifier(timeout=30):
+    """Deliver what the process-wide notifier has queued and stop it, if it was started."""
+    if _notifier is not None:
+        _notifier.stop(timeout)
@@ -0,0 +1,107 @@
+# JavaScript run inside the Facebook page via execute_async_script.
+# Each script does a whole batch of DOM work per WebDriver round-trip.
+
+# Shared helpers: find top-level posts, expand "See more" links concurrently
+# (each expansion resolves as soon as the post text grows, via MutationObserver,
+# or when the shared timeout passes) and serialize posts to plain objects.
+POST_HELPERS_JS = """
+const ARTICLE = "div[role='article']";
+const topLevelArticles = () => Array.from(document.querySelectorAll(ARTICLE))
+    .filter(a => !a.parentElement.closest(ARTICLE));
+const ownText = el => Array.from(el.childNodes)
+    .filter(n => n.nodeType === Node.TEXT_NODE)
+    .map(n => n.nodeValue).join('');
+const findSeeMore = article => {
+    for (const el of article.querySelectorAll('span, div, a')) {
+        const text = ownText(el);
+        if (text.includes('See more') || (el.tagName === 'SPAN' && text.includes('\\u2026'))) {
+            return el;
+        }
+    }
+    return null;
+};
+const waitForGrowth = (article, before, timeoutMs) => new Promise(resolve => {
+    if (article.innerText.length > before) { resolve(true); return; }
+    let timer = null;
+    const observer = new MutationObserver(() => {
+        if (article.innerText.length > before) {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(true);
+        }
+    });
+    observer.observe(article, {childList: true, subtree: true, characterData: true});
+    timer = setTimeout(() => { observer.disconnect(); resolve(false); }, timeoutMs);
+});
+const expandAll = (articles, timeoutMs) => Promise.all(articles.map(article => {
+    const link = findSeeMore(article);
+    if (!link) return Promise.resolve(false);
+    const before = article.innerText.length;
+    try { link.click(); } catch (e) { return Promise.resolve(false); }
+    return waitForGrowth(article, before, timeoutMs);
+}));
+const serialize = (article, expanded) => {
+    const timeLink = article.querySelector("a[href*='/posts/']");
+    const message = article.querySelector("[data-ad-preview='message'], [data-ad-comet-preview='message']");
+    return {
+        text: article.innerText,
+        message: message ? message.innerText : null,
+        time: timeLink ? timeLink.innerText : null,
+        permalink: timeLink ? timeLink.href.split('?')[0] : null,
+        expanded: expanded
+    };
+};
+"""
+
+# Expand and read the first N posts.
+# Returns [{text, message, time, permalink, expanded}].
+EXTRACT_POSTS_JS = POST_HELPERS_JS + """
+const [limit, expandTimeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const articles = topLevelArticles().slice(0, limit);
+expandAll(articles, expandTimeoutMs)
+    .then(expanded => done(articles.map((article, i) => serialize(article, expanded[i]))));
+"""
+
+# Read the next batch of unseen posts while scrolling down the feed.
+# Posts already handed back are tagged data-at-seen; with pruning on, their
+# contents are dropped (keeping their height so the scroll position holds),
+# which keeps Chrome's memory flat however far we scroll.
+# Returns {posts: [...], pruned: n, end: bool}.
+SCROLL_BATCH_JS = POST_HELPERS_JS + """
+const [expandTimeoutMs, loadTimeoutMs, prune] = arguments;
+const done = arguments[arguments.length - 1];
+const unseen = () => topLevelArticles().filter(a => !a.hasAttribute('data-at-seen'));
+const waitForUnseen = () => new Promise(resolve => {
+    if (unseen().length) { resolve(); return; }
+    let timer = null;
+    const observer = new MutationObserver(() => {
+        if (unseen().length) {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve();
+        }
+    });
+    observer.observe(document.body, {childList: true, subtree: true});
+    timer = setTimeout(() => { observer.disconnect(); resolve(); }, loadTimeoutMs);
+    window.scrollTo(0, document.body.scrollHeight);
+});
+waitForUnseen().then(() => {
+    const articles = unseen();
+    return expandAll(articles, expandTimeoutMs).then(expanded => {
+        const posts = articles.map((article, i) => serialize(article, expanded[i]));
+        let pruned = 0;
+        for (const article of articles) {
+            article.setAttribute('data-at-seen', '1');
+            if (prune) {
+                article.style.minHeight = article.offsetHeight + 'px';
+                article.replaceChildren();
+                pruned++;
+            }
+        }
+        // Start loading the next page of posts while Python processes this one
+        window.scrollTo(0, document.body.scrollHeight);
+        done({posts: posts, pruned: pruned, end: articles.length === 0});
+    });
+});
+"""
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from post_store import content_hash
+
+# SQLite file holding what each watched page looked like at the last check
+PAGE_STATE_PATH = os.getenv("PAGE_STATE_PATH", "alltrails_pages.db")
+# Skip parsing, classification and alerts when a page's relevant region hasn't
+# changed since the last check (set CHANGE_DETECTION=0 to always re-process)
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    fingerprint TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    changed_at TEXT
+);
+"""
+
+
+class _Unchanged:
+    def __repr__(self):
+        return "UNCHANGED"
+
+
+# Returned by checks whose page region matches the last run; nothing downstream runs
+UNCHANGED = _Unchanged()
+
+
+def fingerprint(parts):
+    """Hash the normalized text of a page region (the price block, the top posts)."""
+    return content_hash("\0".join(part or "" for part in parts))
+
+
+class PageStateStore:
+    """Per-URL fingerprint and HTTP validators from the last processed check.
+
+    A check stages what it saw with stage(); nothing is written until commit(),
+    which callers run once the result has been acted on (the alert is out).
+    A check whose alert fails is then processed again next time.
+    """
+
+    def __init__(self, path=PAGE_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        # url -> {'fingerprint': digest, 'validators': (etag, last_modified)} awaiting commit()
+        self._pending = {}
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def changed(self, url, digest):
+        """True unless `digest` matches the fingerprint recorded for `url`."""
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM pages WHERE url = ?", (url,)).fetchone()
+        return row is None or row['fingerprint'] != digest
+
+    def record(self, url, digest):
+        """Remember `digest` once the page's new content has been processed."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO pages (url, fingerprint, changed_at) VALUES (?, ?, ?)
+                   ON CONFLICT (url) DO UPDATE SET fingerprint = excluded.fingerprint,
+                                                   changed_at = excluded.changed_at""",
+                (url, digest, datetime.now().isoformat(timespec='seconds')),
+            )
+
+    def validators(self, url):
+        """(etag, last_modified) for a conditional GET, or None if the page was never processed."""
+        state = self.get(url)
+        if not state or not state['fingerprint'] or not (state['etag'] or state['last_modified']):
+            return None
+        return state['etag'], state['last_modified']
+
+    def save_validators(self, url, etag, last_modified):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO pages (url, etag, last_modified) VALUES (?, ?, ?)
+                   ON CONFLICT (url) DO UPDATE SET etag = excluded.etag,
+                                                   last_modified = excluded.last_modified""",
+                (url, etag, last_modified),
+            )
+
+    def stage(self, url, digest=None, validators=None):
+        """Hold a new fingerprint and/or (etag, last_modified) for `url` until commit()."""
+        with self._lock:
+            pending = self._pending.setdefault(url, {})
+            if digest is not None:
+                pending['fingerprint'] = digest
+            if validators is not None:
+                pending['validators'] = validators
+
+    def commit(self, url):
+        """Save what was staged for `url`."""
+        with self._lock:
+            pending = self._pending.pop(url, None)
+        if not pending:
+            return
+        if 'fingerprint' in pending:
+            self.record(url, pending['fingerprint'])
+        if 'validators' in pending:
+            self.save_validators(url, *pending['validators'])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_state = None
+
+
+def get_page_state():
+    """Return the process-wide page state store, or None when change detection is off."""
+    global _state
+    if not CHANGE_DETECTION:
+        return None
+    if _state is None:
+        _state = PageStateStore()
+    return _state
+
+
+def commit_page(url):
+    """Save the state staged for `url` by its last check, once the result has been handled."""
+    pages = get_page_state()
+    if pages is not None:
+        pages.commit(url)
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# SQLite file holding every post we've already processed
+POST_STORE_PATH = os.getenv("POST_STORE_PATH", "alltrails_posts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_key TEXT PRIMARY KEY,
+    permalink TEXT,
+    content_hash TEXT NOT NULL,
+    page_url TEXT,
+    first_seen TEXT NOT NULL,
+    posted_at TEXT,
+    time_text TEXT,
+    is_promotion INTEGER NOT NULL DEFAULT 0,
+    match TEXT,
+    text TEXT,
+    alerted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_posts_first_seen ON posts (first_seen);
+CREATE INDEX IF NOT EXISTS idx_posts_promotion ON posts (is_promotion, posted_at);
+CREATE INDEX IF NOT EXISTS idx_posts_content_hash ON posts (content_hash);
+"""
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def content_hash(text):
+    """Hash post text after normalizing case, whitespace and the 'See more' link."""
+    normalized = _WHITESPACE.sub(' ', (text or '').lower().replace('see more', '')).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def post_key(post):
+    """Stable identity for a post: its permalink when we have one, else its content hash."""
+    if post.get('permalink'):
+        return post['permalink']
+    return f"sha1:{content_hash(post.get('text'))}"
+
+
+class PostStore:
+    """On-disk record of seen posts and how they were classified."""
+
+    def __init__(self, path=POST_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def known(self, keys):
+        """Return the subset of `keys` already in the store."""
+        keys = list(keys)
+        if not keys:
+            return set()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT post_key FROM posts WHERE post_key IN ({placeholders})", keys
+            ).fetchall()
+        return {row['post_key'] for row in rows}
+
+    def settled(self, keys):
+        """Return the subset of `keys` needing no more work: non-promotions and alerted promotions.
+
+        A promotion whose email never went out stays unsettled, so it's offered again.
+        """
+        keys = list(keys)
+        if not keys:
+            return set()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT post_key FROM posts WHERE post_key IN ({placeholders}) "
+                "AND (is_promotion = 0 OR alerted = 1)", keys
+            ).fetchall()
+        return {row['post_key'] for row in rows}
+
+    def unalerted(self, page_url, since=None):
+        """Stored promotions from `page_url` (posted after `since`) that were never alerted."""
+        query = "SELECT * FROM posts WHERE is_promotion = 1 AND alerted = 0 AND page_url = ?"
+        params = [page_url]
+        if since:
+            query += " AND posted_at >= ?"
+            params.append(since.isoformat(timespec='seconds'))
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY posted_at DESC", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM posts WHERE post_key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, post, posted_at=None, match=None, page_url=None):
+        """Store a newly seen post. Existing entries keep their first-seen time."""
+        key = post_key(post)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR IGNORE INTO posts
+                   (post_key, permalink, content_hash, page_url, first_seen, posted_at,
+                    time_text, is_promotion, match, text)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    key,
+                    post.get('permalink'),
+                    content_hash(post.get('text')),
+                    page_url,
+                    datetime.now().isoformat(timespec='seconds'),
+                    posted_at.isoformat(timespec='seconds') if posted_at else None,
+                    post.get('time'),
+                    1 if match else 0,
+                    match,
+                    post.get('text'),
+                ),
+            )
+        return key
+
+    def mark_alerted(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE posts SET alerted = 1 WHERE post_key = ?",
+                                   [(key,) for key in keys])
+
+    def history(self, since=None, promotions_only=False, limit=100):
+        """Most recently seen posts, newest first."""
+        query = "SELECT * FROM posts WHERE 1 = 1"
+        params = []
+        if since:
+            query += " AND first_seen >= ?"
+            params.append(since.isoformat(timespec='seconds'))
+        if promotions_only:
+            query += " AND is_promotion = 1"
+        query += " ORDER BY first_seen DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+
+
+def get_post_store():
+    """Return the process-wide post store."""
+    global _store
+    if _store is None:
+        _store = PostStore()
+    return _store
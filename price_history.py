@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# SQLite file holding every observed price, per source and plan
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", "alltrails_prices.db")
+DEFAULT_PLAN = "default"
+
+# One row per reading, clustered by (series, time) so range scans read
+# contiguous pages; the second index answers "first/min below X" without
+# touching the table. Times are Unix seconds to keep rows small.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    UNIQUE (source, plan)
+);
+CREATE TABLE IF NOT EXISTS readings (
+    series_id INTEGER NOT NULL REFERENCES series (id),
+    observed_at INTEGER NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (series_id, observed_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_readings_price ON readings (series_id, price, observed_at);
+"""
+
+Reading = namedtuple("Reading", "observed_at price")
+Summary = namedtuple("Summary", "count min max avg first_at last_at")
+
+
+def _ts(when):
+    return int(when.timestamp()) if isinstance(when, datetime) else int(when)
+
+
+def _window(days, now=None):
+    """(since, until) Unix seconds covering the last `days` days up to `now`."""
+    until = now or datetime.now()
+    return _ts(until - timedelta(days=days)), _ts(until)
+
+
+class PriceHistory:
+    """Append-only store of price readings with range and aggregate queries."""
+
+    def __init__(self, path=PRICE_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        # (source, plan) -> series id
+        self._series = {}
+
+    def _series_id(self, source, plan, create=False):
+        key = (source, plan)
+        if key not in self._series:
+            row = self._conn.execute("SELECT id FROM series WHERE source = ? AND plan = ?", key).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                with self._conn:
+                    row = (self._conn.execute("INSERT INTO series (source, plan) VALUES (?, ?)", key).lastrowid,)
+            self._series[key] = row[0]
+        return self._series[key]
+
+    def record(self, source, price, plan=DEFAULT_PLAN, observed_at=None):
+        """Append one reading (a repeat in the same second replaces the earlier one)."""
+        self.record_many([(source, plan, observed_at or datetime.now(), price)])
+
+    def record_many(self, readings):
+        """Append (source, plan, observed_at, price) tuples in one transaction."""
+        with self._lock:
+            rows = [(self._series_id(source, plan, create=True), _ts(observed_at), float(price))
+                    for source, plan, observed_at, price in readings]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO readings (series_id, observed_at, price) VALUES (?, ?, ?)", rows
+                )
+        return len(rows)
+
+    def _query(self, sql, source, plan, params=()):
+        with self._lock:
+            series_id = self._series_id(source, plan)
+            if series_id is None:
+                return []
+            return self._conn.execute(sql, (series_id, *params)).fetchall()
+
+    def latest(self, source, plan=DEFAULT_PLAN):
+        """The most recent Reading, or None."""
+        rows = self._query("SELECT observed_at, price FROM readings WHERE series_id = ? "
+                           "ORDER BY observed_at DESC LIMIT 1", source, plan)
+        return Reading(datetime.fromtimestamp(rows[0][0]), rows[0][1]) if rows else None
+
+    def readings(self, source, plan=DEFAULT_PLAN, since=None, until=None):
+        """Readings between `since` and `until` (inclusive), oldest first."""
+        rows = self._query("SELECT observed_at, price FROM readings WHERE series_id = ? "
+                           "AND observed_at BETWEEN ? AND ? ORDER BY observed_at", source, plan,
+                           (_ts(since) if since else 0, _ts(until) if until else 2 ** 62))
+        return [Reading(datetime.fromtimestamp(at), price) for at, price in rows]
+
+    def summary(self, source, plan=DEFAULT_PLAN, since=None, until=None):
+        """Count, min, max, average, first and last time over a range, or None if empty."""
+        rows = self._query("SELECT COUNT(*), MIN(price), MAX(price), AVG(price), MIN(observed_at), "
+                           "MAX(observed_at) FROM readings WHERE series_id = ? "
+                           "AND observed_at BETWEEN ? AND ?", source, plan,
+                           (_ts(since) if since else 0, _ts(until) if until else 2 ** 62))
+        if not rows or not rows[0][0]:
+            return None
+        count, low, high, avg, first_at, last_at = rows[0]
+        return Summary(count, low, high, avg, datetime.fromtimestamp(first_at), datetime.fromtimestamp(last_at))
+
+    def min_price(self, source, plan=DEFAULT_PLAN, days=90, now=None):
+        """Lowest price seen in the last `days` days, or None."""
+        since, until = _window(days, now)
+        rows = self._query("SELECT MIN(price) FROM readings WHERE series_id = ? "
+                           "AND observed_at BETWEEN ? AND ?", source, plan, (since, until))
+        return rows[0][0] if rows else None
+
+    def trailing_median(self, source, plan=DEFAULT_PLAN, days=30, now=None):
+        """Median price over the last `days` days, or None."""
+        since, until = _window(days, now)
+        rows = self._query("SELECT price FROM readings WHERE series_id = ? "
+                           "AND observed_at BETWEEN ? AND ?", source, plan, (since, until))
+        if not rows:
+            return None
+        prices = sorted(row[0] for row in rows)
+        middle = len(prices) // 2
+        return prices[middle] if len(prices) % 2 else (prices[middle - 1] + prices[middle]) / 2
+
+    def drop_from_median(self, price, source, plan=DEFAULT_PLAN, days=30, now=None):
+        """How far `price` is below the trailing median, in percent (negative if above)."""
+        median = self.trailing_median(source, plan, days, now)
+        if not median:
+            return None
+        return (median - price) / median * 100
+
+    def first_below(self, source, threshold, plan=DEFAULT_PLAN, since=None):
+        """When the price was first seen below `threshold` (after `since`), or None."""
+        rows = self._query("SELECT MIN(observed_at) FROM readings WHERE series_id = ? "
+                           "AND price < ? AND observed_at >= ?", source, plan,
+                           (threshold, _ts(since) if since else 0))
+        return datetime.fromtimestamp(rows[0][0]) if rows and rows[0][0] is not None else None
+
+    def sources(self):
+        """Every (source, plan) with readings."""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute("SELECT source, plan FROM series ORDER BY source, plan")]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_history = None
+
+
+def get_price_history():
+    """Return the process-wide price history."""
+    global _history
+    if _history is None:
+        _history = PriceHistory()
+    return _history
@@ -0,0 +1,302 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import metrics
+
+# Circuit breakers and retry budgets (set RESILIENCE=0 to turn both off)
+RESILIENCE = os.getenv("RESILIENCE", "1") != "0"
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "3"))  # failed checks in a row before opening
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "300"))  # seconds open after the first trip
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "21600"))  # cooldown doubles per re-trip up to this
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))  # seconds; full jitter up to base * 2^attempt
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))  # retries earned per call
+RETRY_BUDGET_MAX = float(os.getenv("RETRY_BUDGET_MAX", "5"))
+# Browser wait budget for the single probe check after an outage
+PROBE_WAIT_BUDGET = float(os.getenv("PROBE_WAIT_BUDGET", "10"))
+
+# Error kinds
+TIMEOUT = "timeout"
+SELECTOR_MISS = "selector_miss"
+BLOCKED = "blocked"
+NETWORK = "network"
+OTHER = "other"
+
+# Worth retrying: transient. A selector miss means the markup changed and
+# being blocked gets worse if we keep knocking, so neither is retried.
+RETRYABLE = (TIMEOUT, NETWORK)
+BLOCKED_STATUSES = (401, 403, 429, 999)
+BLOCKED_URL_MARKERS = ("/login", "/checkpoint", "captcha")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Caps WaitBudget totals in this context (see waits.WaitBudget)
+wait_budget_cap = ContextVar("wait_budget_cap", default=None)
+
+
+class Blocked(Exception):
+    """The site answered with a login wall, captcha or throttling page."""
+
+
+class CircuitOpen(Exception):
+    """Raised instead of running a check while its source's breaker is open."""
+
+    def __init__(self, name, retry_at):
+        super().__init__(f"Circuit open for {name}, next attempt after {time.strftime('%H:%M:%S', time.localtime(retry_at))}")
+        self.name = name
+        self.retry_at = retry_at
+
+
+def classify_error(error):
+    """Sort an exception from any fetch tier into timeout, selector_miss, blocked, network or other."""
+    if isinstance(error, Blocked):
+        return BLOCKED
+    # Matched by class name so this module never imports Selenium, requests or aiohttp
+    names = {cls.__name__ for cls in type(error).__mro__}
+    status = getattr(getattr(error, 'response', None), 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        if status in BLOCKED_STATUSES:
+            return BLOCKED
+        return NETWORK if status >= 500 else OTHER
+    if "SelectorTimeout" in names:
+        return SELECTOR_MISS
+    if names & {"Timeout", "TimeoutError", "TimeoutException"}:
+        return TIMEOUT
+    if "WebDriverException" in names:
+        return NETWORK if "net::ERR_" in str(error) else OTHER
+    if names & {"ConnectionError", "ClientConnectionError", "ClientPayloadError"} or isinstance(error, OSError):
+        return NETWORK
+    return OTHER
+
+
+def check_not_blocked(url):
+    """Raise Blocked if a browser ended up on a login or captcha page."""
+    if url and any(marker in url for marker in BLOCKED_URL_MARKERS):
+        raise Blocked(f"Redirected to {url}")
+
+
+class CircuitBreaker:
+    """Per-source breaker: opens after repeated failed checks, then lets one probe through.
+
+    Each re-trip doubles the cooldown (with jitter) so a long outage costs a
+    handful of probes instead of a full browser check every run.
+    """
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN, rng=random):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.rng = rng
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self._alert_pending = False
+        self._in_outage = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpen unless a check may run now. Returns the state it runs in."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() < self.retry_at:
+                    metrics.count("circuit_rejections_total", source=self.name)
+                    raise CircuitOpen(self.name, self.retry_at)
+                self._set_state(HALF_OPEN)
+            elif self.state == HALF_OPEN:
+                # One probe at a time
+                raise CircuitOpen(self.name, self.retry_at)
+            return self.state
+
+    def success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                metrics.log("circuit_closed", source=self.name, trips=self.trips)
+                self._set_state(CLOSED)
+            self.failures = 0
+            self.trips = 0
+            self._in_outage = False
+
+    def failure(self, kind):
+        with self._lock:
+            self.failures += 1
+            self.last_error = kind
+            if not self._in_outage:
+                self._in_outage = self._alert_pending = True
+            # Being blocked trips at once; a failed probe re-opens straight away
+            if self.state == HALF_OPEN or kind == BLOCKED or self.failures >= self.threshold:
+                self.trips += 1
+                cooldown = min(self.cooldown * 2 ** (self.trips - 1), self.max_cooldown)
+                self.retry_at = time.time() + cooldown * self.rng.uniform(0.8, 1.2)
+                if self.state != OPEN:
+                    metrics.log("circuit_opened", level="warning", source=self.name, kind=kind,
+                                failures=self.failures, retry_in_s=round(self.retry_at - time.time()))
+                self._set_state(OPEN)
+
+    def take_alert(self):
+        """True once per outage, so an error email goes out once instead of every run."""
+        with self._lock:
+            pending, self._alert_pending = self._alert_pending, False
+            return pending
+
+    def _set_state(self, state):
+        if state != self.state:
+            metrics.count("circuit_transitions_total", source=self.name, state=state)
+        self.state = state
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'trips': self.trips,
+                    'retry_at': round(self.retry_at) if self.state != CLOSED else None,
+                    'last_error': self.last_error}
+
+
+class RetryBudget:
+    """Token bucket: every call earns `ratio` of a retry, every retry spends one.
+
+    During an outage calls stop earning faster than retries spend, so retries
+    dry up on their own instead of multiplying load on a struggling site.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, maximum=RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = maximum
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Resilience:
+    """Breakers and retry budgets keyed by source."""
+
+    def __init__(self, enabled=RESILIENCE):
+        self.enabled = enabled
+        self._breakers = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def budget(self, name):
+        with self._lock:
+            if name not in self._budgets:
+                self._budgets[name] = RetryBudget()
+            return self._budgets[name]
+
+    @contextmanager
+    def guard(self, name):
+        """Wrap one whole check: fail fast while open, record the outcome otherwise.
+
+        Yields the breaker state the check runs in; HALF_OPEN probes get a
+        smaller browser wait budget.
+        """
+        if not self.enabled:
+            yield CLOSED
+            return
+        breaker = self.breaker(name)
+        state = breaker.allow()
+        token = wait_budget_cap.set(PROBE_WAIT_BUDGET) if state == HALF_OPEN else None
+        try:
+            yield state
+        except Exception as e:
+            breaker.failure(classify_error(e))
+            raise
+        else:
+            breaker.success()
+        finally:
+            if token is not None:
+                wait_budget_cap.reset(token)
+
+    def _retry_delay(self, name, operation, error, started, attempt, retries, retry_on, budget):
+        """Seconds to wait before retrying `error`, or None to give up."""
+        kind = classify_error(error)
+        metrics.count("errors_total", kind=kind, operation=operation)
+        # Time spent on attempts that produced nothing
+        metrics.count("wasted_seconds_total", time.perf_counter() - started, operation=operation)
+        if not budget or kind not in retry_on or attempt >= retries or not budget.withdraw():
+            return None
+        delay = self.backoff(attempt + 1)
+        metrics.log("retry", level="warning", source=name, operation=operation, kind=kind, error=error,
+                    attempt=attempt + 1, delay_s=round(delay, 1))
+        metrics.count("retries_total", operation=operation)
+        return delay
+
+    def call(self, name, operation, fn, *args, retries=MAX_RETRIES, retry_on=RETRYABLE):
+        """Run `fn(*args)`, retrying `retry_on` errors with jittered backoff while the budget allows."""
+        budget = self.budget(name) if self.enabled else None
+        if budget:
+            budget.deposit()
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            except Exception as e:
+                delay = self._retry_delay(name, operation, e, started, attempt, retries, retry_on, budget)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, name, operation, fn, *args, retries=MAX_RETRIES, retry_on=RETRYABLE):
+        """call() for coroutine functions; backs off with asyncio.sleep."""
+        import asyncio
+
+        budget = self.budget(name) if self.enabled else None
+        if budget:
+            budget.deposit()
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                return await fn(*args)
+            except Exception as e:
+                delay = self._retry_delay(name, operation, e, started, attempt, retries, retry_on, budget)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def backoff(attempt):
+        """Full jitter: uniform between 0 and base * 2^attempt seconds."""
+        return random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+
+    def take_alert(self, name):
+        """Whether a failure of `name` should be emailed (always, when resilience is off)."""
+        return not self.enabled or self.breaker(name).take_alert()
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+_resilience = None
+
+
+def get_resilience():
+    """Return the process-wide breakers and budgets."""
+    global _resilience
+    if _resilience is None:
+        _resilience = Resilience()
+    return _resilience
@@ -0,0 +1,223 @@
+import asyncio
+import heapq
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import metrics
+from monitor import Monitor, load_sources
+
+# Scheduler configuration
+SCHEDULE_STATE_PATH = os.getenv("SCHEDULE_STATE_PATH", "alltrails_schedule.db")
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "0.1"))  # +/- fraction of each interval
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "60"))  # first retry delay after a failure, seconds
+BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", "3600"))  # retries never wait longer than this (or the interval)
+STARTUP_SPREAD = float(os.getenv("STARTUP_SPREAD", "60"))  # new schedules start within this many seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    name TEXT PRIMARY KEY,
+    next_run REAL NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_run REAL,
+    last_error TEXT
+);
+"""
+
+
+class ScheduleState:
+    """Next-run times and failure streaks, kept in SQLite so restarts pick up where they left off."""
+
+    def __init__(self, path=SCHEDULE_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def load(self):
+        """{name: row dict} for every saved schedule."""
+        with self._lock:
+            return {row['name']: dict(row) for row in self._conn.execute("SELECT * FROM schedules")}
+
+    def save(self, name, next_run, failures, last_run=None, last_error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO schedules (name, next_run, failures, last_run, last_error) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, next_run, failures, last_run, last_error),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Schedule:
+    """When one source runs next, and how many checks in a row have failed."""
+
+    __slots__ = ("source", "interval", "next_run", "failures")
+
+    def __init__(self, source, next_run, failures=0):
+        self.source = source
+        self.interval = source.interval
+        self.next_run = next_run
+        self.failures = failures
+
+    def delay(self, failed, rng=random):
+        """Seconds until the next run: the interval with jitter, or a backoff after failures."""
+        if failed:
+            base = min(BACKOFF_BASE * 2 ** (self.failures - 1), BACKOFF_MAX, self.interval)
+        else:
+            base = self.interval
+        return max(0.0, base * (1 + rng.uniform(-SCHEDULE_JITTER, SCHEDULE_JITTER)))
+
+
+class Scheduler:
+    """Run every source on its own interval from one asyncio event loop.
+
+    Due checks go through Monitor.check_source, so static fetches share the
+    loop and browser checks share the monitor's bounded thread pool however
+    many schedules there are. A failed check is retried with exponential
+    backoff (capped at the source's interval); a success resets the streak.
+    While a source's circuit breaker is open its retry waits for the breaker's
+    cooldown instead of waking up only to be rejected.
+    """
+
+    def __init__(self, monitor, state=None, rng=None):
+        self.monitor = monitor
+        self.state = state if state is not None else ScheduleState()
+        self.rng = rng or random.Random()
+        self.schedules = {}
+        self._heap = []
+        self._running = set()
+        self._stop = None
+        self._wakeup = None
+        self.runs = 0
+        self.failed_runs = 0
+        self.overdue_at_start = 0
+        # Seconds between when a check was due and when it started
+        self.lateness = deque(maxlen=1000)
+
+    def _load(self, now):
+        saved = self.state.load()
+        for source in self.monitor.sources:
+            entry = saved.get(source.name)
+            if entry:
+                # A shortened interval takes effect now rather than after the old wait
+                schedule = Schedule(source, min(entry['next_run'], now + source.interval), entry['failures'])
+            else:
+                # Spread new schedules out instead of firing them all at once
+                schedule = Schedule(source, now + self.rng.uniform(0, min(STARTUP_SPREAD, source.interval)))
+                self.state.save(source.name, schedule.next_run, 0)
+            self.schedules[source.name] = schedule
+            heapq.heappush(self._heap, (schedule.next_run, source.name))
+        self.overdue_at_start = sum(1 for schedule in self.schedules.values() if schedule.next_run <= now)
+        metrics.log("scheduling", sources=len(self.schedules), overdue=self.overdue_at_start)
+
+    async def _run(self, schedule, http_limit):
+        started = time.time()
+        self.lateness.append(max(0.0, started - schedule.next_run))
+        retry_at = None
+        try:
+            result = await self.monitor.check_source(schedule.source, http_limit)
+            error, retry_at = result['error'], result.get('retry_at')
+        except Exception as e:
+            # Keep the schedule alive whatever happens inside the check
+            error = str(e)
+        failed = bool(error)
+        schedule.failures = schedule.failures + 1 if failed else 0
+        schedule.next_run = time.time() + schedule.delay(failed, self.rng)
+        if retry_at:
+            schedule.next_run = max(schedule.next_run, retry_at)
+        self.state.save(schedule.source.name, schedule.next_run, schedule.failures, started, error)
+        heapq.heappush(self._heap, (schedule.next_run, schedule.source.name))
+        # The new run may be due before whatever the loop is sleeping until
+        self._wakeup.set()
+        self.runs += 1
+        self.failed_runs += failed
+        metrics.count("scheduled_runs_total", outcome="error" if failed else "ok")
+        when = datetime.fromtimestamp(schedule.next_run).strftime('%Y-%m-%d %H:%M:%S')
+        metrics.log("next_check", source=schedule.source.name, at=when, retry=schedule.failures if failed else 0)
+
+    async def run_forever(self, until=None):
+        """Run due checks until stop() is called (or until the `until` Unix time)."""
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        http_limit = asyncio.Semaphore(self.monitor.http_concurrency)
+        self._load(time.time())
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if until is not None and now >= until:
+                    break
+                while self._heap and self._heap[0][0] <= now:
+                    _, name = heapq.heappop(self._heap)
+                    task = asyncio.create_task(self._run(self.schedules[name], http_limit))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+                wake = self._heap[0][0] if self._heap else now + 60
+                if until is not None:
+                    wake = min(wake, until)
+                self._wakeup.clear()
+                try:
+                    # Finished checks and stop() wake the loop early
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, min(wake - now, 60)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._running:
+                metrics.log("draining", running=len(self._running))
+                await asyncio.gather(*self._running, return_exceptions=True)
+            await self.monitor.release()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._wakeup.set()
+
+    def run(self, until=None):
+        """Blocking wrapper around run_forever(); SIGINT/SIGTERM stop it cleanly."""
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, self.stop)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            await self.run_forever(until)
+
+        asyncio.run(main())
+
+    def stats(self):
+        """Runs so far and how late checks started (seconds)."""
+        lateness = sorted(self.lateness)
+        return {
+            'schedules': len(self.schedules),
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'overdue_at_start': self.overdue_at_start,
+            'running': len(self._running),
+            'lateness_p50': round(lateness[len(lateness) // 2], 3) if lateness else None,
+            'lateness_p95': round(lateness[int(len(lateness) * 0.95)], 3) if lateness else None,
+            'lateness_max': round(lateness[-1], 3) if lateness else None,
+        }
+
+
+def main():
+    metrics.log("scheduler_started")
+    scheduler = Scheduler(Monitor(load_sources()))
+    try:
+        scheduler.run()
+    finally:
+        scheduler.monitor.shutdown()
+        metrics.log("scheduler_stopped", **scheduler.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import metrics
+from driver_pool import DRIVER_PROFILE_DIR
+
+# Sharded execution configuration
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_WORKER_CONCURRENCY = int(os.getenv("SHARD_WORKER_CONCURRENCY", "4"))  # checks in flight per worker
+# "spawn" starts workers without the parent's threads, sessions or Chrome; "fork" starts faster
+SHARD_START_METHOD = os.getenv("SHARD_START_METHOD", "spawn")
+
+# Messages from workers: (kind, worker_id, index[, result])
+STARTED = "started"
+DONE = "done"
+
+
+def _worker(worker_id, tasks, results, concurrency, profile_dir):
+    """Worker process: pull (index, source) tasks until a None arrives, report each result."""
+    import facebook_scraper
+    from monitor import Monitor
+    from notifier import stop_notifier
+
+    # One browser per worker, in a profile directory no other worker uses
+    facebook_scraper.configure_driver_pool(size=1, profile_root=profile_dir)
+    monitor = Monitor([], browser_workers=1)
+    # Each consumer blocks a thread on the queue while it waits for a task
+    getters = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="queue")
+
+    async def consume(http_limit):
+        loop = asyncio.get_running_loop()
+        while True:
+            task = await loop.run_in_executor(getters, tasks.get)
+            if task is None:
+                return
+            index, source = task
+            results.put((STARTED, worker_id, index))
+            result = await monitor.check_source(source, http_limit)
+            result['worker'] = worker_id
+            results.put((DONE, worker_id, index, result))
+
+    async def main():
+        http_limit = asyncio.Semaphore(monitor.http_concurrency)
+        try:
+            await asyncio.gather(*(consume(http_limit) for _ in range(concurrency)))
+        finally:
+            await monitor.release()
+
+    try:
+        asyncio.run(main())
+    finally:
+        getters.shutdown(wait=False)
+        monitor.shutdown()
+        # Before exiting, not at exit: alerts still queued here would be lost (and
+        # their pages never committed) if the coordinator stopped waiting for us
+        stop_notifier()
+        facebook_scraper.shutdown_driver_pool()
+
+
+def _error_result(source, error):
+    return {'source': source.name, 'type': source.type, 'url': source.url,
+            'tier': None, 'error': error, 'worker': None}
+
+
+class ShardedMonitor:
+    """Check sources across several worker processes fed from one shared queue.
+
+    Parsing, classification and email rendering are CPU work that a single
+    process runs on one core; here each worker process runs its own Monitor
+    with one browser and pulls the next source whenever it has room, so a
+    slow page never holds up the rest of the list. Results stream back as
+    they finish. Hits to one host are still spaced `min_interval` apart
+    across all workers: the coordinator releases a host's sources into the
+    queue no faster than that.
+    """
+
+    def __init__(self, sources, workers=SHARD_WORKERS, concurrency=SHARD_WORKER_CONCURRENCY,
+                 start_method=SHARD_START_METHOD, profile_root=DRIVER_PROFILE_DIR):
+        self.sources = list(sources)
+        self.workers = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self.context = multiprocessing.get_context(start_method)
+        self.profile_root = profile_root
+        self.restarts = 0
+
+    def _release_times(self, start):
+        """(when, index) for every source, spacing each host's sources by their min_interval."""
+        next_slot, releases = {}, []
+        for index, source in enumerate(self.sources):
+            host = urlparse(source.url).netloc
+            slot = next_slot.get(host, start)
+            next_slot[host] = slot + source.min_interval
+            releases.append((slot, index))
+        heapq.heapify(releases)
+        return releases
+
+    def _start_worker(self, worker_id, tasks, results):
+        profile_dir = os.path.join(self.profile_root, f"worker-{worker_id}")
+        process = self.context.Process(target=_worker, name=f"shard-{worker_id}", daemon=True,
+                                       args=(worker_id, tasks, results, self.concurrency, profile_dir))
+        process.start()
+        return process
+
+    def iter_results(self):
+        """Yield each source's result dict as soon as a worker finishes it."""
+        if not self.sources:
+            return
+        tasks, results = self.context.Queue(), self.context.Queue()
+        processes = {worker_id: self._start_worker(worker_id, tasks, results)
+                     for worker_id in range(min(self.workers, len(self.sources)))}
+        next_id = len(processes)
+        releases = self._release_times(time.monotonic())
+        pending = set(range(len(self.sources)))
+        # index -> worker_id for tasks a worker has picked up
+        in_flight = {}
+        try:
+            while pending:
+                now = time.monotonic()
+                while releases and releases[0][0] <= now:
+                    _, index = heapq.heappop(releases)
+                    tasks.put((index, self.sources[index]))
+                    if not releases:
+                        # Everything is queued; one stop marker per consumer
+                        for _ in range(len(processes) * self.concurrency):
+                            tasks.put(None)
+                try:
+                    message = results.get(timeout=max(0.01, min(1.0, releases[0][0] - now) if releases else 1.0))
+                except queue.Empty:
+                    message = None
+                if message is None:
+                    # Quiet for a while: make sure the workers are still there
+                    for worker_id, process in list(processes.items()):
+                        if process.is_alive():
+                            continue
+                        del processes[worker_id]
+                        if process.exitcode == 0:
+                            continue
+                        for index in [i for i, w in in_flight.items() if w == worker_id]:
+                            del in_flight[index]
+                            pending.discard(index)
+                            source = self.sources[index]
+                            metrics.log("worker_died", level="error", worker=worker_id, exit_code=process.exitcode,
+                                        source=source.name)
+                            yield _error_result(source, f"Worker exited with code {process.exitcode}")
+                        if pending and self.restarts < self.workers:
+                            self.restarts += 1
+                            processes[next_id] = self._start_worker(next_id, tasks, results)
+                            if not releases:
+                                for _ in range(self.concurrency):
+                                    tasks.put(None)
+                            next_id += 1
+                    if not processes:
+                        for index in sorted(pending):
+                            yield _error_result(self.sources[index], "No workers left to run the check")
+                        pending.clear()
+                    continue
+                kind, worker_id, index = message[:3]
+                if kind == STARTED:
+                    in_flight[index] = worker_id
+                elif index in pending:
+                    in_flight.pop(index, None)
+                    pending.discard(index)
+                    yield message[3]
+        finally:
+            for process in processes.values():
+                # Abandoned early: stop the workers. Otherwise let them deliver their alerts and quit Chrome
+                if pending:
+                    process.terminate()
+                process.join()
+
+    def run(self):
+        """Check every source once; results in source order."""
+        metrics.log("run_started", sources=len(self.sources), workers=self.workers)
+        by_source = {result['source']: result for result in self.iter_results()}
+        return [by_source[source.name] for source in self.sources if source.name in by_source]
+
+
+def main():
+    from monitor import load_sources
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else SHARD_WORKERS
+    print("Starting sharded check...")
+    start = time.perf_counter()
+    results = ShardedMonitor(load_sources(), workers=workers).run()
+    failed = [r for r in results if r['error']]
+    print(f"Checked {len(results)} sources ({len(failed)} failed) in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Credentials the smtp_server fixture accepts
+USERNAME = "alerts@example.com"
+PASSWORD = "secret"
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        # Seconds to sit on each message before accepting it
+        self.delay = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """A local SMTP server that refuses mail until the client logs in."""
+    pytest.importorskip("aiosmtpd")
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    def authenticator(server, session, envelope, mechanism, auth_data):
+        ok = auth_data.login == USERNAME.encode() and auth_data.password == PASSWORD.encode()
+        return AuthResult(success=ok)
+
+    inbox = Inbox()
+    # Plain-text AUTH is fine on loopback
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port(), authenticator=authenticator,
+                            auth_required=True, auth_require_tls=False)
+    controller.start()
+    try:
+        yield controller, inbox
+    finally:
+        controller.stop()
@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import facebook_scraper
+from driver_pool import DriverPool
+
+
+class FakeDriver:
+    """Answers like a live WebDriver until crash() is called."""
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.alive = True
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def get(self, url):
+        self.execute_script("")
+
+    def crash(self):
+        self.alive = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def pool(tmp_path):
+    started = []
+
+    def factory(profile_dir=None):
+        started.append(FakeDriver(profile_dir))
+        return started[-1]
+
+    pool = DriverPool(factory, size=1, max_uses=3, acquire_timeout=0.2, profile_root=str(tmp_path))
+    pool.started = started
+    yield pool
+    pool.shutdown()
+
+
+def test_warm_and_cold_checkouts_are_counted(pool):
+    for _ in range(3):
+        with pool.driver():
+            pass
+    stats = pool.stats()
+    assert (stats['cold_starts'], stats['warm_hits']) == (1, 2)
+    assert stats['warm_ratio'] == pytest.approx(2 / 3)
+    assert len(pool.started) == 1
+    assert pool.started[0].profile_dir.endswith("slot-0")
+
+
+def test_driver_is_recycled_after_max_uses(pool):
+    for _ in range(4):
+        with pool.driver():
+            pass
+    first, second = pool.started
+    assert first.quit_called and not second.quit_called
+    # Same slot, same profile: cookies survive the recycle
+    assert first.profile_dir == second.profile_dir
+    stats = pool.stats()
+    assert (stats['recycled'], stats['cold_starts'], stats['warm_hits']) == (1, 2, 2)
+
+
+def test_unhealthy_idle_driver_is_replaced(pool):
+    with pool.driver() as driver:
+        pass
+    driver.crash()
+    with pool.driver() as replacement:
+        assert replacement is not driver
+    assert driver.quit_called
+    assert pool.stats()['crashed'] == 1
+
+
+def test_driver_that_dies_mid_check_is_discarded(pool):
+    with pytest.raises(ValueError):
+        with pool.driver() as driver:
+            driver.crash()
+            raise ValueError("page broke")
+    assert driver.quit_called
+    with pool.driver() as replacement:
+        assert replacement is not driver
+    assert pool.stats()['cold_starts'] == 2
+
+
+def test_acquire_times_out_when_every_driver_is_busy(pool):
+    with pool.driver():
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+
+
+def test_concurrent_first_use_creates_one_pool(monkeypatch, tmp_path):
+    class SlowPool(DriverPool):
+        def __init__(self, factory, **options):
+            # Widen the window between the None check and the assignment
+            time.sleep(0.05)
+            super().__init__(factory, profile_root=str(tmp_path), **options)
+
+    monkeypatch.setattr(facebook_scraper, "_driver_pool", None)
+    monkeypatch.setattr(facebook_scraper, "DriverPool", SlowPool)
+    start = threading.Barrier(8)
+
+    def first_use(_):
+        start.wait()
+        return facebook_scraper.get_driver_pool()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        pools = list(pool.map(first_use, range(8)))
+    assert len({id(p) for p in pools}) == 1
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from fb_time import parse_facebook_time
+
+
+def test_date_without_year_rolls_back_to_last_year():
+    assert parse_facebook_time("March 3", datetime(2027, 1, 10)) == datetime(2026, 3, 3)
+
+
+def test_february_29_early_in_a_leap_year():
+    # Rolling back to 2027 would need a February 29 that doesn't exist
+    assert parse_facebook_time("February 29", datetime(2028, 1, 10)) is None
+    assert parse_facebook_time("February 29", datetime(2028, 3, 1)) == datetime(2028, 2, 29)
@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import http.server
+import threading
+
+import pytest
+
+from fetch_engine import TIER_BROWSER, AsyncStaticFetcher, FetchEngine, StaticFetcher
+from page_state import PageStateStore
+from resilience import CLOSED, OPEN, Blocked, Resilience
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GzipHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = gzip.compress(self.server.page)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    server.status = 200
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/page"
+    yield server
+    server.shutdown()
+
+
+class Browser:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def make_engine():
+    return FetchEngine(StaticFetcher(timeout=2), pages=PageStateStore(":memory:"), resilience=Resilience(enabled=True))
+
+
+def run_check(engine, url, browser, use_async):
+    if not use_async:
+        return engine.check(url, lambda html: None, browser, source="test")
+
+    async def check():
+        fetcher = AsyncStaticFetcher(timeout=2)
+        try:
+            return await engine.check_async(url, lambda html: None, browser, "test", fetcher=fetcher)
+        finally:
+            await fetcher.close()
+
+    return asyncio.run(check())
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_blocked_static_fetch_falls_back_to_browser(server, use_async):
+    server.status = 403
+    engine, browser = make_engine(), Browser(42.0)
+    result = run_check(engine, server.url, browser, use_async)
+    assert (result.tier, result.value, browser.calls) == (TIER_BROWSER, 42.0, 1)
+    assert engine.resilience.breaker("test").state == CLOSED
+    assert engine.stats()[TIER_BROWSER] == 1
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_breaker_trips_when_browser_is_blocked_too(server, use_async):
+    server.status = 429
+    engine, browser = make_engine(), Browser(Blocked("Redirected to /login"))
+    with pytest.raises(Blocked):
+        run_check(engine, server.url, browser, use_async)
+    assert browser.calls == 1
+    assert engine.resilience.breaker("test").state == OPEN
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_server_errors_skip_the_browser(server, use_async, monkeypatch):
+    monkeypatch.setattr("resilience.RETRY_BASE_DELAY", 0.01)
+    server.status = 503
+    engine, browser = make_engine(), Browser(42.0)
+    with pytest.raises(Exception):
+        run_check(engine, server.url, browser, use_async)
+    assert browser.calls == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_fetched_bytes_are_counted_as_sent(use_async):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+    server.page = b"<html><body>" + b"<p>Trail report</p>" * 1000 + b"</body></html>"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/page"
+
+    async def get_async():
+        fetcher = AsyncStaticFetcher(timeout=2)
+        try:
+            return await fetcher.get(url)
+        finally:
+            await fetcher.close()
+
+    try:
+        html, status, _, nbytes = asyncio.run(get_async()) if use_async else StaticFetcher(timeout=2).get(url)
+    finally:
+        server.shutdown()
+    assert html.encode() == server.page and status == 200
+    assert nbytes == len(gzip.compress(server.page))
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import jobs
+from jobs import SUCCEEDED, JobRunner
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(workers=4, max_browser_jobs=1)
+    yield runner
+    runner.executor.shutdown(wait=True)
+
+
+def test_concurrent_submits_share_one_job(runner):
+    release = threading.Event()
+    calls = []
+
+    def check():
+        calls.append(True)
+        release.wait(5)
+        return "done"
+
+    start = threading.Barrier(8)
+
+    def submit(_):
+        start.wait()
+        return runner.submit("check_for_promotions", check)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        submitted = list(pool.map(submit, range(8)))
+    release.set()
+
+    assert len({job.id for job, _ in submitted}) == 1
+    assert sum(created for _, created in submitted) == 1
+    job = submitted[0][0]
+    assert job.done.wait(5) and job.status == SUCCEEDED and job.result == "done"
+    assert calls == [True]
+
+    # Once finished, the key runs again
+    again, created = runner.submit("check_for_promotions", check)
+    assert created and again.id != job.id
+
+
+def test_browser_jobs_share_the_cap(runner):
+    busy, peak = [], []
+    lock = threading.Lock()
+
+    def check():
+        with lock:
+            busy.append(True)
+            peak.append(len(busy))
+        time.sleep(0.05)
+        with lock:
+            busy.pop()
+
+    submitted = [runner.submit(f"source-{i}", check)[0] for i in range(3)]
+    assert all(job.done.wait(5) for job in submitted)
+    assert max(peak) == 1
+
+
+def test_concurrent_first_use_creates_one_runner(monkeypatch):
+    class SlowRunner(JobRunner):
+        def __init__(self):
+            # Widen the window between the None check and the assignment
+            time.sleep(0.05)
+            super().__init__(workers=1)
+
+    monkeypatch.setattr(jobs, "_runner", None)
+    monkeypatch.setattr(jobs, "JobRunner", SlowRunner)
+    start = threading.Barrier(8)
+
+    def first_use(_):
+        start.wait()
+        return jobs.get_job_runner()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        runners = list(pool.map(first_use, range(8)))
+    assert len({id(runner) for runner in runners}) == 1
+    runners[0].executor.shutdown(wait=True)
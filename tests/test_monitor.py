@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import http.server
+import threading
+
+import pytest
+
+import facebook_scraper
+import monitor
+from fetch_engine import TIER_STATIC, FetchEngine, StaticFetcher
+from monitor import FacebookSource, Monitor, Source
+from page_state import PageStateStore
+from resilience import Resilience
+
+
+class StaticOnlySource(Source):
+    type = "static-only"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = []
+
+    def parse_static(self, html):
+        return None
+
+    def handle(self, value):
+        self.handled.append(value)
+
+
+@pytest.fixture
+def base_url(tmp_path):
+    (tmp_path / "page.html").write_text("<html><body>Nothing to read</body></html>")
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FetchEngine(StaticFetcher(timeout=2), pages=PageStateStore(":memory:"),
+                         resilience=Resilience(enabled=True))
+    monkeypatch.setattr(monitor, "get_fetch_engine", lambda: engine)
+    return engine
+
+
+def test_static_only_source_needs_no_browser(base_url, engine):
+    source = StaticOnlySource("static", f"{base_url}/page.html", min_interval=0)
+    checker = Monitor([source], browser_workers=1)
+    try:
+        [result] = asyncio.run(checker.run_once())
+    finally:
+        checker.shutdown()
+    assert result['error'] is None and result['tier'] == TIER_STATIC
+    assert source.handled == [None]
+
+
+def test_facebook_error_email_names_the_source(monkeypatch):
+    sent = []
+    monkeypatch.setattr(facebook_scraper, "send_email", lambda subject, body: sent.append((subject, body)))
+    source = FacebookSource("rei-facebook", "https://www.facebook.com/REI")
+    source.handle_error(RuntimeError("page broke"))
+    [(subject, body)] = sent
+    assert "rei-facebook" in subject and "AllTrails" not in subject
+    assert "https://www.facebook.com/REI" in body
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PASSWORD, USERNAME
+from notifier import Notification, Notifier, SMTPConnectionPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.filterwarnings("ignore:Requiring AUTH while not requiring TLS")
+
+
+def make_notifier(controller, password=PASSWORD):
+    pool = SMTPConnectionPool(host=controller.hostname, port=controller.port,
+                              username=USERNAME, password=password, starttls=False)
+    return Notifier(pool=pool, sender=USERNAME, max_retries=0, run_async=False)
+
+
+def test_logs_in_before_sending(smtp_server):
+    controller, inbox = smtp_server
+    notifier = make_notifier(controller)
+    sent = []
+
+    assert notifier.enqueue("Price alert", "body", to=USERNAME, on_sent=lambda: sent.append(True))
+    assert len(inbox.messages) == 1
+    assert sent == [True]
+    assert notifier.stats['sent'] == 1
+    notifier.stop()
+
+
+def test_reuses_logged_in_connection(smtp_server):
+    controller, inbox = smtp_server
+    notifier = make_notifier(controller)
+
+    notifier.enqueue("First", "body", to=USERNAME)
+    notifier.enqueue("Second", "body", to=USERNAME)
+    assert len(inbox.messages) == 2
+    assert notifier.pool.connects == 1
+    notifier.stop()
+
+
+
+def test_digest_embeds_bodies_not_documents():
+    notifier = Notifier(pool=SMTPConnectionPool(username=USERNAME, password=PASSWORD), sender=USERNAME)
+    alerts = [Notification(f"Alert {i}", f'<html><head></head><body style="color:#333"><p>Sale {i}</p></body></html>',
+                           is_html=True, to=USERNAME) for i in range(2)]
+    message = notifier._build_message(alerts)
+    html = next(part for part in message.walk() if part.get_content_type() == "text/html")
+    body = html.get_payload(decode=True).decode()
+    assert body.count("<html") == 1 and body.count("<body") == 1
+    assert "<p>Sale 0</p>" in body and "<p>Sale 1</p>" in body
+
+
+def test_sigterm_delivers_queued_mail(smtp_server):
+    controller, inbox = smtp_server
+    env = dict(os.environ, SMTP_SERVER=controller.hostname, SMTP_PORT=str(controller.port), SMTP_STARTTLS="0",
+               EMAIL_USERNAME=USERNAME, EMAIL_PASSWORD=PASSWORD, NOTIFY_BATCH_WINDOW="30")
+    # Queue an alert, then get stopped the way Cloud Run stops main.py
+    script = (
+        "import os, signal, time\n"
+        "import main\n"
+        "from notifier import get_notifier\n"
+        "signal.signal(signal.SIGTERM, main.handle_sigterm)\n"
+        "get_notifier().enqueue('Price alert', 'body')\n"
+        "os.kill(os.getpid(), signal.SIGTERM)\n"
+        "time.sleep(30)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, timeout=20)
+    assert result.returncode == 0
+    assert len(inbox.messages) == 1
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+import facebook_scraper
+import page_state
+import webtracker
+from page_state import UNCHANGED, PageStateStore
+
+URL = "https://www.alltrails.com/membership"
+PRICE_HTML = '<html><body><div class="price">$35.99</div></body></html>'
+
+
+class FakeNotifier:
+    """Accepts mail but only delivers it when told to."""
+
+    def __init__(self):
+        self.queued = []
+
+    def enqueue(self, subject, body=None, is_html=False, to=None, digest=True, on_sent=None, text=None):
+        self.queued.append(on_sent)
+        return True
+
+    def deliver(self):
+        for on_sent in self.queued:
+            if on_sent:
+                on_sent()
+        self.queued.clear()
+
+
+@pytest.fixture
+def pages(tmp_path, monkeypatch):
+    pages = PageStateStore(str(tmp_path / "pages.db"))
+    for module in (page_state, facebook_scraper, webtracker):
+        monkeypatch.setattr(module, "get_page_state", lambda: pages)
+    yield pages
+    pages.close()
+
+
+@pytest.fixture
+def notifier(monkeypatch):
+    notifier = FakeNotifier()
+    for module in (facebook_scraper, webtracker):
+        monkeypatch.setattr(module, "get_notifier", lambda: notifier)
+    monkeypatch.setattr(webtracker, "USE_PRICE_HISTORY", False)
+    for name in ("EMAIL_SENDER", "EMAIL_PASSWORD", "EMAIL_RECEIVER"):
+        monkeypatch.setattr(webtracker, name, "alerts@example.com")
+    return notifier
+
+
+def test_staged_state_is_saved_on_commit(pages):
+    pages.stage(URL, "digest", validators=('"v1"', None))
+    assert pages.changed(URL, "digest") and pages.validators(URL) is None
+    pages.commit(URL)
+    assert not pages.changed(URL, "digest")
+    assert pages.validators(URL) == ('"v1"', None)
+
+
+def test_price_fingerprint_waits_for_the_alert(pages, notifier):
+    price = webtracker.parse_price_if_changed(PRICE_HTML, URL)
+    assert webtracker.handle_price(price, URL, target_price=40) is not None
+
+    # The alert hasn't gone out: the same page is still new
+    assert webtracker.parse_price_if_changed(PRICE_HTML, URL) == price
+
+    notifier.deliver()
+    assert webtracker.parse_price_if_changed(PRICE_HTML, URL) is UNCHANGED
+
+
+def test_facebook_fingerprint_waits_for_the_email(pages, notifier, monkeypatch):
+    monkeypatch.setattr(facebook_scraper, "USE_POST_STORE", False)
+    posts = [{'text': "Sunrise over the ridge.", 'time': "2h", 'permalink': None}]
+    result = facebook_scraper._summarize_if_changed(posts, URL)
+    facebook_scraper.notify_promotions(*result, url=URL)
+    assert facebook_scraper._summarize_if_changed(posts, URL) is not UNCHANGED
+
+    notifier.deliver()
+    assert facebook_scraper._summarize_if_changed(posts, URL) is UNCHANGED
+
+
+def fixture_page():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "benchmarks", "fixtures", "facebook_page.html")
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_facebook_fingerprint_ignores_counters_and_timestamps(pages, monkeypatch):
+    monkeypatch.setattr(facebook_scraper, "USE_POST_STORE", False)
+    html = fixture_page()
+    assert facebook_scraper._scrape_static(html, URL) is not UNCHANGED
+    pages.commit(URL)
+
+    busier = html.replace("37 reactions", "38 reactions").replace(">3h<", ">4h<")
+    busier = busier.replace("Love this! 🥾", "Love this! 🥾 Me too!")
+    assert busier != html
+    assert facebook_scraper._scrape_static(busier, URL) is UNCHANGED
+
+    edited = html.replace("Summer sale!", "Summer sale, extended!")
+    assert facebook_scraper._scrape_static(edited, URL) is not UNCHANGED
+
+
+def test_facebook_fingerprint_without_a_message_node(pages, monkeypatch):
+    monkeypatch.setattr(facebook_scraper, "USE_POST_STORE", False)
+    post = {'text': "AllTrails\n3h\nSunrise over the ridge.\n37 reactions\n2 comments", 'time': "3h",
+            'permalink': "https://www.facebook.com/AllTrails/posts/1"}
+    facebook_scraper._summarize_if_changed([post], URL)
+    pages.commit(URL)
+
+    later = dict(post, text="AllTrails\n4h\nSunrise over the ridge.\n1.2K reactions\n3 comments", time="4h")
+    assert facebook_scraper._summarize_if_changed([later], URL) is UNCHANGED
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+import facebook_scraper
+from post_store import PostStore, post_key
+
+PAGE = "https://www.facebook.com/AllTrails"
+NOW = datetime(2026, 5, 20, 12, 0)
+PROMO = {'text': "Flash sale: 50% off AllTrails Plus this weekend only!",
+         'time': "2h", 'permalink': "https://www.facebook.com/AllTrails/posts/1"}
+OTHER = {'text': "Sunrise over the ridge on this morning's hike.",
+         'time': "3h", 'permalink': "https://www.facebook.com/AllTrails/posts/2"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PostStore(str(tmp_path / "posts.db"))
+    monkeypatch.setattr(facebook_scraper, "USE_POST_STORE", True)
+    monkeypatch.setattr(facebook_scraper, "get_post_store", lambda: store)
+    yield store
+    store.close()
+
+
+def test_unalerted_promotion_is_not_settled(store):
+    store.record(PROMO, NOW, "sale", PAGE)
+    store.record(OTHER, NOW, None, PAGE)
+    assert store.settled([post_key(PROMO), post_key(OTHER)]) == {post_key(OTHER)}
+    store.mark_alerted([post_key(PROMO)])
+    assert store.settled([post_key(PROMO)]) == {post_key(PROMO)}
+
+
+def test_promotion_offered_until_alerted(store):
+    found, details, _ = facebook_scraper._summarize_posts([PROMO, OTHER], PAGE, NOW)
+    assert found and [promo['key'] for promo in details] == [post_key(PROMO)]
+
+    # The email never went out: the next check offers it again
+    found, details, _ = facebook_scraper._summarize_posts([PROMO, OTHER], PAGE, NOW)
+    assert found and [promo['key'] for promo in details] == [post_key(PROMO)]
+
+    # Even when it has scrolled off the part of the page we read
+    found, details, _ = facebook_scraper._summarize_posts([OTHER], PAGE, NOW)
+    assert found and details[0]['permalink'] == PROMO['permalink']
+
+    store.mark_alerted([post_key(PROMO)])
+    found, details, _ = facebook_scraper._summarize_posts([PROMO, OTHER], PAGE, NOW)
+    assert not found and details == []
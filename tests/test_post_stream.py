@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import facebook_scraper
+from facebook_scraper import PostStream
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+class FakeDriver:
+    """Hands out scripted SCROLL_BATCH_JS results and records the load timeouts asked for."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.load_timeouts = []
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, expand_ms, load_ms, prune):
+        self.load_timeouts.append(load_ms)
+        return self.batches.pop(0) if self.batches else {'posts': [], 'pruned': 0, 'end': True}
+
+
+class FakeBudget:
+    def __init__(self, remaining):
+        self.left = remaining
+
+    def remaining(self):
+        return self.left
+
+    def timeout_for(self, requested):
+        return min(requested, self.left)
+
+
+def batch(*ids):
+    posts = [{'text': f"Post {i}", 'time': "1h", 'permalink': f"https://www.facebook.com/AllTrails/posts/{i}"}
+             for i in ids]
+    return {'posts': posts, 'pruned': 0, 'end': not posts}
+
+
+def stream(driver, budget=None):
+    return PostStream(driver, NOW - timedelta(days=7), budget=budget, max_posts=100, now=NOW)
+
+
+def test_empty_batch_with_full_wait_is_the_end_of_the_feed(monkeypatch):
+    monkeypatch.setattr(facebook_scraper, "SCROLL_LOAD_TIMEOUT", 10)
+    posts = stream(FakeDriver([batch(1, 2), batch()]), FakeBudget(60))
+    assert len(list(posts)) == 2
+    assert posts.stop_reason == "reached the end of the feed"
+
+
+def test_empty_batch_after_a_clamped_wait_is_not_the_end(monkeypatch):
+    monkeypatch.setattr(facebook_scraper, "SCROLL_LOAD_TIMEOUT", 10)
+    budget = FakeBudget(2)
+    driver = FakeDriver([batch(1, 2), batch()])
+    posts = stream(driver, budget)
+    assert len(list(posts)) == 2
+    assert driver.load_timeouts == [2000, 2000]
+    assert posts.stop_reason == "wait budget exhausted"
+
+
+def test_spent_budget_stops_before_the_next_batch():
+    driver = FakeDriver([batch(1)])
+    posts = stream(driver, FakeBudget(0))
+    assert list(posts) == [] and driver.load_timeouts == []
+    assert posts.stop_reason == "wait budget exhausted"
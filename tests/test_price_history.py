@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import page_state
+import webtracker
+from price_history import PriceHistory
+
+SOURCE = "alltrails-membership"
+# The alert rules look back from the real clock
+NOW = datetime.now().replace(microsecond=0)
+
+
+def days_ago(days):
+    return NOW - timedelta(days=days)
+
+
+class FakeNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def enqueue(self, subject, body=None, is_html=False, to=None, digest=True, on_sent=None, text=None):
+        self.sent.append(subject)
+        if on_sent:
+            on_sent()
+        return True
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PriceHistory(str(tmp_path / "prices.db"))
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def tracker(history, monkeypatch):
+    """webtracker wired to the tmp history and a notifier that delivers at once."""
+    notifier = FakeNotifier()
+    monkeypatch.setattr(webtracker, "USE_PRICE_HISTORY", True)
+    monkeypatch.setattr(webtracker, "get_price_history", lambda: history)
+    monkeypatch.setattr(webtracker, "get_notifier", lambda: notifier)
+    monkeypatch.setattr(page_state, "get_page_state", lambda: None)
+    for name in ("EMAIL_SENDER", "EMAIL_PASSWORD", "EMAIL_RECEIVER"):
+        monkeypatch.setattr(webtracker, name, "alerts@example.com")
+    return notifier
+
+
+def seed(history, prices):
+    """Record {days_ago: price} readings."""
+    history.record_many([(SOURCE, "default", days_ago(days), price) for days, price in prices.items()])
+
+
+def test_trailing_median_covers_only_its_window(history):
+    seed(history, {40: 10.0, 20: 30.0, 10: 36.0, 5: 35.0, 1: 34.0})
+    assert history.trailing_median(SOURCE, days=30, now=NOW) == 34.5
+    assert history.trailing_median(SOURCE, days=7, now=NOW) == 34.5
+    assert history.trailing_median(SOURCE, days=15, now=NOW) == 35.0
+    assert history.trailing_median("unknown", now=NOW) is None
+
+
+def test_drop_from_median(history):
+    seed(history, {3: 40.0, 2: 40.0, 1: 40.0})
+    assert history.drop_from_median(30.0, SOURCE, now=NOW) == 25.0
+    assert history.drop_from_median(44.0, SOURCE, now=NOW) == -10.0
+    assert history.drop_from_median(30.0, "unknown", now=NOW) is None
+
+
+def test_min_price_windows(history):
+    seed(history, {120: 19.99, 60: 24.99, 3: 35.99})
+    assert history.min_price(SOURCE, days=7, now=NOW) == 35.99
+    assert history.min_price(SOURCE, days=90, now=NOW) == 24.99
+    assert history.min_price(SOURCE, days=365, now=NOW) == 19.99
+    assert history.min_price(SOURCE, days=1, now=NOW) is None
+
+
+def test_first_below(history):
+    seed(history, {30: 35.99, 20: 29.99, 10: 24.99, 5: 35.99})
+    assert history.first_below(SOURCE, 30) == days_ago(20)
+    assert history.first_below(SOURCE, 30, since=days_ago(15)) == days_ago(10)
+    assert history.first_below(SOURCE, 20) is None
+
+
+def test_alert_reasons(history):
+    assert webtracker.alert_reason(29.99, SOURCE, target_price=29.99, history=None).startswith("at or below")
+    assert webtracker.alert_reason(35.99, SOURCE, target_price=29.99, history=None) is None
+
+    seed(history, {3: 40.0, 2: 40.0, 1: 40.0})
+    assert webtracker.alert_reason(29.99, SOURCE, target_price=29.99, history=history).startswith("at or below")
+    # Above target but 20% under the trailing median
+    assert webtracker.alert_reason(32.0, SOURCE, target_price=29.99, history=history).startswith("20% below")
+    # A smaller dip stays quiet
+    assert webtracker.alert_reason(38.0, SOURCE, target_price=29.99, history=history) is None
+
+
+def test_only_a_new_drop_alerts(history):
+    seed(history, {2: 40.0, 1: 25.0})
+    # Still under target, but no lower than the last reading: the sale was already reported
+    assert webtracker.alert_reason(25.0, SOURCE, target_price=29.99, history=history) is None
+    assert webtracker.alert_reason(26.0, SOURCE, target_price=29.99, history=history) is None
+    assert webtracker.alert_reason(24.0, SOURCE, target_price=29.99, history=history) is not None
+
+
+def test_sale_lasting_several_checks_sends_one_alert(history, tracker):
+    seed(history, {3: 40.0, 2: 40.0})
+    assert webtracker.handle_price(25.0, source=SOURCE, target_price=29.99) is not None
+    assert history.latest(SOURCE).price == 25.0
+    assert webtracker.track_unchanged(SOURCE) == 25.0
+    assert webtracker.handle_price(25.0, source=SOURCE, target_price=29.99) is None
+    assert len(tracker.sent) == 1
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from resilience import (CLOSED, HALF_OPEN, NETWORK, OPEN, CircuitBreaker, CircuitOpen, Resilience,
+                        RetryBudget)
+
+
+class NoJitter:
+    @staticmethod
+    def uniform(low, high):
+        return 1.0
+
+
+def make_breaker(cooldown=0.05):
+    return CircuitBreaker("test", threshold=3, cooldown=cooldown, max_cooldown=1, rng=NoJitter())
+
+
+def test_opens_after_threshold():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.allow()
+        breaker.failure(NETWORK)
+    assert breaker.state == CLOSED
+    breaker.failure(NETWORK)
+    assert breaker.state == OPEN
+
+
+def test_fails_fast_while_open():
+    breaker = make_breaker(cooldown=60)
+    for _ in range(3):
+        breaker.failure(NETWORK)
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.failure(NETWORK)
+    time.sleep(0.06)
+    assert breaker.allow() == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() == CLOSED
+
+
+def test_failed_probe_reopens_with_longer_cooldown():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.failure(NETWORK)
+    time.sleep(0.06)
+    breaker.allow()
+    before = time.time()
+    breaker.failure(NETWORK)
+    assert breaker.state == OPEN
+    assert breaker.retry_at - before == pytest.approx(0.1, abs=0.02)
+
+
+def test_retry_budget_runs_dry():
+    budget = RetryBudget(ratio=0.5, maximum=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_retries_stop_when_the_budget_is_spent():
+    resilience = Resilience(enabled=True)
+    resilience.backoff = lambda attempt: 0
+    budget = resilience.budget("test")
+    budget.ratio, budget.maximum, budget.tokens = 0.5, 2, 2
+    attempts = []
+
+    def down():
+        attempts[-1] += 1
+        raise ConnectionError("refused")
+
+    for _ in range(4):
+        attempts.append(0)
+        with pytest.raises(ConnectionError):
+            resilience.call("test", "static_fetch", down, retries=2)
+    # 2 tokens cover the first call's retries; after that each call earns half a retry
+    assert attempts == [3, 1, 2, 1]
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+
+import scheduler
+from monitor import Source
+from scheduler import Schedule, ScheduleState, Scheduler
+
+DAY = 86400
+
+
+class EdgeRng:
+    """Always picks the low (or high) end of a uniform() range."""
+
+    def __init__(self, high=False):
+        self.high = high
+
+    def uniform(self, low, high):
+        return high if self.high else low
+
+
+class FakeMonitor:
+    """Hands back scripted check results instead of fetching anything."""
+
+    http_concurrency = 4
+
+    def __init__(self, sources, results=()):
+        self.sources = sources
+        self.results = list(results)
+        self.checked = []
+
+    async def check_source(self, source, http_limit):
+        self.checked.append(source.name)
+        result = self.results.pop(0) if self.results else {}
+        return {'source': source.name, 'error': None, **result}
+
+    async def release(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "BACKOFF_BASE", 60.0)
+    monkeypatch.setattr(scheduler, "BACKOFF_MAX", 3600.0)
+    monkeypatch.setattr(scheduler, "SCHEDULE_JITTER", 0.1)
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = ScheduleState(str(tmp_path / "schedule.db"))
+    yield state
+    state.close()
+
+
+def run_check(sched, name):
+    """Run one source's check through the scheduler, as run_forever would."""
+    async def main():
+        sched._wakeup = asyncio.Event()
+        await sched._run(sched.schedules[name], asyncio.Semaphore(1))
+    asyncio.run(main())
+
+
+def test_backoff_doubles_up_to_its_caps():
+    schedule = Schedule(Source("page", "https://example.com", interval=DAY), 0)
+    delays = []
+    for failures in range(1, 9):
+        schedule.failures = failures
+        delays.append(schedule.delay(True, EdgeRng(high=False)) / 0.9)
+    assert delays == pytest.approx([60, 120, 240, 480, 960, 1920, 3600, 3600])
+
+    # Never longer than the source's own interval
+    short = Schedule(Source("page", "https://example.com", interval=300), 0, failures=5)
+    assert short.delay(True, EdgeRng()) == pytest.approx(300 * 0.9)
+
+
+def test_jitter_stays_within_bounds():
+    schedule = Schedule(Source("page", "https://example.com", interval=DAY), 0)
+    assert schedule.delay(False, EdgeRng(high=False)) == pytest.approx(DAY * 0.9)
+    assert schedule.delay(False, EdgeRng(high=True)) == pytest.approx(DAY * 1.1)
+
+
+def test_next_run_survives_a_restart(state):
+    source = Source("page", "https://example.com", interval=DAY)
+    first = Scheduler(FakeMonitor([source]), state=state, rng=EdgeRng())
+    first._load(time.time())
+    run_check(first, "page")
+    next_run = first.schedules["page"].next_run
+    assert next_run == pytest.approx(time.time() + DAY * 0.9, abs=5)
+
+    restarted = Scheduler(FakeMonitor([source]), state=state, rng=EdgeRng())
+    restarted._load(time.time())
+    assert restarted.schedules["page"].next_run == next_run
+    assert restarted.overdue_at_start == 0
+
+
+def test_shortened_interval_applies_after_a_restart(state):
+    state.save("page", time.time() + DAY, 0)
+    now = time.time()
+    restarted = Scheduler(FakeMonitor([Source("page", "https://example.com", interval=600)]),
+                          state=state, rng=EdgeRng())
+    restarted._load(now)
+    assert restarted.schedules["page"].next_run == pytest.approx(now + 600)
+
+
+def test_failures_back_off_and_success_resets(state):
+    source = Source("page", "https://example.com", interval=DAY)
+    monitor = FakeMonitor([source], results=[{'error': "boom"}, {'error': "boom"}, {}])
+    sched = Scheduler(monitor, state=state, rng=EdgeRng(high=True))
+    sched._load(time.time())
+
+    run_check(sched, "page")
+    assert sched.schedules["page"].failures == 1
+    assert sched.schedules["page"].next_run == pytest.approx(time.time() + 60 * 1.1, abs=5)
+    run_check(sched, "page")
+    assert sched.schedules["page"].failures == 2
+    assert sched.schedules["page"].next_run == pytest.approx(time.time() + 120 * 1.1, abs=5)
+    assert state.load()["page"]['failures'] == 2
+
+    run_check(sched, "page")
+    assert sched.schedules["page"].failures == 0
+    assert sched.schedules["page"].next_run == pytest.approx(time.time() + DAY * 1.1, abs=5)
+
+
+def test_open_breaker_pushes_the_retry_past_its_cooldown(state):
+    retry_at = time.time() + 5000
+    source = Source("page", "https://example.com", interval=DAY)
+    sched = Scheduler(FakeMonitor([source], results=[{'error': "circuit open", 'retry_at': retry_at}]),
+                      state=state, rng=EdgeRng())
+    sched._load(time.time())
+    run_check(sched, "page")
+    # The 60 s backoff would only wake up to be rejected
+    assert sched.schedules["page"].next_run == retry_at
+    assert state.load()["page"]['next_run'] == retry_at
+
+
+def test_run_forever_runs_due_checks(state):
+    sources = [Source(f"page-{i}", f"https://example.com/{i}", interval=DAY) for i in range(3)]
+    monitor = FakeMonitor(sources)
+    # EdgeRng puts every new schedule at the start of the startup spread: due now
+    sched = Scheduler(monitor, state=state, rng=EdgeRng())
+    asyncio.run(sched.run_forever(until=time.time() + 0.3))
+    assert sorted(monitor.checked) == ["page-0", "page-1", "page-2"]
+    assert sched.stats()['runs'] == 3
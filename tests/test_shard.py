@@ -0,0 +1,91 @@
+import functools
+import http.server
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import PASSWORD, USERNAME
+from monitor import Source
+from shard import ShardedMonitor
+
+
+class PoolSettingsSource(Source):
+    """Reports the driver pool settings a worker would start Chrome with."""
+
+    type = "pool-settings"
+
+    def browser_check(self, url):
+        import facebook_scraper
+        pool = facebook_scraper.get_driver_pool()
+        # Long enough that both workers pick up sources
+        time.sleep(0.2)
+        return {'size': pool.size, 'profile_root': pool.profile_root}
+
+    def handle(self, value):
+        with open(os.path.join(self.options['out'], f"{os.getpid()}.json"), "w") as f:
+            json.dump(value, f)
+
+
+class AlertingSource(Source):
+    """Queues an alert for every check."""
+
+    type = "alerting"
+
+    def parse_static(self, html):
+        return self.name
+
+    def handle(self, value):
+        from notifier import get_notifier
+        get_notifier().enqueue(f"Alert from {value}", "body")
+
+
+@pytest.fixture
+def base_url(tmp_path):
+    (tmp_path / "page.html").write_text("<html><body></body></html>")
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_each_worker_gets_its_own_browser_profile(tmp_path, base_url):
+    out = tmp_path / "out"
+    out.mkdir()
+    sources = [PoolSettingsSource(f"source-{i}", f"{base_url}/page.html?{i}", min_interval=0, out=str(out))
+               for i in range(4)]
+    monitor = ShardedMonitor(sources, workers=2, concurrency=1, start_method="spawn",
+                             profile_root=str(tmp_path / "profiles"))
+    results = monitor.run()
+    assert [r['error'] for r in results] == [None] * 4
+
+    settings = [json.loads(path.read_text()) for path in out.iterdir()]
+    assert all(s['size'] == 1 for s in settings)
+    roots = [s['profile_root'] for s in settings]
+    assert len(set(roots)) == len(roots)
+    assert set(roots) <= {str(tmp_path / "profiles" / f"worker-{i}") for i in range(2)}
+
+
+@pytest.mark.filterwarnings("ignore:Requiring AUTH while not requiring TLS")
+def test_workers_deliver_queued_alerts_before_exiting(tmp_path, base_url, smtp_server, monkeypatch):
+    controller, inbox = smtp_server
+    # Slower to deliver than the coordinator used to wait for a worker to exit
+    inbox.delay = 6
+    # Spawned workers read these at import
+    monkeypatch.setenv("SMTP_SERVER", controller.hostname)
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_STARTTLS", "0")
+    monkeypatch.setenv("EMAIL_USERNAME", USERNAME)
+    monkeypatch.setenv("EMAIL_PASSWORD", PASSWORD)
+    monkeypatch.setenv("NOTIFY_BATCH_WINDOW", "0")
+    sources = [AlertingSource(f"source-{i}", f"{base_url}/page.html?{i}", min_interval=0) for i in range(2)]
+    monitor = ShardedMonitor(sources, workers=2, concurrency=1, start_method="spawn",
+                             profile_root=str(tmp_path / "profiles"))
+
+    results = monitor.run()
+    assert [r['error'] for r in results] == [None, None]
+    delivered = "".join(message.content.decode() for message in inbox.messages)
+    assert "Alert from source-0" in delivered and "Alert from source-1" in delivered
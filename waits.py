@@ -0,0 +1,96 @@
+import os
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException
+
+import metrics
+from resilience import check_not_blocked, wait_budget_cap
+
+# Upper bound on how long a single check may spend blocked on the browser
+WAIT_BUDGET = float(os.getenv("WAIT_BUDGET", "30"))
+PAGE_LOAD_TIMEOUT = float(os.getenv("PAGE_LOAD_TIMEOUT", "20"))
+SELECTOR_TIMEOUT = float(os.getenv("SELECTOR_TIMEOUT", "20"))
+EXPAND_TIMEOUT = float(os.getenv("EXPAND_TIMEOUT", "3"))
+
+# Resolve as soon as `selector` matches, using a MutationObserver instead of polling
+WAIT_FOR_SELECTOR_JS = """
+const [selector, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+if (document.querySelector(selector)) { done(true); return; }
+let timer = null;
+const observer = new MutationObserver(() => {
+    if (document.querySelector(selector)) {
+        observer.disconnect();
+        clearTimeout(timer);
+        done(true);
+    }
+});
+observer.observe(document.documentElement, {childList: true, subtree: true});
+timer = setTimeout(() => { observer.disconnect(); done(!!document.querySelector(selector)); }, timeoutMs);
+"""
+
+
+class SelectorTimeout(TimeoutException):
+    """The page loaded but the element we wait for never appeared (markup changed?)."""
+
+
+class WaitBudget:
+    """Track time spent blocked on the browser and cap it per check.
+
+    Every wait asks the budget for its timeout, so the worst case for a
+    whole check is `total` seconds rather than the sum of each step's limit.
+    """
+
+    def __init__(self, total=WAIT_BUDGET):
+        # Circuit breaker probes run with a smaller budget (resilience.PROBE_WAIT_BUDGET)
+        cap = wait_budget_cap.get()
+        self.total = total if cap is None else min(total, cap)
+        self.started = time.monotonic()
+        self.steps = []
+
+    def remaining(self):
+        return max(0.0, self.total - (time.monotonic() - self.started))
+
+    def timeout_for(self, requested):
+        """Clamp a step's timeout to whatever is left of the budget."""
+        return min(requested, self.remaining())
+
+    @contextmanager
+    def step(self, name):
+        """Time a named step and record it."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """Log per-step timings."""
+        spent = sum(elapsed for _, elapsed in self.steps)
+        timings = ", ".join(f"{name}={elapsed:.2f}s" for name, elapsed in self.steps)
+        metrics.log("wait_timings", timings=timings, spent_s=round(spent, 2), budget_s=self.total)
+
+
+def load_page(driver, url, budget=None, timeout=PAGE_LOAD_TIMEOUT):
+    """Navigate to `url`, bounded by the remaining budget.
+
+    Raises resilience.Blocked if the site redirected to a login or captcha page.
+    """
+    if budget:
+        timeout = budget.timeout_for(timeout)
+    if timeout <= 0:
+        raise TimeoutException(f"Wait budget exhausted before loading {url}")
+    driver.set_page_load_timeout(timeout)
+    with metrics.span("driver_get", log=True):
+        driver.get(url)
+    check_not_blocked(driver.current_url)
+
+
+def wait_for_selector(driver, selector, timeout=SELECTOR_TIMEOUT, budget=None):
+    """Block until `selector` is in the DOM, raising SelectorTimeout otherwise."""
+    if budget:
+        timeout = budget.timeout_for(timeout)
+    driver.set_script_timeout(timeout + 5)
+    if not driver.execute_async_script(WAIT_FOR_SELECTOR_JS, selector, int(timeout * 1000)):
+        raise SelectorTimeout(f"'{selector}' did not appear within {timeout:.1f}s")
@@ -1,12 +1,13 @@
-import requests
-from bs4 import BeautifulSoup
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from email_templates import render_price_alert
+from fetch_engine import get_fetch_engine, browser_page_source
+from html_parse import PRICE, make_soup
+import metrics
+from notifier import get_notifier
+from page_state import UNCHANGED, commit_page, fingerprint, get_page_state
+from price_history import DEFAULT_PLAN, get_price_history
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,112 +16,163 @@ load_dotenv()
 CHECK_INTERVAL = 86400  # 24 hours in seconds
 ALLTRAILS_URL = "https://www.alltrails.com/membership"
 TARGET_PRICE = 29.99  # Set your target price here
+PRICE_SOURCE = "alltrails-membership"  # Name the price history files readings under
+
+# Every reading goes into the price history (set USE_PRICE_HISTORY=0 to disable)
+USE_PRICE_HISTORY = os.getenv("USE_PRICE_HISTORY", "1") != "0"
+# Alert when the price falls this far below its trailing median, even above TARGET_PRICE
+PRICE_DROP_PERCENT = float(os.getenv("PRICE_DROP_PERCENT", "15"))
+TREND_WINDOW_DAYS = int(os.getenv("TREND_WINDOW_DAYS", "30"))
+LOW_WINDOW_DAYS = 90  # Window for the "recent low" shown on /prices
 
 # Email configuration (using environment variables)
 EMAIL_SENDER = os.getenv('EMAIL_SENDER')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 EMAIL_RECEIVER = os.getenv('EMAIL_RECEIVER')
-SMTP_SERVER = 'smtp.gmail.com'
-SMTP_PORT = 587
-
-def check_membership_price():
-    """Check the current membership price on AllTrails"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+
+def find_price_text(html):
+    """Return the text of the price block in page HTML, or None if it isn't there."""
+    # Only the price block is parsed; this selector lives in html_parse.PRICE and
+    # might need adjustment based on AllTrails' HTML structure
+    price_element = make_soup(html, PRICE).find('div', {'class': 'price'})
     
+    if price_element:
+        return price_element.get_text()
+    metrics.log("price_missing", level="warning")
+    return None
+
+def price_from_text(price_text):
+    """Extract the numeric price from the price block's text."""
     try:
-        response = requests.get(ALLTRAILS_URL, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # This selector might need adjustment based on AllTrails' HTML structure
-        price_element = soup.find('div', {'class': 'price'})  # Update this selector
-        
-        if price_element:
-            price_text = price_element.get_text()
-            # Extract the numeric price from the text
-            try:
-                current_price = float(''.join(c for c in price_text if c.isdigit() or c == '.'))
-                return current_price
-            except (ValueError, AttributeError):
-                print(f"Could not parse price from: {price_text}")
-                return None
-        else:
-            print("Could not find price element on the page")
-            return None
-            
-    except requests.RequestException as e:
-        print(f"Error fetching AllTrails page: {e}")
+        return float(''.join(c for c in price_text if c.isdigit() or c == '.'))
+    except (ValueError, AttributeError):
+        metrics.log("price_unparsed", level="warning", text=price_text)
         return None
 
-def send_alert(price):
-    """Send an email alert about the sale"""
-    if not all([EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECEIVER]):
-        print("Email configuration is incomplete. Please check your .env file.")
-        return False
+def parse_price(html):
+    """Extract the membership price from page HTML, or None if it isn't there."""
+    price_text = find_price_text(html)
+    return price_from_text(price_text) if price_text is not None else None
+
+def parse_price_if_changed(html, url=ALLTRAILS_URL, pages=None):
+    """Like parse_price, but returns UNCHANGED if the price block matches the last check.
+    
+    The new fingerprint is only staged; handle_price() commits it once any alert is out.
+    """
+    price_text = find_price_text(html)
+    if price_text is None:
+        return None
+    pages = pages or get_page_state()
+    digest = fingerprint([price_text])
+    if pages and not pages.changed(url, digest):
+        return UNCHANGED
+    price = price_from_text(price_text)
+    if pages and price is not None:
+        pages.stage(url, digest)
+    return price
+
+def fetch_price_with_browser(url):
+    """Render the page in Chrome and read the price from it."""
+    return parse_price_if_changed(browser_page_source(url, wait_selector="div.price"), url)
+
+def check_membership_price(url=ALLTRAILS_URL):
+    """Check the current membership price on AllTrails.
+    
+    Returns the price, None on failure, or UNCHANGED if the price block is
+    the same as at the last check. A new price block is only staged; pass the
+    price to handle_price() (or call page_state.commit_page) to save it.
+    """
+    engine = get_fetch_engine()
     
     try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = EMAIL_RECEIVER
-        msg['Subject'] = f"🚨 AllTrails Membership Sale Alert! Now ${price}/year"
-        
-        body = f"""
-        <h2>AllTrails Membership Sale Alert! 🎉</h2>
-        <p>The AllTrails annual membership is now <strong>${price}/year</strong>!</p>
-        <p>Hurry, this deal might not last long!</p>
-        <p><a href="{ALLTRAILS_URL}">Click here to check it out</a></p>
-        <p>This alert was sent at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        """
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
-            
-        print("Sale alert email sent successfully!")
-        return True
-        
+        result = engine.check(url, lambda html: parse_price_if_changed(html, url), fetch_price_with_browser,
+                              source=PRICE_SOURCE)
+        metrics.log("price_checked", url=url, tier=result.tier, unchanged=not result.changed)
+        return result.value
     except Exception as e:
-        print(f"Error sending email: {e}")
+        metrics.log("price_check_failed", level="error", url=url, error=e)
+        return None
+
+def alert_reason(price, source=PRICE_SOURCE, plan=DEFAULT_PLAN, target_price=TARGET_PRICE, history=None):
+    """Why `price` deserves an alert, or None. Call before recording the reading.
+    
+    Only a new drop alerts: a price at or above the previous reading never
+    does, so a sale that lasts several checks sends one email.
+    """
+    if history is None:
+        return f"at or below the ${target_price} target" if target_price is not None and price <= target_price else None
+    previous = history.latest(source, plan)
+    if previous is not None and price >= previous.price:
+        return None
+    if target_price is not None and price <= target_price:
+        return f"at or below the ${target_price} target"
+    drop = history.drop_from_median(price, source, plan, TREND_WINDOW_DAYS)
+    if drop is not None and drop >= PRICE_DROP_PERCENT:
+        median = history.trailing_median(source, plan, TREND_WINDOW_DAYS)
+        return f"{drop:.0f}% below the {TREND_WINDOW_DAYS}-day median of ${median:.2f}"
+    return None
+
+def handle_price(price, url=ALLTRAILS_URL, source=PRICE_SOURCE, plan=DEFAULT_PLAN, target_price=TARGET_PRICE):
+    """Alert on a reading if it deserves one and return the reason, or None.
+    
+    The reading and the page's new fingerprint are saved once the alert is
+    sent, so a failed send is retried at the next check.
+    """
+    history = get_price_history() if USE_PRICE_HISTORY else None
+    reason = alert_reason(price, source, plan, target_price, history)
+    
+    def done():
+        if history:
+            history.record(source, price, plan)
+        commit_page(url)
+    
+    if reason:
+        metrics.log("price_alert", source=source, price=price, reason=reason)
+        if send_alert(price, url, reason, on_sent=done):
+            return reason
+    done()
+    return reason
+
+def track_unchanged(source=PRICE_SOURCE, plan=DEFAULT_PLAN):
+    """Repeat the last reading when the price block hasn't changed, so the series stays regular."""
+    if not USE_PRICE_HISTORY:
+        return None
+    history = get_price_history()
+    previous = history.latest(source, plan)
+    if previous is not None:
+        history.record(source, previous.price, plan)
+        return previous.price
+    return None
+
+def send_alert(price, url=ALLTRAILS_URL, reason=None, on_sent=None):
+    """Send an email alert about the sale; `on_sent` runs once it's delivered"""
+    if not all([EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECEIVER]):
+        metrics.log("email_not_configured", level="warning")
         return False
+    
+    email = render_price_alert(price, url, datetime.now(), reason)
+    
+    # Delivery (connection reuse, batching, retries) happens on the notifier's thread
+    return get_notifier().enqueue(email.subject, email.html, is_html=True, to=EMAIL_RECEIVER,
+                                  on_sent=on_sent, text=email.text)
 
 def main():
+    """Check the membership price every CHECK_INTERVAL seconds until stopped."""
+    # Imported here because monitor imports this module
+    from monitor import Monitor, PriceSource
+    from scheduler import Scheduler
+    
     print("Starting AllTrails membership price monitor...")
-    print(f"Will check every {CHECK_INTERVAL//3600} hours for prices below ${TARGET_PRICE}")
+    print(f"Will check every {CHECK_INTERVAL//3600} hours for prices below ${TARGET_PRICE} "
+          f"or {PRICE_DROP_PERCENT:.0f}% below the {TREND_WINDOW_DAYS}-day median")
     
-    while True:
-        try:
-            print(f"\nChecking at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            current_price = check_membership_price()
-            
-            if current_price is not None:
-                print(f"Current AllTrails membership price: ${current_price}")
-                
-                if current_price <= TARGET_PRICE:
-                    print(f"Sale detected! Price is ${current_price} (target: ${TARGET_PRICE})")
-                    send_alert(current_price)
-                    print("Exiting after sending alert.")
-                    break
-                else:
-                    print(f"No sale yet. Current price: ${current_price} (target: ${TARGET_PRICE})")
-            
-            # Wait for the next check (24 hours)
-            time.sleep(CHECK_INTERVAL)
-            
-        except KeyboardInterrupt:
-            print("\nMonitoring stopped by user.")
-            break
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            print("Waiting 5 minutes before retrying...")
-            time.sleep(300)  # Wait 5 minutes before retrying on error
+    # Failed checks are retried with backoff; alerts don't stop the monitor
+    monitor = Monitor([PriceSource(PRICE_SOURCE, ALLTRAILS_URL, target_price=TARGET_PRICE, interval=CHECK_INTERVAL)])
+    try:
+        Scheduler(monitor).run()
+    finally:
+        monitor.shutdown()
+        print("\nMonitoring stopped.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file